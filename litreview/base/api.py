@@ -0,0 +1,213 @@
+"""Read-only JSON endpoints for mobile clients and infinite scrolling.
+
+- api/feed/: the feed, with the visibility rules of the feed page;
+- api/posts/: the posts written by the user;
+- api/following/ and api/followers/: the users followed by the user, and
+the users following him.
+
+Every list is paginated with an opaque cursor: the response holds a
+next_cursor value to send back as the cursor GET parameter, null on the
+last page. The limit parameter sets the page size (at most MAX_LIMIT). A
+cursor which can't be read is answered with a 400, as any other invalid
+parameter.
+
+Posts can be trimmed with fields=, a comma-separated list of the fields to
+return (type and id are always returned). Leaving out description and body
+also keeps these columns out of the query.
+
+Responses are serialized while they are sent: posts are loaded and encoded
+by chunks of CHUNK_SIZE, so a page is never held in memory as a whole,
+neither as objects nor as text.
+"""
+
+
+import base64
+import datetime
+import json
+from functools import wraps
+from typing import Iterator, Optional
+
+import base.feed as feed
+import base.feed_cache as feed_cache
+from base.conditional import user_content_conditional
+from base.replicas import read_from_replica
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+MAX_LIMIT = 100
+CHUNK_SIZE = 25
+
+POST_FIELDS = {
+    "time_created", "user",
+    # tickets
+    "title", "description", "has_review", "review_count", "average_rating",
+    "last_review_at",
+    # reviews
+    "headline", "rating", "body", "ticket",
+}
+
+
+class BadRequest(ValueError):
+    """Raised when a GET parameter can't be used."""
+
+
+def api_login_required(view):
+    """like login_required, but answers 401 instead of redirecting to the
+    login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "authentication required"},
+                                status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({"error": str(error)}, status=400)
+    return wrapper
+
+
+def _limit(request) -> int:
+    try:
+        limit = int(request.GET.get("limit", settings.FEED_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _fields(request) -> set[str]:
+    raw = request.GET.get("fields")
+    if not raw:
+        return POST_FIELDS
+    fields = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = fields - POST_FIELDS
+    if unknown:
+        raise BadRequest("unknown fields: " + ", ".join(sorted(unknown)))
+    return fields
+
+
+def _deferred(fields: set[str]) -> tuple[str, ...]:
+    """long text columns which don't need to be loaded."""
+    return tuple(name for name in ("description", "body")
+                 if name not in fields)
+
+
+def serialize_post(post, fields: set[str]) -> dict:
+    data = {"type": post.content_type.lower(), "id": post.id}
+    if "time_created" in fields:
+        data["time_created"] = post.time_created.isoformat()
+    if "user" in fields:
+        data["user"] = post.user.username
+    if post.content_type == feed.TICKET:
+        names = ("title", "description", "has_review", "review_count",
+                 "average_rating", "last_review_at")
+    else:
+        names = ("headline", "rating", "body")
+    for name in names:
+        if name in fields:
+            value = getattr(post, name)
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            data[name] = value
+    if post.content_type == feed.REVIEW and "ticket" in fields:
+        data["ticket"] = {"id": post.ticket.id,
+                          "title": post.ticket.title,
+                          "user": post.ticket.user.username}
+    return data
+
+
+def _stream(name: str, items: Iterator[dict],
+            next_cursor: Optional[str]) -> StreamingHttpResponse:
+    """streams {"<name>": [...items], "next_cursor": ...}."""
+    def chunks():
+        yield '{"%s": [' % name
+        separator = ""
+        for item in items:
+            yield separator + json.dumps(item, ensure_ascii=False)
+            separator = ","
+        yield '], "next_cursor": %s}' % json.dumps(next_cursor)
+    return StreamingHttpResponse(chunks(), content_type="application/json")
+
+
+def _post_cursor(request) -> Optional[str]:
+    # the pages of the site start over from the most recent post instead.
+    token = request.GET.get("cursor")
+    if token and feed.decode_cursor(token) is None:
+        raise BadRequest("invalid cursor")
+    return token
+
+
+def _posts(keys: list[dict], fields: set[str]) -> Iterator[dict]:
+    defer = _deferred(fields)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        for post in feed.hydrate(keys[start:start + CHUNK_SIZE], defer):
+            yield serialize_post(post, fields)
+
+
+def _post_list(request, page_keys) -> StreamingHttpResponse:
+    limit = _limit(request)
+    fields = _fields(request)
+    keys = page_keys(request.user, _post_cursor(request), limit)
+    keys, next_cursor = feed.split_page(keys, limit)
+    return _stream("posts", _posts(keys, fields), next_cursor)
+
+
+@require_GET
+@api_login_required
+@read_from_replica
+@user_content_conditional
+def feed_list(request):
+    return _post_list(request, feed_cache.feed_page_keys)
+
+
+@require_GET
+@api_login_required
+@read_from_replica
+@user_content_conditional
+def post_list(request):
+    return _post_list(request, feed_cache.post_page_keys)
+
+
+def _encode_username(username: str) -> str:
+    return base64.urlsafe_b64encode(username.encode()).decode()
+
+
+def _decode_username(token: Optional[str]) -> str:
+    if not token:
+        return ""
+    try:
+        return base64.urlsafe_b64decode(token.encode()).decode()
+    except ValueError:
+        raise BadRequest("invalid cursor")
+
+
+def _user_list(request, name: str, **lookup) -> StreamingHttpResponse:
+    """users matching the lookup, by username, after the cursor."""
+    limit = _limit(request)
+    after = _decode_username(request.GET.get("cursor"))
+    users = User.objects.filter(username__gt=after, **lookup).order_by(
+        "username").values_list("id", "username")
+    rows = list(users[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_username(rows[-1][1])
+    items = ({"id": user_id, "username": username}
+             for user_id, username in rows)
+    return _stream(name, items, next_cursor)
+
+
+@require_GET
+@api_login_required
+@read_from_replica
+def following_list(request):
+    return _user_list(request, "following", followed_by__user=request.user)
+
+
+@require_GET
+@api_login_required
+@read_from_replica
+def follower_list(request):
+    return _user_list(request, "followers",
+                      following__followed_user=request.user)
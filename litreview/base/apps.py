@@ -7,3 +7,8 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
+
+    def ready(self):
+        # connects the receivers declared in signals.py and sqlite.py.
+        import base.signals  # noqa: F401
+        import base.sqlite  # noqa: F401
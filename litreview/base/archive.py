@@ -0,0 +1,228 @@
+"""Moves old tickets and reviews out of the tables the pages read.
+
+The feed and posts pages read the most recent posts, yet the Ticket and
+Review tables, and their indexes, grow with every post ever written.
+`python manage.py archive_posts` moves the posts older than
+ARCHIVE_AFTER_DAYS into the ArchivedTicket and ArchivedReview tables, so
+that the live tables, and the part of them the database keeps in memory,
+stay about the size of the recent activity.
+
+A ticket and its reviews move together, once they are all older than the
+cutoff: a review always lives in the same table as its ticket, and an old
+ticket which just received a review stays live. Posts keep their id (ids
+are never reused) and their time_created, hence their position in the
+pages. Moving a post isn't deleting it: no signal is sent, the user
+counters keep counting it, the rendered bodies of base/fragments.py stay
+valid. Archived posts leave the push-mode timelines, but stay in the
+search index (see base/search.py).
+
+Runs are batched and resumable: each batch of ARCHIVE_BATCH_SIZE tickets
+moves in its own transaction, which also records the progress of the run
+(see ArchiveRun). An interrupted run is resumed by the next one.
+
+Reading: every archived post is older than the boundary, the latest
+cutoff of a run. A page of live keys ending after it is complete; only the
+pages reaching the boundary also read the archive, and merge both lists
+(see complete). Keys read from the archive are marked "archived", which
+tells base.feed.hydrate where to fetch the posts. The forms editing,
+deleting or responding to an archived post display it from the archive;
+submitting one first moves its thread back to the live tables (see
+restore), so that crawlers and prefetches leave the archive untouched.
+"""
+
+
+import datetime
+from typing import Callable, Optional
+
+import base.feed as feed
+import base.models as models
+import base.timeline as timeline
+from base.query_budget import extend_budget
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import (Case, DateTimeField, Exists, F, Max, Model,
+                              OuterRef, QuerySet, Value, When)
+from django.dispatch import Signal
+from django.utils import timezone
+
+# sent with the ticket and reviews moved back to the live tables.
+restored = Signal()
+
+
+def boundary() -> Optional[datetime.datetime]:
+    """every archived post is older than the returned date, None when the
+    archive is empty. It is read from the database rather than cached:
+    archive_posts runs in its own process, which couldn't drop the copies
+    kept by the processes serving the pages."""
+    extend_budget(1)
+    return models.ArchiveRun.objects.aggregate(last=Max("cutoff"))["last"]
+
+
+def _position(key: dict) -> tuple:
+    return key["time_created"], key["content_type"], key["id"]
+
+
+def complete(keys: list[dict], limit: int,
+             archived_keys: Callable[[], list[dict]]) -> list[dict]:
+    """returns the first limit keys among the live keys (the first limit
+    ones after a cursor) and the archived keys after the same cursor,
+    returned by archived_keys, which is only called when the live keys
+    reach the boundary."""
+    limit_time = boundary()
+    if limit_time is None or (len(keys) >= limit
+                              and keys[-1]["time_created"] >= limit_time):
+        return keys
+    extend_budget(1)
+    archived = list(archived_keys())
+    for key in archived:
+        key["archived"] = True
+    return sorted(keys + archived, key=_position, reverse=True)[:limit]
+
+
+def _copy(post: Model, model: type[Model]) -> Model:
+    """an instance of model holding the same values as the post. Live and
+    archived models have the same fields."""
+    return model(**{field.attname: getattr(post, field.attname)
+                    for field in post._meta.concrete_fields})
+
+
+def current_run() -> Optional[models.ArchiveRun]:
+    return models.ArchiveRun.objects.filter(
+        finished_at__isnull=True).order_by("id").first()
+
+
+def start(cutoff: datetime.datetime) -> models.ArchiveRun:
+    """records a new run. The boundary moves before any post does, so that
+    no page misses a post being archived."""
+    return models.ArchiveRun.objects.create(cutoff=cutoff)
+
+
+def _movable(run: models.ArchiveRun) -> QuerySet:
+    """the tickets, after the progress of the run, which are older than its
+    cutoff and have no review as recent."""
+    recent_reviews = models.Review.objects.filter(
+        ticket=OuterRef("pk"), time_created__gte=run.cutoff)
+    return models.Ticket.objects.filter(
+        id__gt=run.last_ticket_id, time_created__lt=run.cutoff
+    ).exclude(Exists(recent_reviews)).order_by("id")
+
+
+def move_batch(run: models.ArchiveRun, batch_size: int) -> int:
+    """archives the next batch_size threads of the run, and returns the
+    number of tickets moved."""
+    with transaction.atomic():
+        tickets = list(_movable(run)[:batch_size])
+        if not tickets:
+            return 0
+        ids = [ticket.id for ticket in tickets]
+        reviews = list(models.Review.objects.filter(ticket_id__in=ids))
+        # deleting the rows without collecting them sends no signal, see the
+        # module docstring. Reviews go first, they refer to the tickets. The
+        # live rows leave the search index before the archived ones enter
+        # it under the same rowids.
+        moved_reviews = models.Review.objects.filter(ticket_id__in=ids)
+        moved_reviews._raw_delete(moved_reviews.db)
+        moved_tickets = models.Ticket.objects.filter(id__in=ids)
+        moved_tickets._raw_delete(moved_tickets.db)
+        models.ArchivedTicket.objects.bulk_create(
+            [_copy(ticket, models.ArchivedTicket) for ticket in tickets])
+        models.ArchivedReview.objects.bulk_create(
+            [_copy(review, models.ArchivedReview) for review in reviews])
+        timeline.remove_posts(feed.TICKET, ids)
+        timeline.remove_posts(feed.REVIEW, [review.id for review in reviews])
+        models.ArchiveRun.objects.filter(id=run.id).update(
+            last_ticket_id=ids[-1], tickets=F("tickets") + len(tickets),
+            reviews=F("reviews") + len(reviews))
+    run.last_ticket_id = ids[-1]
+    run.tickets += len(tickets)
+    run.reviews += len(reviews)
+    return len(tickets)
+
+
+def archive(cutoff: Optional[datetime.datetime] = None,
+            batch_size: Optional[int] = None,
+            max_batches: Optional[int] = None) -> models.ArchiveRun:
+    """resumes the unfinished run, or starts one archiving the threads
+    older than cutoff (ARCHIVE_AFTER_DAYS ago by default). Stops after
+    max_batches batches, leaving the run to resume, or once every ticket
+    was visited."""
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    run = current_run()
+    if run is None:
+        run = start(cutoff or timezone.now() - datetime.timedelta(
+            days=settings.ARCHIVE_AFTER_DAYS))
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        if not move_batch(run, batch_size):
+            run.finished_at = timezone.now()
+            run.save(update_fields=["finished_at"])
+            break
+        batches += 1
+    return run
+
+
+def _insert_live(model: type[Model], posts: list[Model]) -> list[Model]:
+    """inserts live copies of the archived posts and returns them.
+    bulk_create stamps them with the current time (auto_now_add): their own
+    time is written back."""
+    copies = [_copy(post, model) for post in posts]
+    model.objects.bulk_create(copies)
+    if posts:
+        model.objects.filter(id__in=[post.id for post in posts]).update(
+            time_created=Case(*[When(id=post.id, then=Value(
+                post.time_created, output_field=DateTimeField()))
+                for post in posts]))
+    for copy, post in zip(copies, posts):
+        copy.time_created = post.time_created
+    return copies
+
+
+def restore(content_type: str, post_id: int) -> bool:
+    """moves the archived thread holding the post back to the live tables.
+    Returns False when the post isn't archived."""
+    if content_type == feed.TICKET:
+        ticket_id = post_id
+    else:
+        ticket_id = models.ArchivedReview.objects.filter(
+            id=post_id).values_list("ticket_id", flat=True).first()
+    try:
+        with transaction.atomic():
+            thread = models.ArchivedTicket.objects.filter(id=ticket_id)
+            archived = thread.first()
+            if archived is None:
+                return False
+            archived_reviews = list(archived.reviews.all())
+            # the archived rows leave the search index before the live ones
+            # enter it, see move_batch. Deleting the queryset leaves the
+            # ids of the instances.
+            thread.delete()
+            [ticket] = _insert_live(models.Ticket, [archived])
+            reviews = _insert_live(models.Review, archived_reviews)
+            restored.send(sender=models.Ticket, ticket=ticket,
+                          reviews=reviews)
+    except IntegrityError:
+        # restored by a concurrent request.
+        pass
+    return True
+
+
+def get_post(content_type: str, pk: int, *related: str,
+             restore_archived: bool = False) -> Model:
+    """the post having the pk, with the related rows named (select_related),
+    read from the live tables or else from the archive. With
+    restore_archived, an archived post is first moved back to the live
+    tables (see restore) and returned from there. Raises ObjectDoesNotExist
+    when the post doesn't exist."""
+    def get(archived: bool) -> Model:
+        posts = feed.MODELS[content_type, archived].objects
+        return posts.select_related(*related).get(pk=pk) if related \
+            else posts.get(pk=pk)
+    try:
+        return get(archived=False)
+    except ObjectDoesNotExist:
+        if not restore_archived:
+            return get(archived=True)
+        if not restore(content_type, pk):
+            raise
+    return get(archived=False)
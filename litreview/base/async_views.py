@@ -0,0 +1,158 @@
+"""Asynchronous versions of the feed, posts and following pages.
+
+They are served under async/ (see urls.py) and display the same pages as
+their synchronous counterparts in views.py. Under ASGI, a request waiting
+for the database doesn't hold a worker: the event loop serves other
+requests meanwhile, and the queries which don't depend on each other run
+at the same time:
+- feed and posts: once the ordered keys of the page are known, the tickets
+and the reviews (live or archived) are fetched concurrently (and, for
+posts, the user's counters along with the keys);
+- following: the followed users, the followers, the user's counters and
+his follow suggestions are read concurrently.
+
+Django 4.0 has no asynchronous ORM (aget(), acount()... came with 4.1), so
+each query runs in a worker thread through sync_to_async, with
+thread_sensitive=False so that the threads, each holding its own database
+connection, actually run side by side. The queries being spread over
+several threads, query_budget can't record them; these views have the same
+queries as the synchronous ones.
+"""
+
+
+import asyncio
+from functools import wraps
+
+import base.feed as feed
+import base.feed_cache as feed_cache
+import base.suggestions as suggestions
+import base.user_stats as user_stats
+from asgiref.sync import sync_to_async
+from base.conditional import async_user_content_conditional
+from base.replicas import read_from_replica
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed
+from django.shortcuts import render
+
+
+async def _db(function, *args):
+    """runs a function querying the database in a worker thread. The
+    connection of the thread is closed afterwards, or kept for reuse
+    depending on CONN_MAX_AGE."""
+    def call():
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+def _authenticated(request) -> bool:
+    # loads the session and the user, which stay cached on the request.
+    return request.user.is_authenticated
+
+
+def async_require_get(view):
+    """require_GET for coroutine views, which Django 4.0's decorator
+    turns into synchronous ones."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_login_required(view):
+    """login_required for coroutine views. request.user is resolved here,
+    the views below may then read it without querying."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(_authenticated)(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _fetch_tables(ids: feed.Tables) -> dict:
+    """same as base.feed.fetch_tables, the tables holding some of the posts
+    being read concurrently."""
+    tables = [table for table, post_ids in ids.items() if post_ids]
+    found = await asyncio.gather(*(
+        _db(feed.fetch, content_type, ids[content_type, archived],
+            feed.LISTING_DEFER, archived)
+        for content_type, archived in tables))
+    return {table: {} for table in ids} | dict(zip(tables, found))
+
+
+async def _hydrate(keys: list[dict]) -> list:
+    """same as base.feed.hydrate."""
+    ids = feed.ids_by_table(keys)
+    found = await _fetch_tables(ids)
+    again = await _fetch_tables(feed.missing(ids, found))
+    return feed.ordered(keys, feed.merge_found(found, again))
+
+
+async def _render(request, template: str, context: dict):
+    # the context processors may read the session.
+    return await sync_to_async(render)(request, template, context)
+
+
+@async_require_get
+@async_login_required
+@read_from_replica
+@async_user_content_conditional
+async def feed_page(request):
+    """see views.Feed."""
+    page_size = settings.FEED_PAGE_SIZE
+    keys = await _db(feed_cache.feed_page_keys, request.user,
+                     request.GET.get("cursor"), page_size)
+    keys, next_cursor = feed.split_page(keys, page_size)
+    context = {"posts": await _hydrate(keys),
+               "next_cursor": next_cursor}
+    return await _render(request, "base/feed.html", context)
+
+
+@async_require_get
+@async_login_required
+@read_from_replica
+@async_user_content_conditional
+async def posts_page(request):
+    """see views.Posts."""
+    page_size = settings.POSTS_PAGE_SIZE
+    keys, stats = await asyncio.gather(
+        _db(feed_cache.post_page_keys, request.user,
+            request.GET.get("cursor"), page_size),
+        _db(user_stats.get_stats, request.user),
+    )
+    keys, next_cursor = feed.split_page(keys, page_size)
+    context = {"posts": await _hydrate(keys),
+               "next_cursor": next_cursor,
+               "stats": stats}
+    return await _render(request, "base/posts.html", context)
+
+
+@async_require_get
+@async_login_required
+@read_from_replica
+async def following_page(request):
+    """see views.Following."""
+    user = request.user
+    following, followers, stats, people = await asyncio.gather(
+        _db(lambda: list(User.objects.filter(
+            followed_by__user=user).only("username").order_by("username"))),
+        _db(lambda: list(User.objects.filter(
+            following__followed_user=user).only("username").order_by(
+                "username"))),
+        _db(user_stats.get_stats, user),
+        _db(lambda: list(suggestions.for_user(
+            user, settings.SUGGESTIONS_SHOWN))),
+    )
+    context = {"following": following,
+               "followers": followers,
+               "stats": stats,
+               "suggestions": people}
+    return await _render(request, "base/following.html", context)
@@ -0,0 +1,332 @@
+"""Measures how the views of base behave as the amount of data grows.
+
+The benchmark command runs in a throw-away test database. For each dataset
+size, it fills the database with base/synthetic.py, then drives every view
+through the test client with a sample of users and records:
+- the latency percentiles of the requests (in milliseconds);
+- the number of SQL queries per request;
+- the peak memory allocated by one request, measured with tracemalloc in a
+separate pass since tracing slows the code down.
+
+The same measures compare the ways of loading the session and the user of
+a request (see SESSION_PROFILES and base/user_cache.py).
+"""
+
+
+import asyncio
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import base.feed as feed
+import base.models as models
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+
+# sync view, async view of the same page.
+ASYNC_PAGES: dict[str, tuple[str, str]] = {
+    "feed": ("base:feed", "base:async_feed"),
+    "posts": ("base:posts", "base:async_posts"),
+    "following": ("base:following", "base:async_following"),
+}
+
+
+def _follow_search(user: User) -> tuple[str, dict]:
+    return reverse("base:search_result"), {"username": user.username}
+
+
+# each view is reached through a function returning the url and the GET
+# parameters to use for a given user.
+VIEWS: dict[str, Callable[[User], tuple[str, dict]]] = {
+    "feed": lambda user: (reverse("base:feed"), {}),
+    "posts": lambda user: (reverse("base:posts"), {}),
+    "following": lambda user: (reverse("base:following"), {}),
+    "follow": _follow_search,
+}
+
+
+AUTH_MIDDLEWARE = "django.contrib.auth.middleware.AuthenticationMiddleware"
+CACHED_USER_MIDDLEWARE = "base.user_cache.CachedUserMiddleware"
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+# session engine, whether the user is cached. The first one is the
+# baseline, "development" in settings.py.
+SESSION_PROFILES: dict[str, tuple[str, bool]] = {
+    "db": ("db", False),
+    "cached_db": ("cached_db", False),
+    "cached_db+user cache": ("cached_db", True),
+    "signed_cookies+user cache": ("signed_cookies", True),
+}
+
+
+def _auth_middleware(name: str, cache_users: bool) -> str:
+    if name not in (AUTH_MIDDLEWARE, CACHED_USER_MIDDLEWARE):
+        return name
+    return CACHED_USER_MIDDLEWARE if cache_users else AUTH_MIDDLEWARE
+
+
+def session_settings(profile: str) -> dict:
+    """the settings to override to run the views under the profile."""
+    engine, cache_users = SESSION_PROFILES[profile]
+    middleware = [_auth_middleware(name, cache_users)
+                  for name in settings.MIDDLEWARE]
+    return {"SESSION_ENGINE": SESSION_ENGINES[engine],
+            "MIDDLEWARE": middleware}
+
+
+def isolated_caches() -> dict:
+    """settings.CACHES with every alias moved to a local-memory cache of its
+    own, keeping its timeout and options. The caches of the project may be
+    shared with the running server: the benchmarks clear them, and their
+    entries describe the users of the test database."""
+    return {alias: {**{option: config[option]
+                       for option in ("TIMEOUT", "OPTIONS")
+                       if option in config},
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": f"benchmark-{alias}"}
+            for alias, config in settings.CACHES.items()}
+
+
+@contextmanager
+def benchmark_database(test_name: Optional[str] = None):
+    """runs the block against a fresh test database, destroyed afterwards,
+    and isolated caches (see isolated_caches). SQLite test databases live in
+    memory unless a file name is given."""
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    previous_test_name = test_settings.get("NAME")
+    if test_name is not None:
+        test_settings["NAME"] = test_name
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        with override_settings(CACHES=isolated_caches()):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = previous_test_name
+
+
+def clear_cache(alias: str) -> None:
+    """empties the cache of benchmark_database having the alias, refusing
+    to touch any other."""
+    if settings.CACHES[alias].get("LOCATION") != f"benchmark-{alias}":
+        raise RuntimeError(f"the {alias} cache is only cleared within "
+                           "benchmark_database()")
+    caches[alias].clear()
+
+
+def percentile(values: list[float], p: float) -> float:
+    """nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1,
+                      round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def sample_users(count: int, seed: int = 0) -> list[User]:
+    """picks random users, always including the one following the most
+    people, whose feed is the most expensive."""
+    rng = random.Random(seed)
+    ids = list(User.objects.values_list("id", flat=True))
+    chosen = set(rng.sample(ids, min(count, len(ids))))
+    busiest = User.objects.annotate(
+        follows=Count("following")
+    ).order_by("-follows").values_list("id", flat=True).first()
+    if busiest is not None:
+        chosen.add(busiest)
+    return list(User.objects.filter(id__in=chosen))
+
+
+def measure(get_url: Callable[[User], tuple[str, dict]], users: list[User],
+            repeat: int, cold_cache: bool = False) -> dict:
+    """requests the view repeat times, rotating over the users."""
+    clients = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        clients.append((client, get_url(user)))
+
+    def request(i):
+        client, (url, data) = clients[i % len(clients)]
+        if cold_cache:
+            clear_cache("feed")
+        response = client.get(url, data)
+        assert response.status_code == 200, (url, response.status_code)
+
+    for i in range(len(clients)):
+        request(i)  # warm-up
+
+    latencies, queries = [], []
+    for i in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            request(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+
+    peaks = []
+    for i in range(len(clients)):
+        tracemalloc.start()
+        request(i)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "requests": repeat,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+        "queries_avg": round(sum(queries) / len(queries), 2),
+        "queries_max": max(queries),
+        "peak_memory_kb": round(max(peaks) / 1024, 1),
+    }
+
+
+def _stress_worker(write: bool, user_ids: list[int], deadline: float,
+                   barrier: threading.Barrier, results: list) -> None:
+    rng = random.Random()
+    done, locked, latencies = 0, 0, []
+    barrier.wait()
+    try:
+        while time.perf_counter() < deadline:
+            user_id = rng.choice(user_ids)
+            start = time.perf_counter()
+            try:
+                if write:
+                    models.Ticket.objects.create(title="stress",
+                                                 user_id=user_id)
+                else:
+                    list(feed.feed_keys(User(id=user_id), None, 21))
+            except OperationalError as error:
+                if "locked" not in str(error):
+                    raise
+                locked += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            done += 1
+    finally:
+        # each thread has its own connection.
+        connection.close()
+    results.append((write, done, locked, latencies))
+
+
+def stress(writers: int, readers: int, seconds: float) -> dict:
+    """runs writer threads posting tickets (signals included) alongside
+    reader threads reading feeds, for the given duration. Returns the
+    throughput, the latency percentiles and the number of "database is
+    locked" errors of each kind of thread."""
+    user_ids = list(User.objects.values_list("id", flat=True))
+    barrier = threading.Barrier(writers + readers)
+    deadline = time.perf_counter() + seconds
+    results = []
+    threads = [
+        threading.Thread(target=_stress_worker,
+                         args=(i < writers, user_ids, deadline, barrier,
+                               results))
+        for i in range(writers + readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {}
+    for write, kind in ((True, "writes"), (False, "reads")):
+        rows = [row for row in results if row[0] == write]
+        latencies = [ms for row in rows for ms in row[3]]
+        done = sum(row[1] for row in rows)
+        report[kind] = {
+            "done": done,
+            "per_second": round(done / seconds, 1),
+            "lock_errors": sum(row[2] for row in rows),
+            "p50_ms": round(percentile(latencies, 50), 3) if done else None,
+            "p99_ms": round(percentile(latencies, 99), 3) if done else None,
+        }
+    return report
+
+
+def _throughput(latencies: list[float], seconds: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def _check(response, url: str) -> None:
+    assert response.status_code == 200, (url, response.status_code)
+
+
+def wsgi_throughput(url: str, users: list[User], clients: int,
+                    requests: int, cold_cache: bool = False) -> dict:
+    """each client is a thread sending requests one after the other
+    through the WSGI handler, as the threads of a WSGI server would."""
+    latencies = []
+    barrier = threading.Barrier(clients + 1)
+
+    def client(i):
+        browser = Client()
+        browser.force_login(users[i % len(users)])
+        barrier.wait()
+        try:
+            for _ in range(requests):
+                if cold_cache:
+                    clear_cache("feed")
+                start = time.perf_counter()
+                _check(browser.get(url), url)
+                latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return _throughput(latencies, time.perf_counter() - start)
+
+
+def asgi_throughput(url: str, users: list[User], clients: int,
+                    requests: int, cold_cache: bool = False) -> dict:
+    """each client is a task of a single event loop, sending requests one
+    after the other through the ASGI handler."""
+    latencies = []
+    browsers = []
+    for i in range(clients):
+        browser = AsyncClient()
+        browser.force_login(users[i % len(users)])
+        browsers.append(browser)
+
+    async def client(browser):
+        for _ in range(requests):
+            if cold_cache:
+                clear_cache("feed")
+            start = time.perf_counter()
+            _check(await browser.get(url), url)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async def main():
+        await asyncio.gather(*(client(browser) for browser in browsers))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return _throughput(latencies, time.perf_counter() - start)
@@ -0,0 +1,76 @@
+"""Conditional GET for the pages built from the feed cache.
+
+Users refresh their feed constantly, and the page usually hasn't changed.
+The user_content_conditional decorator answers such requests with a 304
+before the view runs. The version of the user's feed cache (see
+base/feed_cache.py) changes whenever something displayed in his feed or
+posts pages changes, and reading it is a single cache lookup, so it is
+used as the ETag (combined with the user, the full path and
+settings.BUILD_ID), while the moment the version was picked is the
+Last-Modified date. Both are shared by every process serving requests.
+Browsers send If-None-Match along with If-Modified-Since, which is then
+ignored, so a new build is enough to refresh the pages.
+
+Any view whose content only depends on the posts and follows of the
+requesting user can adopt it:
+
+    class Posts(LoginRequiredMixin, View):
+        @staticmethod
+        @user_content_conditional
+        def get(request):
+            ...
+
+Responses are marked private and must be revalidated, so that browsers
+always ask and shared caches never store them.
+"""
+
+
+import datetime
+import hashlib
+from functools import wraps
+
+import base.feed_cache as feed_cache
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+def _etag(request, *args, **kwargs) -> str:
+    version = feed_cache.version(request.user.id)
+    raw = (f"{settings.BUILD_ID}:{settings.FEED_MODE}:{request.user.id}:"
+           f"{version}:{request.get_full_path()}")
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _last_modified(request, *args, **kwargs) -> datetime.datetime:
+    version = feed_cache.version(request.user.id)
+    return datetime.datetime.fromtimestamp(version / 1e9,
+                                           tz=datetime.timezone.utc)
+
+
+def user_content_conditional(view):
+    """decorates a view (or the get method of a class-based view) whose
+    output only depends on the requesting user's feed cache version."""
+    view = condition(etag_func=_etag, last_modified_func=_last_modified)(view)
+    return cache_control(private=True, no_cache=True)(view)
+
+
+def async_user_content_conditional(view):
+    """same as user_content_conditional, for coroutine views. Django's
+    condition decorator only handles synchronous views."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        etag = quote_etag(_etag(request))
+        last_modified = int(_last_modified(request).timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                response.headers.setdefault("ETag", etag)
+                response.headers.setdefault(
+                    "Last-Modified", http_date(last_modified))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
@@ -0,0 +1,360 @@
+"""Builds the content of the feed page directly in the database.
+
+The feed displays three kinds of posts:
+- tickets and reviews from followed users
+- the user's own tickets and reviews
+- the reviews responding to the user's tickets, even if the user doesn't
+follow the author of the review.
+
+Instead of loading every post and filtering it in Python, the three rules
+are expressed as one UNION query ordered by (time_created, id), with one
+branch per author (the user and each followed user, tickets and reviews)
+and one for the responses to the user's tickets. Each branch reads an
+index on (author, time_created) in order, and SQLite merges the branches
+(MERGE (UNION ALL) in the query plan), so it stops reading as soon as the
+page is full instead of sorting every visible post. Only one page of posts
+is read at a time. The position of the last displayed post is handed back
+to the client as an opaque cursor, so the next page starts right after it.
+The cost of a feed request thus depends on the page size and the number
+of followed users, not on the amount of content stored.
+
+The same queries run on the archive tables with archived=True (see
+base/archive.py).
+"""
+
+
+import base64
+import datetime
+from typing import NamedTuple, Optional, Sequence
+
+import base.models as models
+from base.query_budget import extend_budget
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import CharField, Q, QuerySet, Value
+from django.utils.dateparse import parse_datetime
+
+TICKET = "TICKET"
+REVIEW = "REVIEW"
+
+# listings display the excerpts of the posts (see base.models.ExcerptField):
+# the full texts are left in the database.
+LISTING_DEFER = ("description", "body")
+
+# model of each content type, live or archived.
+MODELS = {
+    (TICKET, False): models.Ticket,
+    (REVIEW, False): models.Review,
+    (TICKET, True): models.ArchivedTicket,
+    (REVIEW, True): models.ArchivedReview,
+}
+
+# the feed reads the posts of each author in a branch of its own, up to this
+# many authors (see feed_keys). Building and compiling the query costs about
+# half a millisecond per author; SQLite accepts 500 branches in a UNION.
+MAX_AUTHOR_BRANCHES = 100
+
+
+class Cursor(NamedTuple):
+    """Position of a post in the feed ordering.
+
+    Tickets and reviews live in two tables, so the id alone isn't unique
+    across the feed. The content type breaks the tie between a ticket and a
+    review created at the same time and holding the same id.
+    """
+    time_created: datetime.datetime
+    content_type: str
+    id: int
+
+
+class FeedPage(NamedTuple):
+    """One page of the feed. next_cursor is None on the last page."""
+    posts: list
+    next_cursor: Optional[str]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    raw = (f"{cursor.time_created.isoformat()}|"
+           f"{cursor.content_type}|{cursor.id}")
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """returns None when the token is missing or can't be read. The feed
+    then simply starts from the most recent post."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        time_created, content_type, pk = raw.split("|")
+        time_created = parse_datetime(time_created)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if time_created is None or content_type not in (TICKET, REVIEW):
+        return None
+    return Cursor(time_created, content_type, pk)
+
+
+def _after(cursor: Optional[Cursor], content_type: str) -> Q:
+    """returns the condition selecting, in one branch of the UNION, the
+    posts placed after the cursor in the descending
+    (time_created, content_type, id) ordering.
+
+    The content type is constant within a branch, hence its comparison is
+    made here in Python rather than in SQL.
+    """
+    if cursor is None:
+        return Q()
+    same_time = Q(time_created=cursor.time_created)
+    if content_type == cursor.content_type:
+        same_time &= Q(id__lt=cursor.id)
+    elif content_type > cursor.content_type:
+        # this branch sorts before the cursor's branch at equal time.
+        same_time = Q(pk__in=[])
+    # the redundant upper bound gives SQLite a range to look up in the
+    # (user, time_created) indexes. Without it, the OR below is combined
+    # with the visibility rules and the reviews table is scanned.
+    return Q(time_created__lte=cursor.time_created) & (
+        Q(time_created__lt=cursor.time_created) | same_time)
+
+
+def visible_tickets(user: User, archived: bool = False) -> QuerySet:
+    """tickets posted by the user or by followed users."""
+    followed_users = models.UserFollows.objects.filter(
+        user=user
+    ).values("followed_user")
+    return MODELS[TICKET, archived].objects.filter(
+        Q(user__in=followed_users) | Q(user=user)
+    )
+
+
+def visible_reviews(user: User, archived: bool = False) -> QuerySet:
+    """reviews posted by the user, by followed users or responding to one of
+    the user's tickets."""
+    followed_users = models.UserFollows.objects.filter(
+        user=user
+    ).values("followed_user")
+    return MODELS[REVIEW, archived].objects.filter(
+        Q(user__in=followed_users) | Q(user=user) | Q(ticket_user=user)
+    )
+
+
+def merged_keys(tickets: QuerySet, reviews: QuerySet,
+                cursor: Optional[Cursor] = None,
+                limit: Optional[int] = None,
+                ticket_branches: Sequence[Q] = (Q(),),
+                review_branches: Sequence[Q] = (Q(),)) -> QuerySet:
+    """returns the ordered (id, user_id, time_created, content_type) rows of
+    the given tickets and reviews, after the cursor, as a single UNION
+    query. Each branch reads the tickets or the reviews matching one of the
+    given conditions, which must not overlap."""
+    tickets = tickets.filter(_after(cursor, TICKET)).annotate(
+        content_type=Value(TICKET, CharField())
+    ).values("id", "user_id", "time_created", "content_type")
+    reviews = reviews.filter(_after(cursor, REVIEW)).annotate(
+        content_type=Value(REVIEW, CharField())
+    ).values("id", "user_id", "time_created", "content_type")
+    branches = ([tickets.filter(condition) for condition in ticket_branches]
+                + [reviews.filter(condition) for condition in review_branches])
+    keys = branches[0].union(*branches[1:], all=True).order_by(
+        "-time_created", "-content_type", "-id"
+    )
+    if limit is not None:
+        keys = keys[:limit]
+    return keys
+
+
+def followed_ids(user: User) -> list[int]:
+    return list(models.UserFollows.objects.filter(
+        user=user).values_list("followed_user_id", flat=True))
+
+
+def feed_keys(user: User,
+              cursor: Optional[Cursor] = None,
+              limit: Optional[int] = None,
+              archived: bool = False,
+              followed: Optional[list[int]] = None) -> QuerySet:
+    """returns the ordered keys of the feed. followed, the ids of the users
+    followed by the user, is read when not given.
+
+    The posts of each author are read in their own branches (see the module
+    docstring), past MAX_AUTHOR_BRANCHES authors the remaining ones share a
+    branch, which has to be sorted. The responses to the user's tickets
+    leave out the authors already read, so that no post is returned twice.
+    """
+    if followed is None:
+        followed = followed_ids(user)
+    authors = list(dict.fromkeys([user.id, *followed]))
+    branches = [Q(user_id=author)
+                for author in authors[:MAX_AUTHOR_BRANCHES]]
+    if len(authors) > MAX_AUTHOR_BRANCHES:
+        branches.append(Q(user_id__in=authors[MAX_AUTHOR_BRANCHES:]))
+    responses = Q(ticket_user=user) & ~Q(user=user) & ~Q(
+        user__in=models.UserFollows.objects.filter(
+            user=user).values("followed_user"))
+    return merged_keys(MODELS[TICKET, archived].objects.all(),
+                       MODELS[REVIEW, archived].objects.all(),
+                       cursor, limit, branches, [*branches, responses])
+
+
+def _own_fields(model, names: tuple[str, ...]) -> list[str]:
+    own = {field.name for field in model._meta.get_fields()}
+    return [name for name in names if name in own]
+
+
+def fetch(content_type: str, ids: list[int],
+          defer: tuple[str, ...] = LISTING_DEFER,
+          archived: bool = False) -> dict:
+    """returns the tickets or reviews having the given ids, by id, with one
+    query joined with the rows the snippets display (authors and reviewed
+    ticket), so rendering them doesn't trigger any further query. The
+    fields named in defer aren't loaded, on the models having them and on
+    the reviewed tickets."""
+    if not ids:
+        return {}
+    model = MODELS[content_type, archived]
+    ticket_fields = _own_fields(models.Ticket, defer)
+    if content_type == TICKET:
+        posts = model.objects.select_related("user")
+        deferred = ticket_fields
+    else:
+        posts = model.objects.select_related("user", "ticket__user")
+        deferred = _own_fields(models.Review, defer) + [
+            f"ticket__{name}" for name in ticket_fields]
+    return posts.defer(*deferred).in_bulk(ids)
+
+
+def ordered(keys: list[dict], instances: dict[str, dict]) -> list:
+    """returns the fetched instances in the order of the keys."""
+    posts = []
+    for key in keys:
+        post = instances[key["content_type"]].get(key["id"])
+        if post is None:
+            # deleted between the two queries.
+            continue
+        post.content_type = key["content_type"]
+        posts.append(post)
+    return posts
+
+
+def ids_by_type(keys: list[dict]) -> dict[str, list[int]]:
+    return {content_type: [k["id"] for k in keys
+                           if k["content_type"] == content_type]
+            for content_type in (TICKET, REVIEW)}
+
+
+Tables = dict[tuple[str, bool], list[int]]
+
+
+def ids_by_table(keys: list[dict]) -> Tables:
+    """ids by content type and by whether the keys are marked archived, i.e.
+    by model (see MODELS)."""
+    return {(content_type, archived): [
+                k["id"] for k in keys if k["content_type"] == content_type
+                and k.get("archived", False) == archived]
+            for content_type, archived in MODELS}
+
+
+def fetch_tables(ids: Tables, defer: tuple[str, ...] = LISTING_DEFER
+                 ) -> dict[tuple[str, bool], dict]:
+    """fetch() for each table of ids_by_table."""
+    return {(content_type, archived): fetch(content_type, post_ids, defer,
+                                            archived)
+            for (content_type, archived), post_ids in ids.items()}
+
+
+def missing(ids: Tables, found: dict[tuple[str, bool], dict]) -> Tables:
+    """the ids which weren't found in their table, to look for in the other
+    one: the post was archived, or restored, since its key was read."""
+    return {(content_type, not archived): [
+                post_id for post_id in post_ids
+                if post_id not in found[content_type, archived]]
+            for (content_type, archived), post_ids in ids.items()}
+
+
+def off_hot_path(ids: Tables, retried: Tables) -> int:
+    """number of queries made by hydrate beyond the reads of the live
+    tables: the archived tables and the tables retried."""
+    return sum(1 for (_, archived), post_ids in ids.items()
+               if archived and post_ids) + sum(
+        1 for post_ids in retried.values() if post_ids)
+
+
+def merge_found(*found: dict[tuple[str, bool], dict]) -> dict[str, dict]:
+    """the instances fetched from every table, by content type, as ordered()
+    expects them."""
+    instances = {TICKET: {}, REVIEW: {}}
+    for tables in found:
+        for (content_type, _), posts in tables.items():
+            instances[content_type].update(posts)
+    return instances
+
+
+def hydrate(keys: list[dict],
+            defer: tuple[str, ...] = LISTING_DEFER
+            ) -> list[models.AbstractTicket | models.AbstractReview]:
+    """turns (id, content_type) rows into model instances, keeping their
+    order. Each table holding some of the posts is read with one query (see
+    fetch): the live ones, and the archived ones for the keys marked so by
+    base/archive.py. The posts not found are looked for in the other table,
+    which only costs a query when some are missing. The queries beyond the
+    live tables are added to the budget of the view."""
+    ids = ids_by_table(keys)
+    found = fetch_tables(ids, defer)
+    retried = missing(ids, found)
+    again = fetch_tables(retried, defer)
+    extend_budget(off_hot_path(ids, retried))
+    return ordered(keys, merge_found(found, again))
+
+
+def page_keys(user: User,
+              cursor: Optional[Cursor],
+              page_size: int,
+              followed: Optional[list[int]] = None) -> list[dict]:
+    """returns the keys of one page of the feed, starting after the cursor.
+
+    One extra row is requested to know whether a next page exists without
+    running a COUNT query.
+    """
+    return list(feed_keys(user, cursor, page_size + 1, followed=followed))
+
+
+def get_feed_page(user: User,
+                  cursor: Optional[str] = None,
+                  page_size: Optional[int] = None) -> FeedPage:
+    """returns one page of the user's feed, starting after the cursor."""
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    keys = page_keys(user, decode_cursor(cursor), page_size)
+    return build_page(keys, page_size)
+
+
+def post_keys(user: User,
+              cursor: Optional[Cursor] = None,
+              limit: Optional[int] = None,
+              archived: bool = False) -> QuerySet:
+    """returns the ordered keys of the posts written by the user, as
+    displayed in the posts page."""
+    return merged_keys(MODELS[TICKET, archived].objects.filter(user=user),
+                       MODELS[REVIEW, archived].objects.filter(user=user),
+                       cursor, limit)
+
+
+def split_page(keys: list[dict],
+               page_size: int) -> tuple[list[dict], Optional[str]]:
+    """keys may hold one extra row, in which case it is dropped and a cursor
+    pointing to the last kept post is returned along with the kept keys."""
+    next_cursor = None
+    if len(keys) > page_size:
+        keys = keys[:page_size]
+        last = keys[-1]
+        next_cursor = encode_cursor(
+            Cursor(last["time_created"], last["content_type"], last["id"])
+        )
+    return keys, next_cursor
+
+
+def build_page(keys: list[dict], page_size: int) -> FeedPage:
+    """hydrates up to page_size keys, see split_page."""
+    keys, next_cursor = split_page(keys, page_size)
+    return FeedPage(hydrate(keys), next_cursor)
@@ -0,0 +1,184 @@
+"""Per-user cache of the ordered post keys displayed in the feed and posts
+pages.
+
+Only the ordered (content_type, id, time_created) keys are cached, not the
+posts themselves, which are fetched by primary key (see base.feed.hydrate).
+The pages reaching the archive boundary include the archived posts (see
+base/archive.py).
+
+Every entry of a user is stored under a key holding his current version
+number. Invalidating a user comes down to dropping his version key: his
+next request picks a new version and the old entries are never read
+again, they simply expire. The receivers in base/signals.py drop the
+versions of the users affected by a write, and only theirs, once the write
+is committed. Edits are
+included even though they don't change the lists: the version then tells
+whether anything displayed in a user's pages changed, which the
+conditional GET of base/conditional.py relies on.
+
+The cache used is the "feed" alias of settings.CACHES. It must be shared
+by every process serving requests, or the invalidations made by one would
+not reach the others. Hits and misses are counted in the same cache.
+"""
+
+
+import time
+from typing import Iterable, Optional
+
+import base.archive as archive
+import base.feed as feed
+import base.models as models
+import base.timeline as timeline
+from base.query_budget import extend_budget
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+
+HITS = "feedcache:hits"
+MISSES = "feedcache:misses"
+BATCH_SIZE = 1000
+
+
+def _cache():
+    return caches["feed"]
+
+
+def _version_key(user_id: int) -> str:
+    return f"feedcache:{user_id}:version"
+
+
+def version(user_id: int) -> int:
+    """returns the user's current version, picking a new one if it was
+    dropped. Versions are nanosecond timestamps."""
+    cache = _cache()
+    current = cache.get(_version_key(user_id))
+    if current is None:
+        # a timestamp can't collide with a version used before the drop.
+        current = time.time_ns()
+        cache.add(_version_key(user_id), current, timeout=None)
+        current = cache.get(_version_key(user_id), current)
+    return current
+
+
+def _count(counter: str) -> None:
+    cache = _cache()
+    try:
+        cache.incr(counter)
+    except ValueError:
+        cache.add(counter, 1, timeout=None)
+
+
+def _cached(key: str, compute):
+    cache = _cache()
+    value = cache.get(key)
+    if value is not None:
+        _count(HITS)
+        return value
+    _count(MISSES)
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+def _token(position: Optional[feed.Cursor]) -> str:
+    return feed.encode_cursor(position) if position else "first"
+
+
+def _feed_keys(user: User, position: Optional[feed.Cursor],
+               page_size: int) -> list[dict]:
+    """the live keys of the page, completed by the archived ones. In pull
+    mode, the followed users are read once for both."""
+    followed = None
+    if timeline.is_enabled():
+        keys = timeline.page_keys(user, position, page_size)
+    else:
+        followed = feed.followed_ids(user)
+        keys = feed.page_keys(user, position, page_size, followed)
+
+    def archived_keys():
+        nonlocal followed
+        if followed is None:
+            extend_budget(1)
+            followed = feed.followed_ids(user)
+        return feed.feed_keys(user, position, page_size + 1,
+                              archived=True, followed=followed)
+    return archive.complete(keys, page_size + 1, archived_keys)
+
+
+def feed_page_keys(user: User, cursor: Optional[str],
+                   page_size: int) -> list[dict]:
+    """returns the keys of one page of the feed, plus the sentinel row (see
+    base.feed.split_page). Works with both the pull and the push engines."""
+    position = feed.decode_cursor(cursor)
+    key = (f"feedcache:{user.id}:{version(user.id)}:feed:{page_size}:"
+           f"{_token(position)}")
+    return _cached(key, lambda: _feed_keys(user, position, page_size))
+
+
+def post_page_keys(user: User, cursor: Optional[str],
+                   page_size: int) -> list[dict]:
+    """same as feed_page_keys, for the posts written by the user."""
+    position = feed.decode_cursor(cursor)
+    key = (f"feedcache:{user.id}:{version(user.id)}:posts:{page_size}:"
+           f"{_token(position)}")
+    return _cached(key, lambda: archive.complete(
+        list(feed.post_keys(user, position, page_size + 1)), page_size + 1,
+        lambda: feed.post_keys(user, position, page_size + 1,
+                               archived=True)))
+
+
+def get_feed_page(user: User,
+                  cursor: Optional[str] = None,
+                  page_size: Optional[int] = None) -> feed.FeedPage:
+    """same contract as base.feed.get_feed_page."""
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    return feed.build_page(feed_page_keys(user, cursor, page_size),
+                           page_size)
+
+
+def get_post_page(user: User,
+                  cursor: Optional[str] = None,
+                  page_size: Optional[int] = None) -> feed.FeedPage:
+    """same as get_feed_page, for the posts written by the user."""
+    page_size = page_size or settings.POSTS_PAGE_SIZE
+    return feed.build_page(post_page_keys(user, cursor, page_size),
+                           page_size)
+
+
+def invalidate(user_ids: Iterable[int]) -> None:
+    """drops the cached feed and posts of the given users, once the current
+    transaction, if any, is committed. Dropped before, a page read in
+    between would be cached again under the new version, from the data
+    preceding the write."""
+    transaction.on_commit(lambda: _drop_versions(user_ids))
+
+
+def _drop_versions(user_ids: Iterable[int]) -> None:
+    batch = []
+    for user_id in user_ids:
+        batch.append(_version_key(user_id))
+        if len(batch) >= BATCH_SIZE:
+            _cache().delete_many(batch)
+            batch = []
+    if batch:
+        _cache().delete_many(batch)
+
+
+def invalidate_followers(author_ids: Iterable[int]) -> None:
+    """drops the caches of the followers of the given authors."""
+    followers = models.UserFollows.objects.filter(
+        followed_user_id__in=list(author_ids)
+    ).values_list("user_id", flat=True).distinct().iterator(
+        chunk_size=BATCH_SIZE)
+    invalidate(followers)
+
+
+def stats() -> dict:
+    cache = _cache()
+    hits = cache.get(HITS, 0)
+    misses = cache.get(MISSES, 0)
+    total = hits + misses
+    return {"hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else None}
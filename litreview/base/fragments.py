@@ -0,0 +1,72 @@
+"""Cache of the rendered body of the ticket and review snippets.
+
+A snippet starts with a line depending on who reads it ("You requested a
+review" or "<user> requested a review"), rendered every time, followed by
+the body of the post, identical for every reader. The body is rendered once
+from base/ticket_body.html or base/review_body.html and then read from the
+"fragments" alias of settings.CACHES by the post_body template tag.
+
+Bodies are stored under the id of the post and a digest of the values the
+body template reads (see FIELDS), taken from the post being rendered. An
+edit, a new review changing the rating of a ticket or a recomputed counter
+thus leads to a new key, which the next reader fills. The key follows the
+row each reader loaded: a reader holding a post loaded before an edit
+stores the old body under the old digest, which the readers of the edited
+post never ask for, whichever process they run in. Bodies no longer read
+simply expire.
+"""
+
+
+import hashlib
+
+import base.feed as feed
+import base.models as models
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+TEMPLATES = {
+    feed.TICKET: "base/ticket_body.html",
+    feed.REVIEW: "base/review_body.html",
+}
+
+# what the templates display, besides the id of the post. Listings load
+# these fields (see base.feed.fetch), so reading them costs no query.
+FIELDS = {
+    feed.TICKET: ("time_created", "title", "description_excerpt",
+                  "review_count", "rating_sum"),
+    feed.REVIEW: ("time_created", "headline", "rating", "body_excerpt",
+                  "ticket.title", "ticket.user.username"),
+}
+
+
+def _cache():
+    return caches["fragments"]
+
+
+def _value(post, path: str):
+    for name in path.split("."):
+        post = getattr(post, name)
+    return post
+
+
+def _digest(content_type: str, post) -> str:
+    values = repr([_value(post, path) for path in FIELDS[content_type]])
+    return hashlib.md5(values.encode(), usedforsecurity=False).hexdigest()
+
+
+def content_type_of(post) -> str:
+    return (feed.TICKET if isinstance(post, models.AbstractTicket)
+            else feed.REVIEW)
+
+
+def render_body(post) -> SafeString:
+    """returns the body of the post's snippet, rendering it on a miss."""
+    content_type = content_type_of(post)
+    cache = _cache()
+    key = f"fragment:{content_type}:{post.id}:{_digest(content_type, post)}"
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(TEMPLATES[content_type], {"post": post})
+        cache.set(key, html)
+    return mark_safe(html)
@@ -0,0 +1,194 @@
+"""Durable queue of background jobs, stored in the database.
+
+Some writes triggered by a post reach an unbounded number of rows: the
+feed caches of every follower of the author, the push-mode timelines, the
+recomputation of a ticket's aggregates. The receivers of base/signals.py
+hand them to enqueue() instead of running them. With
+settings.BACKGROUND_JOBS set to True, enqueue() only inserts a Job row, in
+the transaction of the request, and `python manage.py run_jobs` workers
+run the jobs; the request returns without waiting for them. Otherwise (the
+default, convenient in development) the job runs right away.
+
+Jobs are run by handlers, registered by kind with the handler decorator
+next to the code they call. A handler receives the payloads of several
+jobs of its kind, which lets it merge them, e.g. invalidate the followers
+of many authors with one query.
+
+- Claiming: a worker claims up to JOB_BATCH_SIZE due jobs with a single
+UPDATE storing its claim token and the end of its lease. UPDATE statements
+are serialized by SQLite, and re-check their condition on locked rows on
+other databases, so two workers never claim the same job. The jobs of a
+worker which died are claimed again once its lease expired.
+- Retries: a job whose handler raised is retried after JOB_RETRY_DELAY,
+doubled at each attempt, and kept with failed_at set after
+JOB_MAX_ATTEMPTS attempts. When a batch fails, its jobs are run one by one,
+so that one failing job doesn't hold back the others.
+- A job is deleted in the transaction of its handler, by its claim token:
+its database writes are made exactly once. When the batch ran past its
+lease and another worker claimed some of its jobs, the transaction is
+rolled back and the other worker's run counts. Cache writes may be made
+again if the worker dies in between, handlers must tolerate it.
+"""
+
+
+import datetime
+import logging
+import time
+import traceback
+import uuid
+from collections import defaultdict
+from typing import Callable, Optional
+
+import base.models as models
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[list[dict]], None]
+HANDLERS: dict[str, Handler] = {}
+
+
+class LeaseExpired(Exception):
+    """Raised, to roll a batch back, when some of its jobs were claimed by
+    another worker while it ran."""
+
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    """registers the decorated function as the handler of the jobs of the
+    given kind. It receives the list of their payloads."""
+    def register(function: Handler) -> Handler:
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(kind: str, payload: dict) -> None:
+    """runs the job in the background, or right away when
+    settings.BACKGROUND_JOBS is False. The payload must be JSON
+    serializable."""
+    if kind not in HANDLERS:
+        raise KeyError(f"no handler for {kind} jobs")
+    if not settings.BACKGROUND_JOBS:
+        HANDLERS[kind]([payload])
+        return
+    models.Job.objects.create(kind=kind, payload=payload,
+                              run_after=timezone.now())
+
+
+def _due(now: datetime.datetime) -> Q:
+    return (Q(failed_at__isnull=True, run_after__lte=now)
+            & (Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)))
+
+
+def oldest_due(now: datetime.datetime, limit: int) -> QuerySet:
+    """ids of the limit jobs due for the longest time."""
+    return models.Job.objects.filter(_due(now)).order_by(
+        "run_after", "id").values("id")[:limit]
+
+
+def claim(worker: str, limit: int) -> list[models.Job]:
+    """claims up to limit due jobs, oldest first, for the worker."""
+    now = timezone.now()
+    token = f"{worker}:{uuid.uuid4().hex}"[-64:]
+    # the condition is repeated on the rows being updated, see the module
+    # docstring.
+    claimed = models.Job.objects.filter(
+        _due(now), id__in=oldest_due(now, limit)).update(
+        claimed_by=token,
+        claimed_until=now + datetime.timedelta(
+            seconds=settings.JOB_LEASE_SECONDS),
+    )
+    if not claimed:
+        return []
+    return list(models.Job.objects.filter(claimed_by=token).order_by("id"))
+
+
+def _retry_delay(attempts: int) -> datetime.timedelta:
+    return datetime.timedelta(
+        seconds=settings.JOB_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def _failed(job: models.Job, error: str) -> None:
+    attempts = job.attempts + 1
+    now = timezone.now()
+    outcome = {"run_after": now + _retry_delay(attempts)}
+    if attempts >= settings.JOB_MAX_ATTEMPTS:
+        outcome = {"failed_at": now}
+        logger.error("%s job %s failed %s times, giving up:\n%s",
+                     job.kind, job.id, attempts, error)
+    else:
+        logger.warning("%s job %s failed, retrying:\n%s",
+                       job.kind, job.id, error)
+    # a job whose lease expired may have been claimed by another worker.
+    models.Job.objects.filter(id=job.id, claimed_by=job.claimed_by).update(
+        attempts=F("attempts") + 1, claimed_by="", claimed_until=None,
+        last_error=error, **outcome)
+
+
+def _run_batch(kind: str, jobs: list[models.Job]) -> int:
+    """runs the jobs with one call to their handler, then one by one if it
+    failed. Returns the number of jobs done."""
+    try:
+        with transaction.atomic():
+            HANDLERS[kind]([job.payload for job in jobs])
+            deleted, _ = models.Job.objects.filter(
+                id__in=[job.id for job in jobs],
+                claimed_by=jobs[0].claimed_by).delete()
+            if deleted != len(jobs):
+                raise LeaseExpired(
+                    f"{len(jobs) - deleted} {kind} jobs were claimed again")
+        return len(jobs)
+    except LeaseExpired as error:
+        logger.warning("%s, rolled back", error)
+        return 0
+    except Exception:
+        if len(jobs) == 1:
+            _failed(jobs[0], traceback.format_exc())
+            return 0
+    return sum(_run_batch(kind, [job]) for job in jobs)
+
+
+def run(jobs: list[models.Job]) -> int:
+    """runs claimed jobs, grouped by kind, and returns the number done."""
+    by_kind = defaultdict(list)
+    for job in jobs:
+        by_kind[job.kind].append(job)
+    done = 0
+    for kind, batch in by_kind.items():
+        if kind not in HANDLERS:
+            for job in batch:
+                _failed(job, f"no handler for {kind} jobs")
+            continue
+        done += _run_batch(kind, batch)
+    return done
+
+
+def work(worker: str, batch_size: Optional[int] = None,
+         poll_interval: float = 1.0, once: bool = False) -> int:
+    """claims and runs jobs until interrupted, sleeping poll_interval
+    seconds whenever none is due. With once, returns as soon as no job is
+    due. Returns the number of jobs done."""
+    batch_size = batch_size or settings.JOB_BATCH_SIZE
+    done = 0
+    while True:
+        jobs = claim(worker, batch_size)
+        if jobs:
+            done += run(jobs)
+        elif once:
+            return done
+        else:
+            time.sleep(poll_interval)
+
+
+def stats() -> dict:
+    now = timezone.now()
+    jobs = models.Job.objects
+    return {"due": jobs.filter(_due(now)).count(),
+            "claimed": jobs.filter(failed_at__isnull=True,
+                                   claimed_until__gte=now).count(),
+            "waiting": jobs.filter(failed_at__isnull=True,
+                                   run_after__gt=now).count(),
+            "failed": jobs.filter(failed_at__isnull=False).count()}
@@ -0,0 +1,45 @@
+"""Moves the old tickets and reviews to the archive tables, see
+base/archive.py.
+
+An interrupted run (killed, or stopped by --max-batches) is resumed by the
+next one, with the cutoff it started with; --days only applies to new
+runs.
+"""
+
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+import base.archive as archive
+
+
+class Command(BaseCommand):
+    help = "Archives the tickets and reviews older than ARCHIVE_AFTER_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=None,
+                            help="age of the posts to archive "
+                                 "(ARCHIVE_AFTER_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="tickets moved per transaction "
+                                 "(ARCHIVE_BATCH_SIZE)")
+        parser.add_argument("--max-batches", type=int, default=None,
+                            help="stop after this many batches, the run "
+                                 "being resumed next time")
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options["days"] is not None:
+            cutoff = timezone.now() - datetime.timedelta(days=options["days"])
+        start = time.perf_counter()
+        run = archive.archive(cutoff, options["batch_size"],
+                              options["max_batches"])
+        elapsed = time.perf_counter() - start
+        state = "finished" if run.finished_at else "to be resumed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{run.tickets} tickets and {run.reviews} reviews older than "
+            f"{run.cutoff:%Y-%m-%d %H:%M} archived so far, run {state}, "
+            f"in {elapsed:.1f}s."))
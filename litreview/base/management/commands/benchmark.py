@@ -0,0 +1,90 @@
+"""Benchmarks the views of base at several dataset sizes, see
+base/benchmark.py. Results are written to a JSON file so that runs made
+before and after a change can be compared."""
+
+
+import datetime
+import io
+import json
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+import base.benchmark as benchmark
+import base.synthetic as synthetic
+import base.timeline as timeline
+
+
+class Command(BaseCommand):
+    help = ("Measures latency percentiles, query counts and peak memory of "
+            "the feed, posts, following and follow views.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000",
+                            help="comma-separated numbers of users")
+        parser.add_argument("--follows-per-user", type=float, default=10)
+        parser.add_argument("--tickets-per-user", type=float, default=5)
+        parser.add_argument("--reviews-per-user", type=float, default=5)
+        parser.add_argument("--views", default=",".join(benchmark.VIEWS),
+                            help="comma-separated views to benchmark")
+        parser.add_argument("--repeat", type=int, default=50,
+                            help="requests per view and size")
+        parser.add_argument("--sample-users", type=int, default=10)
+        parser.add_argument("--cold-cache", action="store_true",
+                            help="clear the feed cache before each request")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark.json")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        views = options["views"].split(",")
+        report = {
+            "started_at": datetime.datetime.now().isoformat(),
+            "feed_mode": settings.FEED_MODE,
+            "cold_cache": options["cold_cache"],
+            "runs": [],
+        }
+        setup_test_environment()
+        try:
+            with benchmark.benchmark_database():
+                for size in sizes:
+                    report["runs"].append(self.run(size, views, options))
+        finally:
+            teardown_test_environment()
+
+        with open(options["output"], "w") as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Results written to {options['output']}"))
+
+    def run(self, size, views, options):
+        call_command("flush", interactive=False, verbosity=0)
+        benchmark.clear_cache("feed")
+        created = synthetic.generate(
+            synthetic.Sizes(size, options["follows_per_user"],
+                            options["tickets_per_user"],
+                            options["reviews_per_user"]),
+            seed=options["seed"],
+        )
+        call_command("repair_counters", stdout=io.StringIO())
+        if timeline.is_enabled():
+            call_command("rebuild_timelines", stdout=io.StringIO())
+        users = benchmark.sample_users(options["sample_users"],
+                                       options["seed"])
+        self.stdout.write("dataset: " + ", ".join(
+            f"{n} {model}" for model, n in created.items()))
+        results = {}
+        for view in views:
+            results[view] = benchmark.measure(
+                benchmark.VIEWS[view], users, options["repeat"],
+                options["cold_cache"])
+            r = results[view]
+            self.stdout.write(
+                f"  {view:<10} p50 {r['p50_ms']:>8} ms  "
+                f"p99 {r['p99_ms']:>8} ms  "
+                f"queries {r['queries_avg']:>6}  "
+                f"peak {r['peak_memory_kb']:>8} KiB")
+        return {"dataset": created, "views": results}
@@ -0,0 +1,87 @@
+"""Compares the synchronous views served through WSGI with their
+asynchronous versions (base/async_views.py) served through ASGI.
+
+Both handlers are driven in process, without network, by the same number
+of concurrent clients: threads for WSGI, tasks of one event loop for ASGI
+(see base.benchmark). The database is a fresh SQLite file filled with
+synthetic data, so that the threads share it.
+"""
+
+
+import datetime
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+
+import base.benchmark as benchmark
+import base.synthetic as synthetic
+
+
+class Command(BaseCommand):
+    help = "Measures the throughput of the sync (WSGI) and async (ASGI) views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--clients", default="1,8,32",
+                            help="comma-separated numbers of clients")
+        parser.add_argument("--requests", type=int, default=20,
+                            help="requests sent by each client")
+        parser.add_argument("--pages", default=",".join(
+            benchmark.ASYNC_PAGES))
+        parser.add_argument("--cold-cache", action="store_true",
+                            help="clear the feed cache before each request")
+        parser.add_argument("--output", default="benchmark_async.json")
+
+    def handle(self, *args, **options):
+        report = {
+            "started_at": datetime.datetime.now().isoformat(),
+            "sqlite_profile": settings.SQLITE_PROFILE,
+            "cold_cache": options["cold_cache"],
+            "runs": [],
+        }
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as directory, \
+                    benchmark.benchmark_database(
+                        os.path.join(directory, "benchmark.sqlite3")):
+                synthetic.generate(synthetic.Sizes(options["users"]))
+                call_command("repair_counters", stdout=io.StringIO())
+                users = benchmark.sample_users(10)
+                for page in options["pages"].split(","):
+                    for clients in map(int, options["clients"].split(",")):
+                        report["runs"].append(
+                            self.run(page, clients, users, options))
+        finally:
+            teardown_test_environment()
+
+        with open(options["output"], "w") as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Results written to {options['output']}"))
+
+    def run(self, page, clients, users, options):
+        sync_name, async_name = benchmark.ASYNC_PAGES[page]
+        arguments = (users, clients, options["requests"],
+                     options["cold_cache"])
+        run = {
+            "page": page,
+            "clients": clients,
+            "wsgi": benchmark.wsgi_throughput(reverse(sync_name), *arguments),
+            "asgi": benchmark.asgi_throughput(reverse(async_name),
+                                              *arguments),
+        }
+        self.stdout.write(
+            f"{page}, {clients} clients: "
+            f"WSGI {run['wsgi']['per_second']}/s "
+            f"(p99 {run['wsgi']['p99_ms']} ms), "
+            f"ASGI {run['asgi']['per_second']}/s "
+            f"(p99 {run['asgi']['p99_ms']} ms)")
+        return run
@@ -0,0 +1,88 @@
+"""Compares the ways of loading the session and the user of a request (see
+base.benchmark.SESSION_PROFILES and base/user_cache.py) on the views of
+base, in a throw-away test database filled with synthetic data. For each
+profile and view, prints the queries and milliseconds per request saved
+against the first profile, which reads both from the database."""
+
+
+import datetime
+import io
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+import base.benchmark as benchmark
+import base.synthetic as synthetic
+
+
+class Command(BaseCommand):
+    help = ("Measures the queries and latency saved by cached sessions and "
+            "cached users on the views of base.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--profiles", default=",".join(
+            benchmark.SESSION_PROFILES),
+            help="comma-separated profiles, the first one is the baseline")
+        parser.add_argument("--views", default=",".join(benchmark.VIEWS),
+                            help="comma-separated views to benchmark")
+        parser.add_argument("--repeat", type=int, default=200,
+                            help="requests per view and profile")
+        parser.add_argument("--sample-users", type=int, default=10)
+        parser.add_argument("--output", default="benchmark_sessions.json")
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"].split(",")
+        views = options["views"].split(",")
+        report = {
+            "started_at": datetime.datetime.now().isoformat(),
+            "users": options["users"],
+            "profiles": {},
+        }
+        setup_test_environment()
+        try:
+            with benchmark.benchmark_database():
+                synthetic.generate(synthetic.Sizes(options["users"]))
+                call_command("repair_counters", stdout=io.StringIO())
+                users = benchmark.sample_users(options["sample_users"])
+                for profile in profiles:
+                    report["profiles"][profile] = self.run(
+                        profile, views, users, options)
+        finally:
+            teardown_test_environment()
+
+        baseline = report["profiles"][profiles[0]]
+        for profile in profiles[1:]:
+            for view in views:
+                self.compare(profile, view, baseline[view],
+                             report["profiles"][profile][view])
+
+        with open(options["output"], "w") as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Results written to {options['output']}"))
+
+    def run(self, profile, views, users, options):
+        benchmark.clear_cache("auth")
+        results = {}
+        with override_settings(**benchmark.session_settings(profile)):
+            for view in views:
+                results[view] = benchmark.measure(
+                    benchmark.VIEWS[view], users, options["repeat"])
+                r = results[view]
+                self.stdout.write(
+                    f"{profile:<26} {view:<10} p50 {r['p50_ms']:>8} ms  "
+                    f"queries {r['queries_avg']:>6}")
+        return results
+
+    def compare(self, profile, view, baseline, result):
+        r = result
+        r["saved_queries"] = round(
+            baseline["queries_avg"] - r["queries_avg"], 2)
+        r["saved_p50_ms"] = round(baseline["p50_ms"] - r["p50_ms"], 3)
+        self.stdout.write(
+            f"{profile:<26} {view:<10} saves {r['saved_queries']:>5} "
+            f"queries, {r['saved_p50_ms']:>7} ms per request (p50)")
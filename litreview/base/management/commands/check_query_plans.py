@@ -0,0 +1,44 @@
+"""Fails when one of the hot queries would read a whole table.
+
+See base/query_plans.py. Meant to be run after changing a query or an
+index, and in continuous integration: the exit status is non-zero when a
+full table scan, or a paginated listing sorting all its rows, is found.
+Plans are read on a freshly migrated test database, unless
+--current-database is given (plans may then differ, as SQLite takes the
+statistics gathered by ANALYZE into account).
+"""
+
+
+from django.core.management.base import BaseCommand, CommandError
+
+import base.benchmark as benchmark
+import base.query_plans as query_plans
+
+
+class Command(BaseCommand):
+    help = "Checks that the hot queries are served by indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--current-database", action="store_true",
+                            help="read the plans on the configured database.")
+
+    def handle(self, *args, **options):
+        if options["current_database"]:
+            plans = query_plans.check()
+        else:
+            with benchmark.benchmark_database():
+                plans = query_plans.check()
+        failures = [plan for plan in plans if plan.problems]
+        for plan in plans:
+            status = ("FULL SCAN" if plan.scans else
+                      "FULL SORT" if plan.sorts else "ok")
+            self.stdout.write(f"{plan.name}: {status}")
+            if plan.problems or options["verbosity"] > 1:
+                for line in plan.lines:
+                    self.stdout.write(f"    {line}")
+        if failures:
+            raise CommandError(
+                f"{len(failures)} of {len(plans)} queries scan a whole table "
+                f"or sort every row of a listing.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(plans)} queries served by indexes."))
@@ -0,0 +1,36 @@
+"""Computes the follow suggestions of base/suggestions.py.
+
+By default, only the users whose suggestions may have changed since the
+last run are computed again. --full recomputes every user, which is needed
+after importing follows without signals (generate_data, import_data).
+"""
+
+
+import time
+
+from django.core.management.base import BaseCommand
+
+import base.suggestions as suggestions
+
+
+class Command(BaseCommand):
+    help = "Computes the friends-of-friends follow suggestions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="recompute every user")
+        parser.add_argument("--top-k", type=int, default=None,
+                            help="suggestions stored per user "
+                                 "(SUGGESTIONS_TOP_K)")
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="users computed per transaction "
+                                 "(SUGGESTIONS_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = suggestions.refresh(options["full"], options["top_k"],
+                                     options["chunk_size"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['suggestions']} suggestions for {result['users']} "
+            f"users, from {result['follows']} follows, in {elapsed:.1f}s."))
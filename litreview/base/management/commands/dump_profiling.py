@@ -0,0 +1,45 @@
+"""Prints the request profiles recorded by base.profiling.ProfilingMiddleware.
+
+Each server process writes its histograms to PROFILING_DIR every
+PROFILING_FLUSH_INTERVAL seconds; they are merged here. Percentiles are
+estimated from the histogram buckets, hence they are upper bounds.
+"""
+
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import base.profiling as profiling
+
+
+class Command(BaseCommand):
+    help = "Prints the per-route request profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=("table", "prometheus"),
+                            default="table")
+        parser.add_argument("--dir", default=settings.PROFILING_DIR,
+                            help="directory holding the profiling dumps.")
+
+    def handle(self, *args, **options):
+        routes = profiling.load_dumps(options["dir"])
+        if options["format"] == "prometheus":
+            self.stdout.write(profiling.prometheus_text(routes), ending="")
+            return
+        if not routes:
+            self.stdout.write("No profile recorded. Is PROFILING enabled?")
+            return
+        self.stdout.write(
+            f"{'route':<30} {'requests':>8} {'view p50':>9} {'view p99':>9} "
+            f"{'sql ms':>8} {'queries':>8} {'tpl ms':>8}")
+        for route in sorted(routes):
+            metrics = routes[route]
+            view = metrics["view_seconds"]
+            count = max(view.count, 1)
+            self.stdout.write(
+                f"{route:<30} {view.count:>8} "
+                f"{view.quantile(0.5) * 1000:>7.0f}ms "
+                f"{view.quantile(0.99) * 1000:>7.0f}ms "
+                f"{metrics['sql_seconds'].sum / count * 1000:>8.1f} "
+                f"{metrics['sql_queries'].sum / count:>8.1f} "
+                f"{metrics['template_seconds'].sum / count * 1000:>8.1f}")
@@ -0,0 +1,38 @@
+"""Streams a table out as JSON Lines or CSV, see base/transfer.py."""
+
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+import base.transfer as transfer
+
+
+class Command(BaseCommand):
+    help = ("Exports tickets, reviews (live or archived) or follows with "
+            "constant memory use.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=list(transfer.TABLES))
+        parser.add_argument("--output", default="-",
+                            help="file to write, standard output by default")
+        parser.add_argument("--format", choices=["jsonl", "csv"],
+                            help="guessed from the output extension, jsonl "
+                                 "by default")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output_path = options["output"]
+        file_format = options["format"] or (
+            "csv" if output_path.endswith(".csv") else "jsonl")
+        progress = transfer.Progress(options["table"], sys.stderr)
+        rows = transfer.export_rows(options["table"], options["chunk_size"])
+        if output_path == "-":
+            transfer.write(rows, options["table"], sys.stdout, file_format,
+                           progress)
+        else:
+            with open(output_path, "w", newline="",
+                      encoding="utf-8") as output:
+                transfer.write(rows, options["table"], output, file_format,
+                               progress)
+        progress.report()
@@ -0,0 +1,40 @@
+"""Fills the database with synthetic data, see base/synthetic.py."""
+
+
+from django.core.management.base import BaseCommand
+
+import base.synthetic as synthetic
+
+
+class Command(BaseCommand):
+    help = ("Creates users following each other along a power-law graph, "
+            "plus tickets and reviews spread over time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--follows-per-user", type=float, default=10)
+        parser.add_argument("--tickets-per-user", type=float, default=5)
+        parser.add_argument("--reviews-per-user", type=float, default=5)
+        parser.add_argument("--days", type=int, default=365,
+                            help="time span of the posts")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--prefix", default="user",
+                            help="prefix of the generated usernames")
+
+    def handle(self, *args, **options):
+        sizes = synthetic.Sizes(options["users"],
+                                options["follows_per_user"],
+                                options["tickets_per_user"],
+                                options["reviews_per_user"],
+                                options["days"])
+        created = synthetic.generate(sizes, options["seed"],
+                                     options["batch_size"],
+                                     options["prefix"], self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            "Created " + ", ".join(f"{n} {model}"
+                                   for model, n in created.items())))
+        self.stdout.write(
+            f"Every generated user's password is {synthetic.PASSWORD!r}.")
+        self.stdout.write("Run repair_counters (and rebuild_timelines in "
+                          "push mode) to update the derived data.")
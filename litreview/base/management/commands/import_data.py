@@ -0,0 +1,60 @@
+"""Loads a JSON Lines or CSV file made by export_data, see
+base/transfer.py."""
+
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+import base.transfer as transfer
+
+
+class Command(BaseCommand):
+    help = ("Imports tickets, reviews (live or archived) or follows by "
+            "batches, resolving users by username.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=list(transfer.TABLES))
+        parser.add_argument("input", help="file to read, - for standard input")
+        parser.add_argument("--format", choices=["jsonl", "csv"],
+                            help="guessed from the input extension, jsonl "
+                                 "by default")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--create-users", action="store_true",
+                            help="create the users missing from the DB "
+                                 "instead of skipping their rows")
+        parser.add_argument("--skip-existing", action="store_true",
+                            help="ignore the follows already in the DB")
+
+    def handle(self, *args, **options):
+        input_path = options["input"]
+        file_format = options["format"] or (
+            "csv" if input_path.endswith(".csv") else "jsonl")
+        progress = transfer.Progress(options["table"], self.stderr)
+        resolver = transfer.UserResolver(options["create_users"])
+
+        def run(source):
+            return transfer.import_rows(
+                transfer.read(source, file_format), options["table"],
+                options["batch_size"], resolver, options["skip_existing"],
+                progress)
+
+        try:
+            if input_path == "-":
+                skipped = run(sys.stdin)
+            else:
+                with open(input_path, newline="",
+                          encoding="utf-8") as source:
+                    skipped = run(source)
+        except transfer.ImportRefused as error:
+            raise CommandError(error)
+        except IntegrityError as error:
+            raise CommandError(f"nothing imported, the rows break a "
+                               f"constraint: {error}")
+        progress.report()
+        if skipped:
+            self.stderr.write(f"{skipped} rows skipped: unknown user.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{progress.count - skipped} rows imported. Run repair_counters "
+            f"(and rebuild_timelines in push mode) to update derived data."))
@@ -0,0 +1,19 @@
+"""Rebuilds the full-text index of tickets and reviews, see base/search.py.
+"""
+
+
+from django.core.management.base import BaseCommand
+
+import base.search as search
+
+
+class Command(BaseCommand):
+    help = "Reindexes every ticket and review, by batches of primary keys."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int,
+                            default=search.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = search.rebuild(options["batch_size"], self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"{total} posts indexed."))
@@ -0,0 +1,31 @@
+"""Recomputes the push-mode timelines (see base/timeline.py) from scratch.
+
+Run it before switching settings.FEED_MODE from "pull" to "push", or
+whenever timelines may have drifted from the visibility rules.
+"""
+
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+import base.timeline as timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the feed timeline of every user (or of the given users)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*",
+                            help="only rebuild the timelines of these users")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+        total = 0
+        for user in users.iterator():
+            written = timeline.rebuild(user)
+            total += written
+            self.stdout.write(f"{user.username}: {written} entries")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} timeline entries written."))
@@ -0,0 +1,24 @@
+"""Recomputes the denormalized counters from the rows they count.
+
+Needed after inserting rows without going through the ORM signals, e.g.
+after generate_data, or if counters have drifted.
+"""
+
+
+from django.core.management.base import BaseCommand
+
+import base.ticket_stats as ticket_stats
+import base.user_stats as user_stats
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the follower and following counts of every user, "
+            "and the review aggregates of every ticket.")
+
+    def handle(self, *args, **options):
+        updated = user_stats.repair()
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} user stats recomputed."))
+        updated = ticket_stats.repair()
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} ticket aggregates recomputed."))
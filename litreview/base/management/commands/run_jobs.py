@@ -0,0 +1,43 @@
+"""Runs the background jobs of base/jobs.py.
+
+Start as many workers as needed, on one or several machines sharing the
+database: each claims its own jobs. With --once, the worker exits as soon
+as no job is due, e.g. to drain the queue from a cron job or a deployment
+script. --stats prints the number of jobs per state and exits.
+"""
+
+
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+
+import base.jobs as jobs
+
+
+class Command(BaseCommand):
+    help = "Claims and runs background jobs until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="jobs claimed at once (JOB_BATCH_SIZE)")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="seconds to wait when no job is due")
+        parser.add_argument("--once", action="store_true",
+                            help="exit as soon as no job is due")
+        parser.add_argument("--stats", action="store_true",
+                            help="print the number of jobs per state")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for state, count in jobs.stats().items():
+                self.stdout.write(f"{state}: {count}")
+            return
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        try:
+            done = jobs.work(worker, options["batch_size"],
+                             options["poll_interval"], options["once"])
+        except KeyboardInterrupt:
+            # the claimed jobs are claimed again once their lease expired.
+            return
+        self.stdout.write(self.style.SUCCESS(f"{done} jobs done."))
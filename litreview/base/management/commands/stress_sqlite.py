@@ -0,0 +1,60 @@
+"""Compares the SQLite profiles of base/sqlite.py under concurrent load.
+
+For each profile, a fresh database file is filled with synthetic data, then
+writer threads post tickets while reader threads read feeds (see
+base.benchmark.stress). Throughput, latencies and "database is locked"
+errors are printed per profile and written to a JSON file.
+"""
+
+
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+import base.benchmark as benchmark
+import base.sqlite as sqlite
+import base.synthetic as synthetic
+
+
+class Command(BaseCommand):
+    help = "Measures write throughput and lock errors of the SQLite profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default=",".join(sqlite.PROFILES))
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--output", default="stress_sqlite.json")
+
+    def handle(self, *args, **options):
+        report = {}
+        for profile in options["profiles"].split(","):
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(SQLITE_PROFILE=profile), \
+                    benchmark.benchmark_database(
+                        os.path.join(directory, "stress.sqlite3")):
+                synthetic.generate(synthetic.Sizes(options["users"]))
+                call_command("repair_counters", stdout=io.StringIO())
+                report[profile] = benchmark.stress(
+                    options["writers"], options["readers"],
+                    options["seconds"])
+            self.print_result(profile, report[profile])
+
+        with open(options["output"], "w") as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Results written to {options['output']}"))
+
+    def print_result(self, profile, result):
+        self.stdout.write(f"{profile}:")
+        for kind, numbers in result.items():
+            self.stdout.write(
+                f"  {kind}: {numbers['per_second']}/s, "
+                f"p50 {numbers['p50_ms']} ms, p99 {numbers['p99_ms']} ms, "
+                f"{numbers['lock_errors']} lock errors")
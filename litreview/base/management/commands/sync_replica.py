@@ -0,0 +1,37 @@
+"""Copies the primary SQLite database into the replicas.
+
+A stand-in for replication when trying base/replicas.py locally: each
+SQLite replica of settings.DATABASE_REPLICAS is overwritten with a
+consistent snapshot of "default", taken with SQLite's online backup API.
+Run it again to let the replicas catch up.
+"""
+
+
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Copies the primary SQLite database into the replicas."
+
+    def handle(self, *args, **options):
+        aliases = settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError("DATABASE_REPLICAS is empty.")
+        primary = settings.DATABASES["default"]
+        for alias in aliases:
+            replica = settings.DATABASES[alias]
+            if not all("sqlite3" in database["ENGINE"]
+                       for database in (primary, replica)):
+                raise CommandError("only SQLite databases can be copied.")
+            # the replica's file is replaced under its open connections.
+            connections[alias].close()
+            with closing(sqlite3.connect(primary["NAME"])) as source, \
+                    closing(sqlite3.connect(replica["NAME"])) as target:
+                source.backup(target)
+            self.stdout.write(self.style.SUCCESS(
+                f"{primary['NAME']} copied to {replica['NAME']}."))
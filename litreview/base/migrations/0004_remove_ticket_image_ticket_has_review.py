@@ -0,0 +1,22 @@
+# Generated by Django 4.0.4 on 2026-10-17 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0003_review_userfollows'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ticket',
+            name='image',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='has_review',
+            field=models.BooleanField(blank=True, default=False),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.4 on 2026-10-17 03:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate(apps, schema_editor):
+    """creates the stats row of every existing user."""
+    User = apps.get_model("auth", "User")
+    UserFollows = apps.get_model("base", "UserFollows")
+    UserStats = apps.get_model("base", "UserStats")
+    followers = dict(UserFollows.objects.values_list(
+        "followed_user").annotate(n=models.Count("id")).order_by())
+    following = dict(UserFollows.objects.values_list(
+        "user").annotate(n=models.Count("id")).order_by())
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id,
+                   followers_count=followers.get(user_id, 0),
+                   following_count=following.get(user_id, 0))
+         for user_id in User.objects.values_list("id", flat=True)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('base', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:02
+
+from django.db import migrations
+
+# see base/search.py: tickets are stored under the rowid 2 * id, reviews
+# under 2 * id + 1. The update triggers only reindex a post when its text
+# actually changed.
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE base_search USING fts5(
+        title, body, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_insert AFTER INSERT ON base_ticket
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_update AFTER UPDATE ON base_ticket
+    WHEN old.title IS NOT new.title
+    OR old.description IS NOT new.description
+    BEGIN
+        UPDATE base_search SET title = new.title, body = new.description
+        WHERE rowid = 2 * new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_delete AFTER DELETE ON base_ticket
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_insert AFTER INSERT ON base_review
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id + 1, new.headline, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_update AFTER UPDATE ON base_review
+    WHEN old.headline IS NOT new.headline OR old.body IS NOT new.body
+    BEGIN
+        UPDATE base_search SET title = new.headline, body = new.body
+        WHERE rowid = 2 * new.id + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_delete AFTER DELETE ON base_review
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+    """
+    INSERT INTO base_search(rowid, title, body)
+    SELECT 2 * id, title, description FROM base_ticket
+    """,
+    """
+    INSERT INTO base_search(rowid, title, body)
+    SELECT 2 * id + 1, headline, body FROM base_review
+    """,
+]
+
+DROP_INDEX = [
+    "DROP TRIGGER IF EXISTS base_ticket_search_insert",
+    "DROP TRIGGER IF EXISTS base_ticket_search_update",
+    "DROP TRIGGER IF EXISTS base_ticket_search_delete",
+    "DROP TRIGGER IF EXISTS base_review_search_insert",
+    "DROP TRIGGER IF EXISTS base_review_search_update",
+    "DROP TRIGGER IF EXISTS base_review_search_delete",
+    "DROP TABLE IF EXISTS base_search",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0006_userstats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
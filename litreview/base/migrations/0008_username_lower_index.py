@@ -0,0 +1,20 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """indexes lower(username) for the lookups of base/usernames.py."""
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('base', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX base_auth_user_username_lower_idx '
+            'ON auth_user (lower(username))',
+            'DROP INDEX IF EXISTS base_auth_user_username_lower_idx',
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:13
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# SQLite can't alter a column in place: Django rebuilds base_ticket, which
+# drops the triggers keeping the search index in sync (see migration 0007).
+# They are created again once the table is rebuilt, in both directions.
+TICKET_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS base_ticket_search_insert",
+    "DROP TRIGGER IF EXISTS base_ticket_search_update",
+    "DROP TRIGGER IF EXISTS base_ticket_search_delete",
+    """
+    CREATE TRIGGER base_ticket_search_insert AFTER INSERT ON base_ticket
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_update AFTER UPDATE ON base_ticket
+    WHEN old.title IS NOT new.title
+    OR old.description IS NOT new.description
+    BEGIN
+        UPDATE base_search SET title = new.title, body = new.description
+        WHERE rowid = 2 * new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_delete AFTER DELETE ON base_ticket
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id;
+    END
+    """,
+]
+
+
+def _aggregate(Review, function):
+    return Subquery(Review.objects.filter(ticket=OuterRef("pk")).values(
+        "ticket").annotate(value=function).values("value"))
+
+
+def populate(apps, schema_editor):
+    Ticket = apps.get_model("base", "Ticket")
+    Review = apps.get_model("base", "Review")
+    Ticket.objects.update(
+        review_count=Coalesce(_aggregate(Review, Count("*")), Value(0)),
+        rating_sum=Coalesce(_aggregate(Review, Sum("rating")), Value(0)),
+        last_review_at=_aggregate(Review, Max("time_created")),
+    )
+
+
+def populate_has_review(apps, schema_editor):
+    Ticket = apps.get_model("base", "Ticket")
+    Ticket.objects.filter(review_count__gt=0).update(has_review=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(migrations.RunSQL.noop, TICKET_TRIGGERS),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_review_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate, populate_has_review),
+        migrations.RemoveField(
+            model_name='ticket',
+            name='has_review',
+        ),
+        migrations.RunSQL(TICKET_TRIGGERS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:18
+
+import base.models
+from django.db import migrations
+from django.db.models.functions import Substr
+
+# SQLite rebuilds base_ticket and base_review to add the columns, which
+# drops the triggers keeping the search index in sync (see migration 0007).
+# They are created again once the tables are rebuilt, in both directions.
+SEARCH_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS base_ticket_search_insert",
+    "DROP TRIGGER IF EXISTS base_ticket_search_update",
+    "DROP TRIGGER IF EXISTS base_ticket_search_delete",
+    "DROP TRIGGER IF EXISTS base_review_search_insert",
+    "DROP TRIGGER IF EXISTS base_review_search_update",
+    "DROP TRIGGER IF EXISTS base_review_search_delete",
+    """
+    CREATE TRIGGER base_ticket_search_insert AFTER INSERT ON base_ticket
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_update AFTER UPDATE ON base_ticket
+    WHEN old.title IS NOT new.title
+    OR old.description IS NOT new.description
+    BEGIN
+        UPDATE base_search SET title = new.title, body = new.description
+        WHERE rowid = 2 * new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_ticket_search_delete AFTER DELETE ON base_ticket
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_insert AFTER INSERT ON base_review
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id + 1, new.headline, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_update AFTER UPDATE ON base_review
+    WHEN old.headline IS NOT new.headline OR old.body IS NOT new.body
+    BEGIN
+        UPDATE base_search SET title = new.headline, body = new.body
+        WHERE rowid = 2 * new.id + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_delete AFTER DELETE ON base_review
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+]
+
+# EXCERPT_LENGTH + 1, see base.models.ExcerptField.
+STORED_LENGTH = 281
+
+
+def populate(apps, schema_editor):
+    Ticket = apps.get_model("base", "Ticket")
+    Review = apps.get_model("base", "Review")
+    Ticket.objects.update(
+        description_excerpt=Substr("description", 1, STORED_LENGTH))
+    Review.objects.update(body_excerpt=Substr("body", 1, STORED_LENGTH))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_ticket_review_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunSQL(migrations.RunSQL.noop, SEARCH_TRIGGERS),
+        migrations.AddField(
+            model_name='review',
+            name='body_excerpt',
+            field=base.models.ExcerptField(blank=True, default='', editable=False, max_length=281, source='body'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='description_excerpt',
+            field=base.models.ExcerptField(blank=True, default='', editable=False, max_length=281, source='description'),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+        migrations.RunSQL(SEARCH_TRIGGERS, migrations.RunSQL.noop),
+    ]
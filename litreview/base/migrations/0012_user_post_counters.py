@@ -0,0 +1,40 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(model):
+    return Coalesce(Subquery(model.objects.filter(
+        user=OuterRef("user")).values("user").annotate(
+            n=Count("*")).values("n")), Value(0))
+
+
+def populate(apps, schema_editor):
+    UserStats = apps.get_model("base", "UserStats")
+    UserStats.objects.update(
+        tickets_count=_count(apps.get_model("base", "Ticket")),
+        reviews_count=_count(apps.get_model("base", "Review")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_post_excerpts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='tickets_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:35
+
+import base.models
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('base', '0014_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField()),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_ticket_id', models.BigIntegerField(default=0)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('title', models.CharField(max_length=128)),
+                ('description', models.TextField(blank=True, max_length=2048)),
+                ('description_excerpt', base.models.ExcerptField(blank=True, default='', editable=False, max_length=281, source='description')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('last_review_at', models.DateTimeField(blank=True, null=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('time_created', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('rating', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(5)])),
+                ('headline', models.CharField(max_length=128)),
+                ('body', models.TextField(blank=True, max_length=8192)),
+                ('body_excerpt', base.models.ExcerptField(blank=True, default='', editable=False, max_length=281, source='body')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('time_created', models.DateTimeField()),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='base.archivedticket')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedticket',
+            index=models.Index(fields=['user', '-time_created'], name='archived_ticket_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['user', '-time_created'], name='archived_review_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['ticket', '-time_created'], name='archived_review_ticket_idx'),
+        ),
+    ]
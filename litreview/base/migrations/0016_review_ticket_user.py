@@ -0,0 +1,93 @@
+# Generated by Django 4.0.4 on 2026-10-17 04:51
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+# SQLite rebuilds base_review to add the column, which drops the triggers
+# keeping the search index in sync (see migration 0007). They are created
+# again once the table is rebuilt, in both directions.
+SEARCH_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS base_review_search_insert",
+    "DROP TRIGGER IF EXISTS base_review_search_update",
+    "DROP TRIGGER IF EXISTS base_review_search_delete",
+    """
+    CREATE TRIGGER base_review_search_insert AFTER INSERT ON base_review
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id + 1, new.headline, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_update AFTER UPDATE ON base_review
+    WHEN old.headline IS NOT new.headline OR old.body IS NOT new.body
+    BEGIN
+        UPDATE base_search SET title = new.headline, body = new.body
+        WHERE rowid = 2 * new.id + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER base_review_search_delete AFTER DELETE ON base_review
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+]
+
+# every way of inserting a review (views, bulk_create in generate_data and
+# import_data) gets the author of its ticket copied. Restored reviews
+# already hold it.
+TICKET_USER_TRIGGER = """
+    CREATE TRIGGER base_review_ticket_user AFTER INSERT ON base_review
+    WHEN new.ticket_user_id IS NULL
+    BEGIN
+        UPDATE base_review SET ticket_user_id = (
+            SELECT user_id FROM base_ticket WHERE id = new.ticket_id
+        ) WHERE id = new.id;
+    END
+"""
+
+
+def populate(apps, schema_editor):
+    for review_model, ticket_model in (("Review", "Ticket"),
+                                       ("ArchivedReview", "ArchivedTicket")):
+        Review = apps.get_model("base", review_model)
+        Ticket = apps.get_model("base", ticket_model)
+        Review.objects.update(ticket_user=Subquery(Ticket.objects.filter(
+            id=OuterRef("ticket_id")).values("user_id")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('base', '0015_post_archive'),
+    ]
+
+    operations = [
+        migrations.RunSQL(migrations.RunSQL.noop, SEARCH_TRIGGERS),
+        migrations.AddField(
+            model_name='archivedreview',
+            name='ticket_user',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='ticket_user',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['ticket_user', '-time_created'], name='archived_review_tuser_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['ticket_user', '-time_created'], name='review_ticket_user_idx'),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+        migrations.RunSQL(
+            SEARCH_TRIGGERS + [TICKET_USER_TRIGGER],
+            "DROP TRIGGER IF EXISTS base_review_ticket_user",
+        ),
+    ]
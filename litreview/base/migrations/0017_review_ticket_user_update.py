@@ -0,0 +1,34 @@
+# Generated by Django 4.0.4 on 2026-10-17 05:30
+
+from django.db import migrations
+
+# a review moved to another ticket (see base.views.edit_review) gets the
+# author of its new ticket. The condition also repairs the stale author
+# written back by a later save() of an instance loaded before the move.
+TICKET_USER_UPDATE_TRIGGER = """
+    CREATE TRIGGER base_review_ticket_user_update
+    AFTER UPDATE OF ticket_id, ticket_user_id ON base_review
+    WHEN new.ticket_user_id IS NOT (
+        SELECT user_id FROM base_ticket WHERE id = new.ticket_id
+    )
+    BEGIN
+        UPDATE base_review SET ticket_user_id = (
+            SELECT user_id FROM base_ticket WHERE id = new.ticket_id
+        ) WHERE id = new.id;
+    END
+"""
+
+
+class Migration(migrations.Migration):
+    """keeps Review.ticket_user in sync when a review changes ticket."""
+
+    dependencies = [
+        ('base', '0016_review_ticket_user'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            TICKET_USER_UPDATE_TRIGGER,
+            "DROP TRIGGER IF EXISTS base_review_ticket_user_update",
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.0.4 on 2026-10-17 05:45
+
+from django.db import migrations
+
+# archived posts stay searchable: they keep the rowid of the live post (ids
+# are shared by live and archived posts, see base/archive.py), indexed and
+# unindexed by these triggers. Archived posts are never edited.
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER base_archivedticket_search_insert
+    AFTER INSERT ON base_archivedticket
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER base_archivedticket_search_delete
+    AFTER DELETE ON base_archivedticket
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_archivedreview_search_insert
+    AFTER INSERT ON base_archivedreview
+    BEGIN
+        INSERT INTO base_search(rowid, title, body)
+        VALUES (2 * new.id + 1, new.headline, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER base_archivedreview_search_delete
+    AFTER DELETE ON base_archivedreview
+    BEGIN
+        DELETE FROM base_search WHERE rowid = 2 * old.id + 1;
+    END
+    """,
+    """
+    INSERT INTO base_search(rowid, title, body)
+    SELECT 2 * id, title, description FROM base_archivedticket
+    """,
+    """
+    INSERT INTO base_search(rowid, title, body)
+    SELECT 2 * id + 1, headline, body FROM base_archivedreview
+    """,
+]
+
+DROP_TRIGGERS = [
+    "DELETE FROM base_search WHERE rowid IN "
+    "(SELECT 2 * id FROM base_archivedticket)",
+    "DELETE FROM base_search WHERE rowid IN "
+    "(SELECT 2 * id + 1 FROM base_archivedreview)",
+    "DROP TRIGGER IF EXISTS base_archivedticket_search_insert",
+    "DROP TRIGGER IF EXISTS base_archivedticket_search_delete",
+    "DROP TRIGGER IF EXISTS base_archivedreview_search_insert",
+    "DROP TRIGGER IF EXISTS base_archivedreview_search_delete",
+]
+
+
+class Migration(migrations.Migration):
+    """indexes the archived posts for the full-text search."""
+
+    dependencies = [
+        ('base', '0017_review_ticket_user_update'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
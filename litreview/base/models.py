@@ -1,4 +1,4 @@
-"""Defines three models used throughout the project.
+"""Defines the models used throughout the project.
 
 A model is a subclass of models.Model. Each model defined below maps
 to one database table. Each class field map to a database field. Each
@@ -9,47 +9,277 @@ db scheme handed.
 
 
 import datetime
+from contextlib import contextmanager
+from typing import Optional
 
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import DEFERRED
 
 
-class Ticket(models.Model):
-    """Tickets created by the end-user are stored in the DB through this model.
+@contextmanager
+def explicit_time_created():
+    """time_created is an auto_now_add field, which save() and bulk_create
+    overwrite with the current time. Within this block, the value set on
+    the instances is kept instead (used to generate or import posts)."""
+    fields = [model._meta.get_field("time_created")
+              for model in (Ticket, Review)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
 
-    A ticket is a request for review. This request can be met or not. In the
-    feed page, only tickets who doesn't have their request met can receive
-    reviews. Thus, to identify tickets that can receive reviews I added
-    the has_review field.
+
+# number of characters of a ticket description or review body displayed in
+# the feed, posts and search pages.
+EXCERPT_LENGTH = 280
+
+
+class ExcerptField(models.CharField):
+    """The beginning of another text field of the model (source), stored so
+    that listings can display it without loading the whole text.
+
+    It is filled whenever the instance is saved, bulk_create included. One
+    more character than displayed is kept, which tells whether the text was
+    cut (see preview and is_cut).
     """
+
+    def __init__(self, *args, source: str, **kwargs):
+        self.source = source
+        kwargs.setdefault("max_length", EXCERPT_LENGTH + 1)
+        kwargs.setdefault("blank", True)
+        kwargs.setdefault("default", "")
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["source"] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        if self.source in model_instance.get_deferred_fields():
+            # the text wasn't loaded, hence not changed.
+            return getattr(model_instance, self.attname)
+        value = (getattr(model_instance, self.source) or "")[:self.max_length]
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def is_cut(excerpt: str) -> bool:
+    return len(excerpt) > EXCERPT_LENGTH
+
+
+def preview(excerpt: str) -> str:
+    """the excerpt as displayed: cut after the last whole word, followed by
+    an ellipsis, when the text is longer than EXCERPT_LENGTH."""
+    if not is_cut(excerpt):
+        return excerpt
+    text = excerpt[:EXCERPT_LENGTH]
+    last_space = text.rfind(" ")
+    if last_space > EXCERPT_LENGTH // 2:
+        text = text[:last_space]
+    return text.rstrip() + "…"
+
+
+class AbstractTicket(models.Model):
+    """The fields and helpers shared by live tickets and archived ones (see
+    ArchivedTicket)."""
     title: str = models.CharField(max_length=128)
     description: str = models.TextField(max_length=2048, blank=True)
+    description_excerpt: str = ExcerptField(source="description")
     user: User = models.ForeignKey(to=User, on_delete=models.CASCADE)
-    time_created: datetime.datetime = models.DateTimeField(auto_now_add=True)
-    has_review: bool = models.BooleanField(blank=True, default=False)
+    review_count: int = models.PositiveIntegerField(default=0)
+    rating_sum: int = models.PositiveIntegerField(default=0)
+    last_review_at: datetime.datetime = models.DateTimeField(null=True,
+                                                             blank=True)
+
+    class Meta:
+        abstract = True
 
     def __str__(self) -> str:
         return self.title
 
+    @property
+    def description_preview(self) -> str:
+        return preview(self.description_excerpt)
 
-class Review(models.Model):
-    """Reviews created by the end-user are stored in the DB through this model.
+    @property
+    def description_is_cut(self) -> bool:
+        return is_cut(self.description_excerpt)
+
+    @property
+    def has_review(self) -> bool:
+        return self.review_count > 0
+
+    @property
+    def average_rating(self) -> Optional[float]:
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+
+class Ticket(AbstractTicket):
+    """Tickets created by the end-user are stored in the DB through this model.
+
+    A ticket is a request for review. This request can be met or not. In the
+    feed page, only tickets who doesn't have their request met can receive
+    reviews. Thus, to identify tickets that can receive reviews I added
+    the has_review property.
+    The review_count, rating_sum and last_review_at aggregates summarize
+    the reviews of the ticket. They are only written by base/ticket_stats.py.
+    Listings only load the description_excerpt, the description itself is
+    displayed by the detail page.
     """
-    ticket: str = models.ForeignKey(to=Ticket, on_delete=models.CASCADE)
+    AGGREGATES = ("review_count", "rating_sum", "last_review_at")
+
+    time_created: datetime.datetime = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """the index serves the listing of a user's tickets, most recent
+        first (feed and posts pages)."""
+        indexes = [
+            models.Index(fields=["user", "-time_created"],
+                         name="ticket_user_recent_idx"),
+        ]
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """the aggregates are updated with F() expressions, while the
+        instance saved may have been loaded before: leave them out, unless
+        asked for."""
+        if not self._state.adding and update_fields is None:
+            skipped = set(self.AGGREGATES) | self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+                and field.name not in skipped
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class AbstractReview(models.Model):
+    """The fields and helpers shared by live reviews and archived ones (see
+    ArchivedReview)."""
     rating: int = models.PositiveIntegerField(
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
     headline: str = models.CharField(max_length=128)
     body: str = models.TextField(max_length=8192, blank=True)
+    body_excerpt: str = ExcerptField(source="body")
     user: User = models.ForeignKey(
         to=User, on_delete=models.CASCADE
     )
-    time_created: bool = models.DateTimeField(auto_now_add=True)
+    # author of the reviewed ticket, copied by triggers when the review is
+    # inserted or moved to another ticket (see migrations 0016 and 0017), so
+    # that the reviews responding to a user's tickets are listed through an
+    # index (see base/feed.py).
+    ticket_user: Optional[User] = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="+", null=True,
+        editable=False, db_index=False
+    )
+
+    class Meta:
+        abstract = True
 
     def __str__(self) -> str:
         return self.headline
 
+    @property
+    def body_preview(self) -> str:
+        return preview(self.body_excerpt)
+
+    @property
+    def body_is_cut(self) -> bool:
+        return is_cut(self.body_excerpt)
+
+
+class Review(AbstractReview):
+    """Reviews created by the end-user are stored in the DB through this model.
+    """
+    ticket: str = models.ForeignKey(to=Ticket, on_delete=models.CASCADE)
+    time_created: bool = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """the indexes serve the listing, most recent first, of a user's
+        reviews (feed and posts pages), of the reviews of a ticket and of
+        the reviews responding to a user's tickets (feed page)."""
+        indexes = [
+            models.Index(fields=["user", "-time_created"],
+                         name="review_user_recent_idx"),
+            models.Index(fields=["ticket", "-time_created"],
+                         name="review_ticket_recent_idx"),
+            models.Index(fields=["ticket_user", "-time_created"],
+                         name="review_ticket_user_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """remembers the ticket and rating read from the DB, so that an edit
+        can update the aggregates of the ticket by the difference."""
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in ("ticket_id", "rating") and value is not DEFERRED
+        }
+        return instance
+
+
+class ArchivedTicket(AbstractTicket):
+    """A ticket moved out of the Ticket table along with its reviews, once
+    they are all older than the archiving age (see base/archive.py). It
+    keeps the id and the time_created of the ticket."""
+    id: int = models.BigIntegerField(primary_key=True)
+    time_created: datetime.datetime = models.DateTimeField()
+
+    class Meta:
+        """same index as Ticket, serving the pages past the archive
+        boundary."""
+        indexes = [
+            models.Index(fields=["user", "-time_created"],
+                         name="archived_ticket_user_idx"),
+        ]
+
+
+class ArchivedReview(AbstractReview):
+    """A review moved out of the Review table with its ticket, see
+    ArchivedTicket."""
+    id: int = models.BigIntegerField(primary_key=True)
+    ticket: ArchivedTicket = models.ForeignKey(
+        to=ArchivedTicket, on_delete=models.CASCADE, related_name="reviews"
+    )
+    time_created: datetime.datetime = models.DateTimeField()
+
+    class Meta:
+        """same indexes as Review."""
+        indexes = [
+            models.Index(fields=["user", "-time_created"],
+                         name="archived_review_user_idx"),
+            models.Index(fields=["ticket", "-time_created"],
+                         name="archived_review_ticket_idx"),
+            models.Index(fields=["ticket_user", "-time_created"],
+                         name="archived_review_tuser_idx"),
+        ]
+
+
+class ArchiveRun(models.Model):
+    """One run of `python manage.py archive_posts` (see base/archive.py),
+    moving the threads older than cutoff. The tickets are visited in id
+    order, last_ticket_id records how far the run went, which lets an
+    interrupted run resume. finished_at is set once every ticket was
+    visited."""
+    cutoff: datetime.datetime = models.DateTimeField()
+    started_at: datetime.datetime = models.DateTimeField(auto_now_add=True)
+    finished_at: datetime.datetime = models.DateTimeField(null=True,
+                                                          blank=True)
+    last_ticket_id: int = models.BigIntegerField(default=0)
+    tickets: int = models.PositiveIntegerField(default=0)
+    reviews: int = models.PositiveIntegerField(default=0)
+
 
 class UserFollows(models.Model):
     """Whenever a user x follows user y, the DB is updated through
@@ -62,5 +292,120 @@ class UserFollows(models.Model):
     )
 
     class Meta:
-        """ensures user x cannot follow user y twice."""
+        """ensures user x cannot follow user y twice. The unique constraint
+        also indexes the users followed by x; the index below lists the
+        followers of y without reading the user table."""
         unique_together = ('user', "followed_user")
+        indexes = [
+            models.Index(fields=["followed_user", "user"],
+                         name="follows_followed_user_idx"),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """One post placed in the feed ("inbox") of one user.
+
+    Only used when settings.FEED_MODE is "push". Whenever a ticket or review
+    is created, one lightweight entry is written for every user allowed to
+    see it (see base/timeline.py). Reading the feed then comes down to
+    reading the owner's entries, already sorted by the index below.
+    The author is stored to purge the entries when the owner unfollows him.
+    """
+    owner: User = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="timeline"
+    )
+    author: User = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="+"
+    )
+    content_type: str = models.CharField(max_length=6)
+    post_id: int = models.PositiveBigIntegerField()
+    time_created: datetime.datetime = models.DateTimeField()
+
+    class Meta:
+        """ensures a post appears only once in a given timeline. The indexes
+        serve, in order, the feed reads, the purge following an unfollow and
+        the cleanup following a post deletion."""
+        unique_together = ("owner", "content_type", "post_id")
+        indexes = [
+            models.Index(
+                fields=["owner", "-time_created", "-content_type", "-post_id"],
+                name="timeline_owner_recent_idx",
+            ),
+            models.Index(fields=["owner", "author"],
+                         name="timeline_owner_author_idx"),
+            models.Index(fields=["content_type", "post_id"],
+                         name="timeline_post_idx"),
+        ]
+
+
+class UserStats(models.Model):
+    """Counters about one user, kept up to date when they change so that
+    pages can display them without counting rows (see base/user_stats.py).
+    """
+    user: User = models.OneToOneField(
+        to=User, on_delete=models.CASCADE, primary_key=True,
+        related_name="stats"
+    )
+    followers_count: int = models.PositiveIntegerField(default=0)
+    following_count: int = models.PositiveIntegerField(default=0)
+    tickets_count: int = models.PositiveIntegerField(default=0)
+    reviews_count: int = models.PositiveIntegerField(default=0)
+    # when the user last followed or unfollowed someone, and when his follow
+    # suggestions were last computed (see base/suggestions.py).
+    follows_changed_at: datetime.datetime = models.DateTimeField(
+        null=True, blank=True)
+    suggestions_computed_at: datetime.datetime = models.DateTimeField(
+        null=True, blank=True)
+
+
+class Suggestion(models.Model):
+    """A user suggested to another one in the "people you may know" panel
+    of the following page. The score is the number of users followed by
+    the user who follow the suggested user. Computed in batch by
+    `python manage.py compute_suggestions` (see base/suggestions.py).
+    """
+    user: User = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="suggestions"
+    )
+    suggested_user: User = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="+"
+    )
+    score: int = models.PositiveIntegerField()
+
+    class Meta:
+        """the index serves the panel, best suggestions first."""
+        unique_together = ("user", "suggested_user")
+        indexes = [
+            models.Index(fields=["user", "-score", "suggested_user"],
+                         name="suggestion_user_best_idx"),
+        ]
+
+
+class Job(models.Model):
+    """A unit of work run in the background by `python manage.py run_jobs`
+    (see base/jobs.py).
+
+    A job is due once run_after is past, unless a worker claimed it: the
+    claim token of the worker and the end of its lease are then stored.
+    Jobs are deleted once done. A job failing JOB_MAX_ATTEMPTS times is
+    kept with failed_at set, along with its last error.
+    """
+    kind: str = models.CharField(max_length=64)
+    payload: dict = models.JSONField(default=dict)
+    run_after: datetime.datetime = models.DateTimeField()
+    attempts: int = models.PositiveIntegerField(default=0)
+    claimed_by: str = models.CharField(max_length=64, blank=True)
+    claimed_until: datetime.datetime = models.DateTimeField(null=True,
+                                                            blank=True)
+    failed_at: datetime.datetime = models.DateTimeField(null=True, blank=True)
+    last_error: str = models.TextField(blank=True)
+    time_created: datetime.datetime = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """the indexes serve, in order, the search for due jobs and the
+        reading of the jobs a worker just claimed."""
+        indexes = [
+            models.Index(fields=["failed_at", "run_after"],
+                         name="job_due_idx"),
+            models.Index(fields=["claimed_by"], name="job_claimed_idx"),
+        ]
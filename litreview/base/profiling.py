@@ -0,0 +1,277 @@
+"""Opt-in request profiling for the base app.
+
+ProfilingMiddleware is enabled with settings.PROFILING. For every request
+routed to a base URL it measures:
+- view: time from the call of the view to the response (in seconds);
+- sql: number and total duration of the SQL queries, on every database
+alias (see base.query_budget.execute_wrapper);
+- tpl: time spent rendering templates.
+
+The numbers are sent back in a Server-Timing header, which browsers display
+in their network tab, and aggregated into per-route histograms. The
+histograms are written every PROFILING_FLUSH_INTERVAL seconds to one JSON
+file per process in PROFILING_DIR, where the dump_profiling command and
+the metrics view read them. The metrics view uses the live histograms of
+the process serving it instead of its dump.
+
+Template rendering has no hook outside of the test environment, so
+the render method of the Django template backend is wrapped once, when the
+middleware is created. The wrapper only measures when a request is being
+profiled.
+"""
+
+
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional
+
+from base.query_budget import execute_wrapper
+from django.conf import settings
+from django.template.backends.django import Template as BackendTemplate
+
+# upper bounds of the buckets, in seconds for durations.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = {
+    "view_seconds": ("Time spent in the view.", DURATION_BUCKETS),
+    "sql_seconds": ("Time spent running SQL queries.", DURATION_BUCKETS),
+    "sql_queries": ("Number of SQL queries.", COUNT_BUCKETS),
+    "template_seconds": ("Time spent rendering templates.", DURATION_BUCKETS),
+}
+
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = \
+    contextvars.ContextVar("profile", default=None)
+
+
+class RequestProfile:
+    """what is measured during one request."""
+
+    def __init__(self):
+        self.view_start: Optional[float] = None
+        self.view_seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper hook."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_queries += 1
+            self.sql_seconds += time.perf_counter() - start
+
+    def server_timing(self) -> str:
+        return ", ".join([
+            f"view;dur={self.view_seconds * 1000:.1f}",
+            f'sql;dur={self.sql_seconds * 1000:.1f};'
+            f'desc="{self.sql_queries} queries"',
+            f"tpl;dur={self.template_seconds * 1000:.1f}",
+        ])
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # the last count is the +Inf bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": self.counts,
+                "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls(tuple(data["buckets"]))
+        histogram.counts = list(data["counts"])
+        histogram.sum = data["sum"]
+        histogram.count = data["count"]
+        return histogram
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    """histograms of every metric, per route. Shared by the threads of the
+    process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes: dict[str, dict[str, Histogram]] = {}
+        self.last_flush = time.monotonic()
+
+    def observe(self, route: str, profile: RequestProfile) -> None:
+        with self.lock:
+            histograms = self.routes.setdefault(route, {
+                name: Histogram(buckets)
+                for name, (_, buckets) in METRICS.items()
+            })
+            for name, histogram in histograms.items():
+                histogram.observe(getattr(profile, name))
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {route: {name: h.to_dict() for name, h in metrics.items()}
+                    for route, metrics in self.routes.items()}
+
+    def snapshot(self) -> dict[str, dict[str, Histogram]]:
+        """a copy of the histograms, safe to read while requests are
+        served."""
+        return {route: {name: Histogram.from_dict(data)
+                        for name, data in metrics.items()}
+                for route, metrics in self.to_dict().items()}
+
+    def flush_if_due(self) -> None:
+        directory = getattr(settings, "PROFILING_DIR", None)
+        interval = getattr(settings, "PROFILING_FLUSH_INTERVAL", 10)
+        if directory is None or time.monotonic() - self.last_flush < interval:
+            return
+        self.last_flush = time.monotonic()
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f"profiling-{os.getpid()}.json"
+        temporary = target.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.to_dict()))
+        os.replace(temporary, target)
+
+
+registry = Registry()
+
+
+def _merge(merged: dict[str, dict[str, Histogram]],
+           routes: dict[str, dict[str, Histogram]]) -> None:
+    for route, metrics in routes.items():
+        target = merged.setdefault(route, {})
+        for name, histogram in metrics.items():
+            if name in target:
+                target[name].merge(histogram)
+            else:
+                target[name] = histogram
+
+
+def load_dumps(directory, exclude_pid: Optional[int] = None
+               ) -> dict[str, dict[str, Histogram]]:
+    """merges the histograms flushed by every process, except the one of
+    exclude_pid."""
+    merged: dict[str, dict[str, Histogram]] = {}
+    for path in sorted(Path(directory).glob("profiling-*.json")):
+        if path.name == f"profiling-{exclude_pid}.json":
+            continue
+        _merge(merged, {
+            route: {name: Histogram.from_dict(data)
+                    for name, data in metrics.items()}
+            for route, metrics in json.loads(path.read_text()).items()
+        })
+    return merged
+
+
+def all_processes() -> dict[str, dict[str, Histogram]]:
+    """the live histograms of this process, merged with the ones flushed
+    by the others to PROFILING_DIR."""
+    directory = getattr(settings, "PROFILING_DIR", None)
+    merged = (load_dumps(directory, exclude_pid=os.getpid())
+              if directory is not None else {})
+    _merge(merged, registry.snapshot())
+    return merged
+
+
+def prometheus_text(routes: dict[str, dict[str, Histogram]]) -> str:
+    lines = []
+    for name, (description, _) in METRICS.items():
+        metric = f"litreview_{name}"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        for route in sorted(routes):
+            histogram = routes[route][name]
+            label = f'route="{route}"'
+            cumulative = 0
+            bounds = [str(b) for b in histogram.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f"{metric}_sum{{{label}}} {histogram.sum}")
+            lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def _instrument_templates() -> None:
+    if getattr(BackendTemplate.render, "profiled", False):
+        return
+    render = BackendTemplate.render
+
+    def profiled_render(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_seconds += time.perf_counter() - start
+
+    profiled_render.profiled = True
+    BackendTemplate.render = profiled_render
+
+
+class ProfilingMiddleware:
+    """measures the requests routed to the base app."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        match = getattr(request, "resolver_match", None)
+        if match is None or match.app_name != "base":
+            return response
+        if profile.view_start is not None:
+            profile.view_seconds = time.perf_counter() - profile.view_start
+        response["Server-Timing"] = profile.server_timing()
+        registry.observe(match.view_name, profile)
+        registry.flush_if_due()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            # queries made before the view (sessions, authentication) are
+            # attributed to the route as well, but not to the view time.
+            profile.view_start = time.perf_counter()
+        return None
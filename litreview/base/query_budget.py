@@ -0,0 +1,151 @@
+"""Keeps an eye on the number of SQL queries run by the views.
+
+A view declares how many queries it may run with the query_budget
+decorator. Every query executed while the view runs (template rendering
+included, since render() is called inside the view) is recorded through
+the execute_wrapper of every database alias, read replicas included. When
+the view goes over its budget, or runs the exact same query twice, a
+warning is logged. With settings.QUERY_BUDGET_STRICT set to True,
+QueryBudgetExceeded is raised instead, which makes the offending test
+fail.
+
+Code paths which are expected off the hot path of a view, such as reading
+the archive (base/archive.py), declare the queries they add with
+extend_budget(), so that budgets keep describing the common case.
+
+Tests can also check a block of code directly with QueryBudgetMixin:
+
+    class FeedTest(QueryBudgetMixin, TestCase):
+        def test_feed(self):
+            with self.assertQueryBudget(5):
+                self.client.get(reverse("base:feed"))
+"""
+
+
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_recording: contextvars.ContextVar[Optional["QueryRecorder"]] = \
+    contextvars.ContextVar("query_recorder", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a view breaks its query budget."""
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """installs the wrapper on the connections of every alias in
+    settings.DATABASES, for the current thread, within the block."""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+class QueryRecorder:
+    """Records the queries executed on every connection while used as a
+    context manager."""
+
+    def __init__(self):
+        self.queries: list[tuple[str, tuple, float]] = []
+        # see extend_budget.
+        self.extra = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            params = tuple(params) if params is not None and not many else ()
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    def __enter__(self):
+        self._wrapper = execute_wrapper(self)
+        self._wrapper.__enter__()
+        self._token = _recording.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _recording.reset(self._token)
+        self._wrapper.__exit__(*exc_info)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def duplicates(self) -> list[str]:
+        """returns the queries run more than once with the same
+        parameters."""
+        counts = Counter((sql, repr(params))
+                         for sql, params, _ in self.queries)
+        return [sql for (sql, _), n in counts.items() if n > 1]
+
+    def problems(self, max_queries: int,
+                 allow_duplicates: bool = False) -> list[str]:
+        problems = []
+        max_queries += self.extra
+        if self.count > max_queries:
+            problems.append(
+                f"{self.count} queries executed, {max_queries} allowed")
+        if not allow_duplicates:
+            problems.extend(f"duplicate query: {sql}"
+                            for sql in self.duplicates())
+        return problems
+
+
+def extend_budget(queries: int) -> None:
+    """allows the budget being checked, if any, queries more."""
+    recorder = _recording.get()
+    if recorder is not None:
+        recorder.extra += queries
+
+
+def _report(label: str, problems: list[str], strict: bool) -> None:
+    if not problems:
+        return
+    message = f"{label} broke its query budget: " + "; ".join(problems)
+    if strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def query_budget(max_queries: int, allow_duplicates: bool = False):
+    """decorates a view (or the get/post method of a class-based view)
+    allowed to run at most max_queries queries."""
+    def decorator(view):
+        label = view.__qualname__
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with QueryRecorder() as recorder:
+                response = view(*args, **kwargs)
+            _report(label, recorder.problems(max_queries, allow_duplicates),
+                    getattr(settings, "QUERY_BUDGET_STRICT", False))
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+class QueryBudgetMixin:
+    """TestCase mixin failing the test when a block breaks its budget."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries: int,
+                          allow_duplicates: bool = False):
+        with QueryRecorder() as recorder:
+            yield recorder
+        problems = recorder.problems(max_queries, allow_duplicates)
+        if problems:
+            self.fail("; ".join(problems))
@@ -0,0 +1,144 @@
+"""Checks that the hot queries of the site are served by indexes.
+
+Each query of HOT_QUERIES is built exactly as the views build it, for a
+user who doesn't need to exist, and handed to SQLite's EXPLAIN QUERY PLAN.
+A plan line reading "SCAN <table>" means every row of the table is read:
+the cost of the query then grows with the size of the table instead of the
+size of the page. `python manage.py check_query_plans` fails when such a
+line shows up, so that a change to a query or to the indexes can't bring
+back a full scan unnoticed.
+
+"SCAN CONSTANT ROW" (a SELECT without table) is the only scan tolerated.
+
+The paginated listings (PAGINATED) must also read their rows in order: a
+"USE TEMP B-TREE FOR ORDER BY" line means every matching row is read and
+sorted before the LIMIT applies. "USE TEMP B-TREE FOR RIGHT PART OF ORDER
+BY" is tolerated: the index gives the time order, only the rows sharing a
+time_created are sorted, and the reading still stops with the page.
+"""
+
+
+import datetime
+import re
+from typing import Callable, NamedTuple
+
+import base.feed as feed
+import base.jobs as jobs
+import base.models as models
+import base.suggestions as suggestions
+import base.timeline as timeline
+import base.usernames as usernames
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils import timezone
+
+# "SCAN base_ticket", "SCAN base_ticket USING INDEX ...": reading an index
+# from end to end is as costly as reading the table.
+_SCAN = re.compile(r"^SCAN (?P<table>\w+)")
+_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+class Plan(NamedTuple):
+    name: str
+    lines: list[str]
+    scans: list[str]
+    sorts: list[str]
+
+    @property
+    def problems(self) -> list[str]:
+        return self.scans + self.sorts
+
+
+# the lists of the following page, as read by views.Following.
+def _following(user: User) -> QuerySet:
+    return User.objects.filter(
+        followed_by__user=user).only("username").order_by("username")
+
+
+def _followers(user: User) -> QuerySet:
+    return User.objects.filter(
+        following__followed_user=user).only("username").order_by("username")
+
+
+_CURSOR = feed.Cursor(
+    datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+    feed.REVIEW, 1)
+
+# the feed has a branch per followed user (see base.feed.feed_keys).
+_FOLLOWED = [2, 3]
+
+# name -> function returning the queryset run for the given user.
+HOT_QUERIES: dict[str, Callable[[User], QuerySet]] = {
+    "feed, first page": lambda user: feed.feed_keys(
+        user, None, 21, followed=_FOLLOWED),
+    "feed, next page": lambda user: feed.feed_keys(
+        user, _CURSOR, 21, followed=_FOLLOWED),
+    "posts, first page": lambda user: feed.post_keys(user, None, 21),
+    "posts, next page": lambda user: feed.post_keys(user, _CURSOR, 21),
+    # pages reaching the archive boundary (see base/archive.py).
+    "archived feed, next page": lambda user: feed.feed_keys(
+        user, _CURSOR, 21, archived=True, followed=_FOLLOWED),
+    "archived posts, next page": lambda user: feed.post_keys(
+        user, _CURSOR, 21, archived=True),
+    "timeline, next page": lambda user: timeline.entries_after(
+        user, _CURSOR, 21),
+    "following": _following,
+    "followers": _followers,
+    # audience of a new post (timeline fan-out, feed cache invalidation).
+    "followers ids": lambda user: models.UserFollows.objects.filter(
+        followed_user=user).values_list("user_id", flat=True),
+    # reviewers of an edited ticket (feed cache invalidation).
+    "reviewers of a ticket": lambda user: models.Review.objects.filter(
+        ticket_id=1).values_list("user_id", flat=True).distinct(),
+    "username prefix": lambda user: usernames.prefix_range("ab")[:10],
+    "follow suggestions": lambda user: suggestions.for_user(user, 5),
+    # claimed by the background workers.
+    "due jobs": lambda user: jobs.oldest_due(timezone.now(), 100),
+}
+
+# the queries reading one page of a listing, see the module docstring.
+PAGINATED = {
+    "feed, first page",
+    "feed, next page",
+    "posts, first page",
+    "posts, next page",
+    "archived feed, next page",
+    "archived posts, next page",
+    "timeline, next page",
+}
+
+
+def explain(queryset: QuerySet) -> list[str]:
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        # rows are (id, parent, notused, detail).
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(lines: list[str]) -> list[str]:
+    scans = []
+    for line in lines:
+        match = _SCAN.match(line)
+        if match is None or match.group("table") == "CONSTANT":
+            continue
+        scans.append(line)
+    return scans
+
+
+def sorts(lines: list[str]) -> list[str]:
+    return [line for line in lines if line == _SORT]
+
+
+def check(user: User = None) -> list[Plan]:
+    """returns the plan of every hot query."""
+    if connection.vendor != "sqlite":
+        raise NotImplementedError("query plans are only read on SQLite.")
+    user = user or User(id=1, username="plan")
+    plans = []
+    for name, build in HOT_QUERIES.items():
+        lines = explain(build(user))
+        plans.append(Plan(name, lines, full_scans(lines),
+                          sorts(lines) if name in PAGINATED else []))
+    return plans
@@ -0,0 +1,154 @@
+"""Sends the reads of the listing views to read replicas.
+
+The databases named in settings.DATABASE_REPLICAS hold copies of "default"
+which may lag behind it. Only the views decorated with read_from_replica
+read from them; everything else, and every write, goes to "default" (the
+primary). Within a decorated view, reads go back to the primary when:
+- the request already wrote something;
+- the client wrote something less than REPLICA_PIN_SECONDS ago: the
+response to a write sets a short-lived cookie pinning the client to the
+primary, so that users always see their own writes;
+- the user's feed cache was invalidated less than REPLICA_PIN_SECONDS ago,
+i.e. someone else wrote something he sees. Otherwise a replica which hasn't
+caught up yet would fill the feed cache, and the ETag of the page, with
+stale content.
+
+replica_middleware tracks the state of the current request in a context
+variable, which sync_to_async hands over to the threads running the
+queries of async views. Queries made after the response left the
+middleware, e.g. by a streamed response, go to the primary.
+
+To try it locally, declare a second SQLite file and copy the primary into
+it with `python manage.py sync_replica` (see settings.py).
+"""
+
+
+import asyncio
+import contextvars
+import random
+import time
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+
+import base.feed_cache as feed_cache
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = "primary_pin"
+
+
+@dataclass
+class _RequestState:
+    pinned: bool
+    wrote: bool = False
+    replica_allowed: bool = False
+
+
+_state: contextvars.ContextVar[Optional[_RequestState]] = \
+    contextvars.ContextVar("replica_state", default=None)
+
+
+def replicas() -> list[str]:
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+class ReplicaRouter:
+    """routes the reads allowed by read_from_replica to a random replica."""
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        state = _state.get()
+        aliases = replicas()
+        if (not aliases or state is None or not state.replica_allowed
+                or state.pinned or state.wrote):
+            return None
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints) -> str:
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        # replicas get their schema along with their data.
+        return db not in replicas()
+
+
+def _recently_invalidated(user_id: int) -> bool:
+    window = settings.REPLICA_PIN_SECONDS * 1_000_000_000
+    return time.time_ns() - feed_cache.version(user_id) < window
+
+
+def _allow_replica(request, state: _RequestState) -> None:
+    user = request.user
+    state.replica_allowed = not (
+        user.is_authenticated and _recently_invalidated(user.id))
+
+
+def read_from_replica(view):
+    """lets the reads of the view go to a replica, see the module
+    docstring. Coroutine views must have resolved request.user before."""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            state = _state.get()
+            if state is None or not replicas():
+                return await view(request, *args, **kwargs)
+            _allow_replica(request, state)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                state.replica_allowed = False
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or not replicas():
+            return view(request, *args, **kwargs)
+        _allow_replica(request, state)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica_allowed = False
+    return wrapper
+
+
+def _pin(response, state: _RequestState) -> None:
+    if state.wrote:
+        response.set_cookie(PIN_COOKIE, "1",
+                            max_age=settings.REPLICA_PIN_SECONDS,
+                            httponly=True, samesite="Lax")
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """holds the routing state of the request and pins the clients who
+    just wrote to the primary. Native under both WSGI and ASGI, so that
+    the state reaches async views without a switch of thread."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+            token = _state.set(state)
+            try:
+                response = await get_response(request)
+            finally:
+                _state.reset(token)
+            _pin(response, state)
+            return response
+    else:
+        def middleware(request):
+            state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+            token = _state.set(state)
+            try:
+                response = get_response(request)
+            finally:
+                _state.reset(token)
+            _pin(response, state)
+            return response
+    return middleware
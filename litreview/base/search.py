@@ -0,0 +1,140 @@
+"""Full-text search over tickets and reviews, backed by SQLite FTS5.
+
+The base_search virtual table indexes the title and description of the
+tickets, and the headline and body of the reviews. Both kinds of posts share
+the table, so the rowid encodes the post: 2 * id for a ticket, 2 * id + 1
+for a review. This keeps every update of the index a lookup by rowid.
+
+The index is kept in sync by SQL triggers on base_ticket and base_review
+(see migration 0007), hence it also follows bulk inserts and updates made
+outside of the ORM. Archived posts (see base/archive.py) stay searchable:
+they keep their id, hence their rowid, and the triggers of migration 0018
+index them in their own tables. `python manage.py rebuild_search_index`
+rebuilds the index from scratch.
+
+Results are ranked with bm25, the title weighing more than the body, and
+filtered with the same visibility rules as the feed.
+"""
+
+
+import re
+from typing import NamedTuple
+
+import base.feed as feed
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+BATCH_SIZE = 5000
+
+_FOLLOWED = "SELECT followed_user_id FROM base_userfollows WHERE user_id = %s"
+_VISIBLE_TICKET = f"""
+    EXISTS (
+        SELECT 1 FROM {{table}} t
+        WHERE t.id = base_search.rowid / 2
+        AND (t.user_id = %s OR t.user_id IN ({_FOLLOWED}))
+    )
+"""
+_VISIBLE_REVIEW = f"""
+    EXISTS (
+        SELECT 1 FROM {{table}} r
+        WHERE r.id = base_search.rowid / 2
+        AND (r.user_id = %s OR r.ticket_user_id = %s
+             OR r.user_id IN ({_FOLLOWED}))
+    )
+"""
+# visibility rules of the feed, for live and archived posts. Every
+# placeholder stands for the reader's id.
+_VISIBLE = f"""
+(
+    (base_search.rowid %% 2 = 0 AND (
+        {_VISIBLE_TICKET.format(table="base_ticket")}
+        OR {_VISIBLE_TICKET.format(table="base_archivedticket")}
+    ))
+    OR (base_search.rowid %% 2 = 1 AND (
+        {_VISIBLE_REVIEW.format(table="base_review")}
+        OR {_VISIBLE_REVIEW.format(table="base_archivedreview")}
+    ))
+)
+"""
+
+
+class SearchPage(NamedTuple):
+    posts: list
+    has_next: bool
+
+
+def to_match_expression(query: str) -> str:
+    """turns the user's input into an FTS5 query matching every word.
+
+    Each word is quoted so that characters meaningful to FTS5 (quotes,
+    parentheses, AND/OR/NOT...) are searched literally. The last word is
+    matched as a prefix.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def search(user: User, query: str, page: int = 1,
+           page_size: int = 20) -> SearchPage:
+    """returns one page of the posts visible to the user and matching the
+    query, best matches first."""
+    expression = to_match_expression(query)
+    if not expression:
+        return SearchPage([], False)
+    sql = f"""
+        SELECT base_search.rowid FROM base_search
+        WHERE base_search MATCH %s AND {_VISIBLE}
+        ORDER BY bm25(base_search, {TITLE_WEIGHT}, {BODY_WEIGHT}),
+                 base_search.rowid
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [expression,
+                             *[user.id] * _VISIBLE.count("%s"),
+                             page_size + 1,
+                             (page - 1) * page_size])
+        rowids = [row[0] for row in cursor.fetchall()]
+    # the archived posts are found by hydrate when missing from the live
+    # tables.
+    keys = [{"id": rowid // 2,
+             "content_type": feed.REVIEW if rowid % 2 else feed.TICKET}
+            for rowid in rowids[:page_size]]
+    return SearchPage(feed.hydrate(keys), len(rowids) > page_size)
+
+
+def rebuild(batch_size: int = BATCH_SIZE, stdout=None) -> int:
+    """empties the index, then indexes every post by batches of primary
+    keys. Returns the number of posts indexed."""
+    sources = [
+        ("base_ticket", "2 * id", "title", "description"),
+        ("base_review", "2 * id + 1", "headline", "body"),
+        ("base_archivedticket", "2 * id", "title", "description"),
+        ("base_archivedreview", "2 * id + 1", "headline", "body"),
+    ]
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DELETE FROM base_search")
+        for table, rowid, title, body in sources:
+            last_id = 0
+            while True:
+                cursor.execute(
+                    f"SELECT max(id), count(*) FROM (SELECT id FROM {table} "
+                    f"WHERE id > %s ORDER BY id LIMIT %s)",
+                    [last_id, batch_size])
+                upper, count = cursor.fetchone()
+                if not count:
+                    break
+                cursor.execute(
+                    f"INSERT INTO base_search(rowid, title, body) "
+                    f"SELECT {rowid}, {title}, {body} FROM {table} "
+                    f"WHERE id > %s AND id <= %s",
+                    [last_id, upper])
+                last_id = upper
+                total += count
+                if stdout is not None:
+                    stdout.write(f"{table}: {total} posts indexed")
+    return total
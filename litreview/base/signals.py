@@ -0,0 +1,208 @@
+"""Receivers keeping derived data in sync with Ticket, Review, UserFollows
+and User: the push-mode timelines, the per-user feed cache, the user
+counters, the review aggregates of the tickets and the cached users of
+base/user_cache.py. They are connected in BaseConfig.ready(). The cached
+snippet bodies need no receiver, see base/fragments.py.
+
+Archiving posts doesn't go through these receivers (see base/archive.py);
+restoring them does, to put them back in the timelines.
+
+Editing a post changes neither who sees it nor its place in the feed, so
+timelines only handle creations and deletions, and the reviews moved to
+another ticket. The feed cache is also invalidated on edits, since its
+versions tell whether a page changed.
+
+The work reaching an unbounded number of rows is run as background jobs
+(see base/jobs.py): writing and removing timeline entries, and dropping
+the feed caches of the followers of an author. The caches of the author
+and of the few other users concerned are dropped right away, so that
+they see their own writes.
+"""
+
+
+import base.archive as archive
+import base.feed as feed
+import base.feed_cache as feed_cache
+import base.jobs as jobs
+import base.models as models
+import base.ticket_stats as ticket_stats
+import base.timeline as timeline
+import base.user_cache as user_cache
+import base.user_stats as user_stats
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+INVALIDATE_FOLLOWERS = "feed_cache.invalidate_followers"
+FAN_OUT = "timeline.fan_out"
+REMOVE_POSTS = "timeline.remove_posts"
+FOLLOW_CHANGED = "timeline.follow_changed"
+REVIEW_MOVED = "timeline.review_moved"
+
+
+@jobs.handler(INVALIDATE_FOLLOWERS)
+def invalidate_followers(payloads: list[dict]) -> None:
+    feed_cache.invalidate_followers(
+        {author for payload in payloads for author in payload["authors"]})
+
+
+@jobs.handler(FAN_OUT)
+def fan_out(payloads: list[dict]) -> None:
+    """writes the new posts in the timelines of the users seeing them. The
+    caches of these users are dropped once the entries are written."""
+    ids = feed.ids_by_type(payloads)
+    owners = set()
+    for ticket in models.Ticket.objects.filter(id__in=ids[feed.TICKET]):
+        owners |= timeline.fan_out_ticket(ticket)
+    for review in models.Review.objects.filter(id__in=ids[feed.REVIEW]):
+        owners |= timeline.fan_out_review(review)
+    feed_cache.invalidate(owners)
+
+
+@jobs.handler(REMOVE_POSTS)
+def remove_posts(payloads: list[dict]) -> None:
+    for content_type, post_ids in feed.ids_by_type(payloads).items():
+        if post_ids:
+            timeline.remove_posts(content_type, post_ids)
+
+
+@jobs.handler(REVIEW_MOVED)
+def review_moved(payloads: list[dict]) -> None:
+    """moves the reviews from the timeline of the author of their previous
+    ticket to the one of the author of their current ticket."""
+    owners = set()
+    for payload in payloads:
+        review = models.Review.objects.filter(id=payload["id"]).first()
+        if review is None:
+            continue
+        owners |= timeline.move_review(review, payload["previous_author"])
+    feed_cache.invalidate(owners)
+
+
+@jobs.handler(FOLLOW_CHANGED)
+def follow_changed(payloads: list[dict]) -> None:
+    """copies or purges the posts of the followed user, depending on
+    whether the follow still exists when the job runs: a follow quickly
+    followed by an unfollow can't leave its posts behind."""
+    for payload in payloads:
+        follower_id, followed_id = payload["user_id"], payload["followed_id"]
+        if models.UserFollows.objects.filter(
+                user_id=follower_id, followed_user_id=followed_id).exists():
+            timeline.backfill(follower_id, followed_id)
+        else:
+            timeline.purge(follower_id, followed_id)
+        feed_cache.invalidate([follower_id])
+
+
+def _ticket_authors(*ticket_ids: int) -> list[int]:
+    """returns the authors of the tickets, leaving out the tickets being
+    deleted along with their reviews."""
+    return list(models.Ticket.objects.filter(
+        id__in=ticket_ids).values_list("user_id", flat=True).distinct())
+
+
+def _invalidate_audience(authors: list[int]) -> None:
+    """drops the caches of the authors right away, and of their followers in
+    a job."""
+    feed_cache.invalidate(authors)
+    if authors:
+        jobs.enqueue(INVALIDATE_FOLLOWERS, {"authors": authors})
+
+
+def _key(content_type: str, post) -> dict:
+    return {"content_type": content_type, "id": post.id}
+
+
+@receiver(post_save, sender=models.Ticket)
+def ticket_saved(sender, instance, created, **kwargs):
+    if created:
+        user_stats.post_added(instance.user_id, feed.TICKET)
+    if created and timeline.is_enabled():
+        jobs.enqueue(FAN_OUT, _key(feed.TICKET, instance))
+    _invalidate_audience([instance.user_id])
+    if not created:
+        # the reviews of the ticket display its title.
+        _invalidate_audience(sorted(set(models.Review.objects.filter(
+            ticket=instance).values_list("user_id", flat=True))))
+
+
+@receiver(post_save, sender=models.Review)
+def review_saved(sender, instance, created, **kwargs):
+    # a review moved to another ticket leaves the feed of the author of the
+    # previous one.
+    ticket_ids = {instance.ticket_id, getattr(
+        instance, "loaded_values", {}).get("ticket_id", instance.ticket_id)}
+    if created:
+        ticket_stats.review_added(instance)
+        user_stats.post_added(instance.user_id, feed.REVIEW)
+    else:
+        ticket_stats.review_edited(instance)
+    if created and timeline.is_enabled():
+        jobs.enqueue(FAN_OUT, _key(feed.REVIEW, instance))
+    if len(ticket_ids) > 1 and timeline.is_enabled():
+        for author in _ticket_authors(*(ticket_ids - {instance.ticket_id})):
+            jobs.enqueue(REVIEW_MOVED, {"id": instance.id,
+                                        "previous_author": author})
+    # the ticket displays the number and average rating of its reviews: the
+    # followers of its author see it change too.
+    _invalidate_audience([instance.user_id, *_ticket_authors(*ticket_ids)])
+
+
+@receiver(post_delete, sender=models.Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    user_stats.post_removed(instance.user_id, feed.TICKET)
+    if timeline.is_enabled():
+        jobs.enqueue(REMOVE_POSTS, _key(feed.TICKET, instance))
+    _invalidate_audience([instance.user_id])
+
+
+@receiver(post_delete, sender=models.Review)
+def review_deleted(sender, instance, **kwargs):
+    ticket_stats.review_removed(instance)
+    user_stats.post_removed(instance.user_id, feed.REVIEW)
+    if timeline.is_enabled():
+        jobs.enqueue(REMOVE_POSTS, _key(feed.REVIEW, instance))
+    _invalidate_audience([instance.user_id,
+                          *_ticket_authors(instance.ticket_id)])
+
+
+@receiver(archive.restored)
+def thread_restored(sender, ticket, reviews, **kwargs):
+    if timeline.is_enabled():
+        jobs.enqueue(FAN_OUT, _key(feed.TICKET, ticket))
+        for review in reviews:
+            jobs.enqueue(FAN_OUT, _key(feed.REVIEW, review))
+
+
+def _follow_changed(follow: models.UserFollows) -> None:
+    if timeline.is_enabled():
+        jobs.enqueue(FOLLOW_CHANGED, {"user_id": follow.user_id,
+                                      "followed_id": follow.followed_user_id})
+    feed_cache.invalidate([follow.user_id])
+
+
+@receiver(post_save, sender=models.UserFollows)
+def follow_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    _follow_changed(instance)
+    user_stats.follow_added(instance.user_id, instance.followed_user_id)
+
+
+@receiver(post_delete, sender=models.UserFollows)
+def follow_deleted(sender, instance, **kwargs):
+    _follow_changed(instance)
+    user_stats.follow_removed(instance.user_id, instance.followed_user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        models.UserStats.objects.get_or_create(user=instance)
+    else:
+        user_cache.invalidate([instance.id])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_cache.invalidate([instance.id])
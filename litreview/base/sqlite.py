@@ -0,0 +1,43 @@
+"""SQLite settings applied to every new connection.
+
+settings.SQLITE_PROFILE picks one of PROFILES. "production" favours
+concurrent requests:
+- journal_mode=WAL: readers no longer block the writer, nor the writer
+the readers. The mode is stored in the database file;
+- synchronous=NORMAL: with WAL, commits no longer wait for the disk. A
+power loss may lose the last transactions, never corrupt the database;
+- mmap_size and cache_size: reads are served from memory;
+- busy_timeout: a connection finding the database locked retries for up
+to that many milliseconds before raising "database is locked".
+
+Pragmas hold for the lifetime of a connection, so the production profile
+goes along with persistent connections (CONN_MAX_AGE, see settings.py).
+"""
+
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PROFILES: dict[str, dict[str, object]] = {
+    "development": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        # negative sizes are in KiB: 64 MiB.
+        "cache_size": -64 * 1024,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = PROFILES[settings.SQLITE_PROFILE]
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,86 @@
+"""Streamed rendering of the feed and posts pages.
+
+With settings.PAGE_RENDERING set to "streaming", the Feed and Posts views
+return a StreamingHttpResponse instead of rendering the whole page in
+memory. The page template is rendered once with a placeholder where the
+posts go (the stream_slot variable); everything before it is sent, then
+the posts, STREAMING_CHUNK_SIZE at a time, and finally the rest of the
+page. Each chunk of keys is hydrated with one query per model (see
+base.feed.hydrate) and rendered with the item template of the page
+(base/feed_item.html, base/posts_item.html), so a worker only ever holds
+one chunk of posts, whatever the page size.
+
+The first chunk of keys is read before anything is sent: when there is
+none, the page is rendered as usual, with its "no posts" message.
+
+The posts are fetched and rendered while the response is sent, i.e. after
+the view and the middleware returned:
+- the queries aren't counted by query_budget and always go to the primary
+(see base/replicas.py);
+- the connection is released at the end of the response, when Django sends
+request_finished.
+
+Django 4.0 iterates streamed content in the event loop under ASGI, where
+the ORM can't be used: requests served through ASGI are always rendered
+in memory.
+"""
+
+
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional
+
+import base.feed as feed
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.template.context import make_context
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+SLOT = mark_safe("<!-- stream_slot -->")
+
+
+def is_enabled(request) -> bool:
+    return (settings.PAGE_RENDERING == "streaming"
+            and not isinstance(request, ASGIRequest))
+
+
+def _chunks(keys: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    keys = iter(keys)
+    while chunk := list(islice(keys, size)):
+        yield chunk
+
+
+def _render(request, template_name: str, item_template: str,
+            keys: Iterable[dict], context: dict) -> Iterator[str]:
+    chunks = _chunks(keys, settings.STREAMING_CHUNK_SIZE)
+    first = next(chunks, None)
+    if first is None:
+        yield render_to_string(template_name, {**context, "posts": []},
+                               request)
+        return
+    page = render_to_string(template_name, {**context, "stream_slot": SLOT},
+                            request)
+    head, tail = page.split(SLOT, 1)
+    yield head
+    template = get_template(item_template).template
+    item_context = make_context(context, request)
+    # the context processors run once, not once per post.
+    with item_context.bind_template(template):
+        for chunk in chain([first], chunks):
+            html = []
+            for post in feed.hydrate(chunk):
+                with item_context.push(post=post):
+                    html.append(template.render(item_context))
+            yield "".join(html)
+    yield tail
+
+
+def stream_posts(request, template_name: str, item_template: str,
+                 keys: Iterable[dict],
+                 context: Optional[dict] = None) -> StreamingHttpResponse:
+    """streams the page, rendering item_template for each post of keys (see
+    the module docstring). keys may be lazy, e.g. a queryset iterator."""
+    return StreamingHttpResponse(
+        _render(request, template_name, item_template, keys, context or {}),
+        content_type="text/html; charset=utf-8")
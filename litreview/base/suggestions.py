@@ -0,0 +1,154 @@
+"""Friends-of-friends follow suggestions ("people you may know").
+
+A user is suggested to another one when people he follows follow that
+user; the more of them, the better the suggestion. Counting this for one
+user means reading the follows of every user he follows, which is too slow
+for a request: `python manage.py compute_suggestions` computes the best
+SUGGESTIONS_TOP_K suggestions of every user in batch and stores them in
+the Suggestion table, which the following page reads.
+
+The follow graph is loaded once into two arrays, in compressed sparse row
+(CSR) form: the ids of the users followed by the user of id u are
+indices[indptr[u]:indptr[u + 1]]. Both are arrays of 64-bit integers from
+the array module, i.e. 8 bytes per follow and per user, against hundreds
+for the model instances or tuples the ORM would return. The two-hop counts
+of a user are then computed by counting the followed rows of the users he
+follows (Counter.update runs in C over each row).
+
+Users are computed and written by chunks of SUGGESTIONS_CHUNK_SIZE, each in
+its own transaction. By default, only the users whose suggestions may have
+changed are computed again: the ones who followed or unfollowed someone
+since their suggestions were computed (see UserStats.follows_changed_at),
+and their followers, whose two-hop neighbourhood goes through them.
+"""
+
+
+import heapq
+from array import array
+from collections import Counter
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import base.models as models
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Max, Q, QuerySet
+from django.utils import timezone
+
+BATCH_SIZE = 10000
+
+
+class Graph(NamedTuple):
+    """The follow graph in CSR form, see the module docstring. User ids are
+    used as row numbers, ids without user having an empty row."""
+    indptr: array
+    indices: array
+
+    def followed(self, user_id: int) -> array:
+        if user_id + 1 >= len(self.indptr):
+            # created after the graph was loaded.
+            return array("q")
+        return self.indices[self.indptr[user_id]:self.indptr[user_id + 1]]
+
+    @property
+    def edges(self) -> int:
+        return len(self.indices)
+
+
+def load_graph() -> Graph:
+    """reads every follow once, in the order of the unique index on
+    (user, followed_user)."""
+    last_id = User.objects.aggregate(last=Max("id"))["last"] or 0
+    degrees = array("q", bytes(8 * (last_id + 1)))
+    indices = array("q")
+    follows = models.UserFollows.objects.filter(
+        user_id__lte=last_id
+    ).order_by("user_id", "followed_user_id").values_list(
+        "user_id", "followed_user_id").iterator(chunk_size=BATCH_SIZE)
+    for user_id, followed_id in follows:
+        degrees[user_id] += 1
+        indices.append(followed_id)
+    return Graph(array("q", accumulate(degrees, initial=0)), indices)
+
+
+def suggest(graph: Graph, user_id: int, top_k: int) -> list[tuple[int, int]]:
+    """returns the top_k (suggested user id, score) of the user, best first,
+    ties broken by id. The user and the users he follows are left out."""
+    followed = graph.followed(user_id)
+    counts = Counter()
+    for followed_id in followed:
+        counts.update(graph.followed(followed_id))
+    counts.pop(user_id, None)
+    for followed_id in followed:
+        counts.pop(followed_id, None)
+    return heapq.nsmallest(top_k, counts.items(),
+                           key=lambda item: (-item[1], item[0]))
+
+
+def _chunks(ids: Iterable[int], size: int) -> Iterator[list[int]]:
+    ids = iter(ids)
+    while chunk := list(islice(ids, size)):
+        yield chunk
+
+
+def stale_users() -> set[int]:
+    """ids of the users whose suggestions may have changed since they were
+    computed, see the module docstring."""
+    changed = list(models.UserStats.objects.filter(
+        Q(suggestions_computed_at__isnull=True)
+        | Q(follows_changed_at__gt=F("suggestions_computed_at"))
+    ).values_list("user_id", flat=True).iterator(chunk_size=BATCH_SIZE))
+    stale = set(changed)
+    for chunk in _chunks(changed, BATCH_SIZE):
+        stale.update(models.UserFollows.objects.filter(
+            followed_user_id__in=chunk).values_list("user_id", flat=True))
+    return stale
+
+
+def _write(graph: Graph, user_ids: list[int], top_k: int,
+           computed_at) -> int:
+    rows = [models.Suggestion(user_id=user_id, suggested_user_id=suggested,
+                              score=score)
+            for user_id in user_ids
+            for suggested, score in suggest(graph, user_id, top_k)]
+    with transaction.atomic():
+        models.Suggestion.objects.filter(user_id__in=user_ids).delete()
+        models.Suggestion.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        models.UserStats.objects.filter(user_id__in=user_ids).update(
+            suggestions_computed_at=computed_at)
+    return len(rows)
+
+
+def refresh(full: bool = False, top_k: Optional[int] = None,
+            chunk_size: Optional[int] = None) -> dict:
+    """computes and stores the suggestions of the stale users, or of every
+    user with full. Returns the number of users, follows and suggestions
+    handled."""
+    top_k = top_k or settings.SUGGESTIONS_TOP_K
+    chunk_size = chunk_size or settings.SUGGESTIONS_CHUNK_SIZE
+    # follows made from now on are seen by the next run.
+    computed_at = timezone.now()
+    if full:
+        user_ids = array("q", User.objects.order_by("id").values_list(
+            "id", flat=True).iterator(chunk_size=BATCH_SIZE))
+    else:
+        user_ids = sorted(stale_users())
+    graph = load_graph()
+    users = written = 0
+    for chunk in _chunks(user_ids, chunk_size):
+        users += len(chunk)
+        written += _write(graph, chunk, top_k, computed_at)
+    return {"users": users, "follows": graph.edges, "suggestions": written}
+
+
+def for_user(user: User, limit: int) -> QuerySet:
+    """the best suggestions of the user, leaving out the users he followed
+    since they were computed."""
+    followed = models.UserFollows.objects.filter(user=user).values(
+        "followed_user")
+    return models.Suggestion.objects.filter(user=user).exclude(
+        suggested_user__in=followed
+    ).select_related("suggested_user").only(
+        "score", "suggested_user__username"
+    ).order_by("-score", "suggested_user")[:limit]
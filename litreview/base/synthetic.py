@@ -0,0 +1,144 @@
+"""Fills the database with synthetic users, follows, tickets and reviews.
+
+Used by the generate_data and benchmark management commands to see how the
+views behave at scale. The data tries to look like a real social network:
+- a few users gather most followers: followed users are drawn with a
+power-law (Zipf) weight, and the number of users each user follows is
+itself drawn from a Pareto distribution;
+- recent posts are more frequent than old ones and posting peaks in the
+evening;
+- a review is always created after the ticket it responds to.
+
+Rows are inserted with bulk_create, in batches. bulk_create doesn't send
+the post_save signal, hence the derived data isn't updated: run
+repair_counters afterwards, and rebuild_timelines when FEED_MODE is "push".
+"""
+
+
+import datetime
+import random
+from itertools import accumulate
+from typing import NamedTuple
+
+import base.models as models
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+PASSWORD = "litreview-bench"
+
+
+class Sizes(NamedTuple):
+    users: int
+    follows_per_user: float = 10
+    tickets_per_user: float = 5
+    reviews_per_user: float = 5
+    days: int = 365
+
+
+def _bulk(model, objects, batch_size: int) -> None:
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def _post_time(rng: random.Random, now: datetime.datetime,
+               days: int) -> datetime.datetime:
+    """recent days are more likely, and evenings more than nights."""
+    age = min(rng.expovariate(3 / days), days)
+    moment = now - datetime.timedelta(days=age)
+    hour = int(rng.triangular(0, 24, 20)) % 24
+    moment = moment.replace(hour=hour, minute=rng.randrange(60),
+                            second=rng.randrange(60))
+    return min(moment, now)
+
+
+def generate(sizes: Sizes, seed: int = 0, batch_size: int = 1000,
+             prefix: str = "user", stdout=None) -> dict:
+    """creates the data and returns the number of rows created per
+    model."""
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic(), models.explicit_time_created():
+        password = make_password(PASSWORD)
+        first_id = (User.objects.order_by("-id").values_list(
+            "id", flat=True).first() or 0) + 1
+        _bulk(User, (User(username=f"{prefix}{first_id + i}",
+                          password=password, date_joined=now)
+                     for i in range(sizes.users)), batch_size)
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix, id__gte=first_id
+        ).values_list("id", flat=True))
+        log(f"{len(user_ids)} users")
+
+        # popularity follows a Zipf law over a random ranking of the users.
+        ranking = user_ids[:]
+        rng.shuffle(ranking)
+        weights = list(accumulate(1 / (rank + 1) for rank in
+                                  range(len(ranking))))
+        follows = 0
+
+        def follow_rows():
+            nonlocal follows
+            for user_id in user_ids:
+                wanted = min(len(ranking) - 1, int(
+                    sizes.follows_per_user / 2 * rng.paretovariate(2)))
+                followed = set()
+                tries = 0
+                while len(followed) < wanted and tries < wanted * 4:
+                    tries += 1
+                    candidate = rng.choices(ranking, cum_weights=weights)[0]
+                    if candidate != user_id:
+                        followed.add(candidate)
+                for followed_id in followed:
+                    follows += 1
+                    yield models.UserFollows(user_id=user_id,
+                                             followed_user_id=followed_id)
+
+        _bulk(models.UserFollows, follow_rows(), batch_size)
+        log(f"{follows} follows")
+
+        n_tickets = int(len(user_ids) * sizes.tickets_per_user)
+        _bulk(models.Ticket, (
+            models.Ticket(title=f"Ticket {i}",
+                          description="Looking for a review. " * rng.randint(
+                              1, 20),
+                          user_id=rng.choice(user_ids),
+                          time_created=_post_time(rng, now, sizes.days))
+            for i in range(n_tickets)), batch_size)
+        tickets = list(models.Ticket.objects.order_by("-id").values_list(
+            "id", "time_created")[:n_tickets])
+        log(f"{len(tickets)} tickets")
+
+        n_reviews = min(int(len(user_ids) * sizes.reviews_per_user),
+                        len(tickets))
+        reviewed = rng.sample(tickets, n_reviews)
+
+        def review_rows():
+            for ticket_id, ticket_time in reviewed:
+                delay = datetime.timedelta(hours=rng.expovariate(1 / 48))
+                yield models.Review(
+                    ticket_id=ticket_id,
+                    rating=rng.randint(0, 5),
+                    headline=f"Review of ticket {ticket_id}",
+                    body="A thoughtful review. " * rng.randint(1, 100),
+                    user_id=rng.choice(user_ids),
+                    time_created=min(ticket_time + delay, now))
+
+        _bulk(models.Review, review_rows(), batch_size)
+        log(f"{n_reviews} reviews")
+
+    return {"users": len(user_ids), "follows": follows,
+            "tickets": len(tickets), "reviews": n_reviews}
+
@@ -1,8 +1,19 @@
+import base.fragments as fragments
 from django import template
+from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+# ratings go from 0 to 5: the markup of every rating is built once.
+STARS = tuple(mark_safe("<span>★</span>" * n) for n in range(6))
+
 
 @register.filter
-def times(number):
-    return range(number)
+def stars(rating):
+    return STARS[rating]
+
+
+@register.simple_tag
+def post_body(post):
+    """the part of a ticket or review snippet shared by every reader."""
+    return fragments.render_body(post)
@@ -0,0 +1,90 @@
+"""The JSON endpoints of base/api.py."""
+
+
+import json
+
+import base.models as models
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+
+class ApiTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.author, self.other = (
+            User.objects.create_user(name)
+            for name in ("reader", "author", "other"))
+        for followed in (self.author, self.other):
+            models.UserFollows.objects.create(user=self.user,
+                                              followed_user=followed)
+        self.tickets = [post_ticket(self.author, minutes, description="text")
+                        for minutes in (5, 4, 3)]
+        self.review = post_review(self.tickets[0], self.user, 1)
+        self.client.force_login(self.user)
+
+    def get(self, page: str, **params):
+        response = self.client.get(reverse(page), params)
+        content = b"".join(response.streaming_content) \
+            if response.streaming else response.content
+        return response.status_code, json.loads(content)
+
+    def test_feed_pages(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            status, data = self.get("base:api_feed", **params)
+            self.assertEqual(status, 200)
+            self.assertLessEqual(len(data["posts"]), 2)
+            seen += [(post["type"], post["id"]) for post in data["posts"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [("review", self.review.id)]
+                         + [("ticket", ticket.id)
+                            for ticket in reversed(self.tickets)])
+
+    def test_fields(self):
+        status, data = self.get("base:api_posts", fields="headline")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["posts"], [{"type": "review",
+                                          "id": self.review.id,
+                                          "headline": "review"}])
+        status, data = self.get("base:api_posts", fields="nope")
+        self.assertEqual(status, 400)
+
+    def test_follows(self):
+        status, data = self.get("base:api_following", limit=1)
+        self.assertEqual(data["following"],
+                         [{"id": self.author.id, "username": "author"}])
+        status, data = self.get("base:api_following",
+                                cursor=data["next_cursor"])
+        self.assertEqual(data, {"following": [{"id": self.other.id,
+                                               "username": "other"}],
+                                "next_cursor": None})
+        self.client.force_login(self.author)
+        status, data = self.get("base:api_followers")
+        self.assertEqual(data["followers"],
+                         [{"id": self.user.id, "username": "reader"}])
+
+    def test_invalid_parameters(self):
+        invalid = [{"cursor": "not a cursor"}, {"limit": "many"}]
+        # "nope": a username, but not a post.
+        posts = invalid + [{"cursor": "bm9wZQ=="}]
+        for page, cases in (("base:api_feed", posts),
+                            ("base:api_posts", posts),
+                            ("base:api_following", invalid),
+                            ("base:api_followers", invalid)):
+            for params in cases:
+                with self.subTest(page=page, params=params):
+                    status, data = self.get(page, **params)
+                    self.assertEqual(status, 400)
+                    self.assertIn("error", data)
+
+    def test_login_required(self):
+        self.client.logout()
+        status, data = self.get("base:api_feed")
+        self.assertEqual(status, 401)
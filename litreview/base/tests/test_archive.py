@@ -0,0 +1,172 @@
+"""Archiving old threads (base/archive.py) and reading them back."""
+
+
+import datetime
+from unittest import mock
+
+import base.archive as archive
+import base.feed as feed
+import base.models as models
+import base.search as search
+from base.tests import NOW, BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+# an hour before the boundary, in minutes.
+OLD = 24 * 60
+
+
+@override_settings(FEED_PAGE_SIZE=3, POSTS_PAGE_SIZE=3)
+class ArchiveTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader")
+        self.author = User.objects.create_user("author")
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.author)
+        self.recent = post_ticket(self.author, 1)
+        self.old = post_ticket(self.author, OLD + 3)
+        self.review = post_review(self.old, self.user, OLD + 2)
+        # an old ticket reviewed recently stays live.
+        self.kept = post_ticket(self.user, OLD + 4)
+        post_review(self.kept, self.author, 2)
+        self.client.force_login(self.user)
+
+    def run_archive(self) -> models.ArchiveRun:
+        return archive.archive(NOW - datetime.timedelta(minutes=OLD - 60),
+                               batch_size=1)
+
+    def pages(self, name: str) -> list[tuple[str, int]]:
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse(name),
+                                       {"cursor": cursor} if cursor else {})
+            seen += [(post.content_type, post.id)
+                     for post in response.context["posts"]]
+            cursor = response.context["next_cursor"]
+            if cursor is None:
+                return seen
+
+    def test_moves_old_threads_only(self):
+        run = self.run_archive()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.tickets, run.reviews), (1, 1))
+        self.assertTrue(models.ArchivedTicket.objects.filter(
+            id=self.old.id).exists())
+        self.assertTrue(models.ArchivedReview.objects.filter(
+            id=self.review.id).exists())
+        self.assertEqual(set(models.Ticket.objects.values_list(
+            "id", flat=True)), {self.recent.id, self.kept.id})
+
+    def test_pages_unchanged(self):
+        before = self.pages("base:feed"), self.pages("base:posts")
+        self.run_archive()
+        self.assertEqual((self.pages("base:feed"), self.pages("base:posts")),
+                         before)
+
+    def test_forms_restore_on_submit_only(self):
+        self.run_archive()
+        self.client.force_login(self.author)
+        url = reverse("base:ticket_update", args=[self.old.id])
+        self.assertContains(self.client.get(url), self.old.title)
+        self.assertFalse(models.Ticket.objects.filter(
+            id=self.old.id).exists())
+        response = self.client.post(url, {"title": "edited",
+                                          "description": ""})
+        self.assertEqual(response.status_code, 302)
+        ticket = models.Ticket.objects.get(id=self.old.id)
+        self.assertEqual((ticket.title, ticket.time_created),
+                         ("edited", self.old.time_created))
+        self.assertTrue(models.Review.objects.filter(
+            id=self.review.id).exists())
+        self.assertFalse(models.ArchivedTicket.objects.exists())
+
+
+class ArchivedSearchTest(BaseTestCase):
+    """archived posts stay searchable, with the visibility rules of the
+    feed."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.author, self.other = (
+            User.objects.create_user(name)
+            for name in ("reader", "author", "other"))
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.author)
+        self.ticket = post_ticket(self.author, OLD, title="zebra")
+        self.review = post_review(self.ticket, self.other, OLD)
+        models.Review.objects.filter(id=self.review.id).update(
+            headline="zebra crossing")
+        archive.archive(NOW)
+        self.assertFalse(models.Ticket.objects.exists())
+
+    def found(self, user: User) -> list[tuple[str, int]]:
+        return [(post.content_type, post.id)
+                for post in search.search(user, "zebra").posts]
+
+    def test_archived_posts_found(self):
+        ticket, review = ((feed.TICKET, self.ticket.id),
+                          (feed.REVIEW, self.review.id))
+        self.assertEqual(sorted(self.found(self.author)), [review, ticket])
+        self.assertEqual(self.found(self.user), [ticket])
+        self.assertEqual(self.found(self.other), [review])
+
+    def test_restored_posts_found_once(self):
+        archive.restore(feed.TICKET, self.ticket.id)
+        self.assertFalse(models.ArchivedTicket.objects.exists())
+        self.assertEqual(len(self.found(self.author)), 2)
+        self.assertEqual(search.rebuild(), 2)
+        self.assertEqual(len(self.found(self.author)), 2)
+
+
+class ArchiveCompleteTest(BaseTestCase):
+    """archive.complete only reads the archive on the pages reaching the
+    boundary."""
+
+    def keys(self, *minutes_ago: int) -> list[dict]:
+        return [{"content_type": feed.TICKET, "id": minutes,
+                 "time_created": NOW - datetime.timedelta(minutes=minutes)}
+                for minutes in minutes_ago]
+
+    def complete(self, live: list[dict], limit: int,
+                 archived: list[dict]) -> tuple[list[dict], bool]:
+        read = mock.Mock(return_value=archived)
+        return archive.complete(live, limit, read), read.called
+
+    def archive_before(self, minutes_ago: int) -> None:
+        models.ArchiveRun.objects.create(
+            cutoff=NOW - datetime.timedelta(minutes=minutes_ago))
+
+    def test_empty_archive(self):
+        live = self.keys(1, 2)
+        self.assertEqual(self.complete(live, 3, self.keys(10)),
+                         (live, False))
+
+    def test_full_page_before_boundary(self):
+        self.archive_before(5)
+        live = self.keys(1, 2, 5)
+        self.assertEqual(self.complete(live, 3, self.keys(10)),
+                         (live, False))
+
+    def test_full_page_past_boundary(self):
+        self.archive_before(5)
+        keys, read = self.complete(self.keys(1, 6, 8), 3, self.keys(7))
+        self.assertTrue(read)
+        self.assertEqual([key["id"] for key in keys], [1, 6, 7])
+        self.assertEqual([key.get("archived", False) for key in keys],
+                         [False, False, True])
+
+    def test_short_page(self):
+        self.archive_before(5)
+        keys, read = self.complete(self.keys(1), 3, self.keys(6, 7, 8))
+        self.assertTrue(read)
+        self.assertEqual([key["id"] for key in keys], [1, 6, 7])
+
+    def test_newest_cutoff_sets_boundary(self):
+        self.archive_before(20)
+        self.archive_before(5)
+        keys, read = self.complete(self.keys(1, 2, 10), 3, self.keys(30))
+        self.assertTrue(read)
+        self.assertEqual([key["id"] for key in keys], [1, 2, 10])
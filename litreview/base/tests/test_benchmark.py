@@ -0,0 +1,42 @@
+"""The benchmarks of base/benchmark.py leave the caches of the project
+alone."""
+
+
+import base.benchmark as benchmark
+import base.synthetic as synthetic
+from base.tests import BaseTestCase
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+
+
+class IsolatedCachesTest(BaseTestCase):
+
+    def test_every_alias_in_local_memory(self):
+        isolated = benchmark.isolated_caches()
+        self.assertEqual(set(isolated), set(settings.CACHES))
+        for alias, config in isolated.items():
+            self.assertEqual(config["BACKEND"],
+                             "django.core.cache.backends.locmem.LocMemCache")
+            self.assertEqual(config.get("TIMEOUT"),
+                             settings.CACHES[alias].get("TIMEOUT"))
+
+    def test_cleared_when_isolated_only(self):
+        for alias in ("feed", "auth"):
+            caches[alias].set("kept", 1)
+            with self.assertRaises(RuntimeError):
+                benchmark.clear_cache(alias)
+            with override_settings(CACHES=benchmark.isolated_caches()):
+                caches[alias].set("dropped", 1)
+                benchmark.clear_cache(alias)
+                self.assertIsNone(caches[alias].get("dropped"))
+            self.assertEqual(caches[alias].get("kept"), 1)
+
+    def test_measure(self):
+        synthetic.generate(synthetic.Sizes(5, follows_per_user=2))
+        users = benchmark.sample_users(2)
+        with override_settings(CACHES=benchmark.isolated_caches()):
+            result = benchmark.measure(benchmark.VIEWS["feed"], users,
+                                       repeat=3, cold_cache=True)
+        self.assertEqual(result["requests"], 3)
+        self.assertGreater(result["queries_avg"], 0)
@@ -0,0 +1,88 @@
+"""The conditional GET of base/conditional.py."""
+
+
+import importlib
+
+import base.conditional as conditional
+import base.models as models
+from asgiref.sync import async_to_sync
+from base.conditional import async_user_content_conditional
+from base.tests import BaseTestCase, post_ticket
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+PAGES = ("base:feed", "base:posts", "base:api_feed", "base:api_posts")
+
+
+class ConditionalTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.author = (User.objects.create_user(name)
+                                  for name in ("reader", "author"))
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.author)
+        post_ticket(self.author, 1)
+        self.client.force_login(self.user)
+
+    def get(self, page: str, **headers):
+        return self.client.get(reverse(page), **headers)
+
+    def test_not_modified(self):
+        for page in PAGES:
+            with self.subTest(page=page):
+                response = self.get(page)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("private", response["Cache-Control"])
+                etag = response["ETag"]
+                response = self.get(page, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                response = self.get(
+                    page,
+                    HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+                self.assertEqual(response.status_code, 304)
+
+    def test_modified_by_a_new_post(self):
+        response = self.get("base:feed")
+        with self.captureOnCommitCallbacks(execute=True):
+            post_ticket(self.author, 0)
+        response = self.get("base:feed", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_same_validators_in_every_process(self):
+        response = self.get("base:feed")
+        # as if the page was served by another process.
+        importlib.reload(conditional)
+        self.assertEqual(self.get("base:feed")["ETag"], response["ETag"])
+        self.assertEqual(self.get("base:feed")["Last-Modified"],
+                         response["Last-Modified"])
+        with override_settings(BUILD_ID="next"):
+            response = self.get("base:feed",
+                                HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_depend_on_the_user(self):
+        etag = self.get("base:feed")["ETag"]
+        self.client.force_login(self.author)
+        response = self.get("base:feed", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_view(self):
+        # the async pages run their queries in other threads, which don't
+        # see the data of the test: the decorator is checked on its own.
+        @async_user_content_conditional
+        async def view(request):
+            return HttpResponse("page")
+
+        def get(**headers):
+            request = RequestFactory().get(reverse("base:feed"), **headers)
+            request.user = self.user
+            return async_to_sync(view)(request)
+
+        response = get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], self.get("base:feed")["ETag"])
+        response = get(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,65 @@
+"""The stored excerpts of the long texts, see base.models.ExcerptField."""
+
+
+import base.feed as feed
+import base.models as models
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+LONG = "word " * 100
+
+
+class ExcerptTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader")
+
+    def test_filled_on_save(self):
+        ticket = post_ticket(self.user, 1, description=LONG)
+        self.assertEqual(ticket.description_excerpt,
+                         LONG[:models.EXCERPT_LENGTH + 1])
+        self.assertTrue(ticket.description_is_cut)
+        self.assertEqual(ticket.description_preview,
+                         ("word " * 56).rstrip() + "…")
+        ticket.description = "short"
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.description_preview, "short")
+        self.assertFalse(ticket.description_is_cut)
+
+    def test_filled_by_bulk_create(self):
+        ticket = post_ticket(self.user, 1)
+        review, = models.Review.objects.bulk_create([models.Review(
+            ticket=ticket, user=self.user, rating=1, headline="bulk",
+            body=LONG)])
+        self.assertEqual(models.Review.objects.get(id=review.id).body_excerpt,
+                         LONG[:models.EXCERPT_LENGTH + 1])
+
+    def test_kept_when_the_text_is_deferred(self):
+        ticket = post_ticket(self.user, 1, description=LONG)
+        ticket = models.Ticket.objects.defer("description").get(id=ticket.id)
+        ticket.title = "edited"
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.description, LONG)
+        self.assertTrue(ticket.description_is_cut)
+
+    def test_listings_leave_the_texts_out(self):
+        ticket = post_ticket(self.user, 2, description=LONG)
+        review = post_review(ticket, self.user, 1)
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse("base:feed"))
+        self.assertContains(response, "Read more", count=1)
+        self.assertContains(response, reverse("base:ticket_detail",
+                                              args=[ticket.id]))
+        for query in captured:
+            self.assertNotIn('"base_ticket"."description",', query["sql"])
+            self.assertNotIn('"base_review"."body",', query["sql"])
+        self.assertEqual(feed.hydrate(
+            [{"id": review.id, "content_type": feed.REVIEW}]
+        )[0].get_deferred_fields(), {"body"})
@@ -0,0 +1,136 @@
+"""The feed query of base/feed.py: visibility rules and cursor
+pagination."""
+
+
+from unittest import mock
+
+import base.feed as feed
+import base.models as models
+from base.tests import NOW, BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+
+class VisibilityTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.followed, self.other = (
+            User.objects.create_user(name)
+            for name in ("reader", "followed", "other"))
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.followed)
+
+    def keys(self) -> list[tuple[str, int]]:
+        return [(key["content_type"], key["id"])
+                for key in feed.feed_keys(self.user)]
+
+    def test_rules(self):
+        own = post_ticket(self.user, 1)
+        followed = post_ticket(self.followed, 2)
+        hidden = post_ticket(self.other, 3)
+        response = post_review(own, self.other, 4)
+        followed_review = post_review(hidden, self.followed, 5)
+        post_review(hidden, self.other, 6)
+        post_review(followed, self.other, 7)
+        self.assertEqual(self.keys(), [
+            (feed.TICKET, own.id), (feed.TICKET, followed.id),
+            (feed.REVIEW, response.id), (feed.REVIEW, followed_review.id)])
+
+    def test_response_by_followed_user_listed_once(self):
+        own = post_ticket(self.user, 1)
+        review = post_review(own, self.followed, 2)
+        self.assertEqual(self.keys(), [(feed.TICKET, own.id),
+                                       (feed.REVIEW, review.id)])
+
+    def test_authors_past_the_branch_limit(self):
+        for minutes_ago, author in enumerate(
+                (self.user, self.followed, self.user, self.followed)):
+            post_review(post_ticket(author, minutes_ago), self.other,
+                        minutes_ago)
+        expected = self.keys()
+        with mock.patch.object(feed, "MAX_AUTHOR_BRANCHES", 1):
+            self.assertEqual(self.keys(), expected)
+
+
+class CursorTest(BaseTestCase):
+
+    def test_round_trip(self):
+        cursor = feed.Cursor(NOW, feed.REVIEW, 42)
+        self.assertEqual(feed.decode_cursor(feed.encode_cursor(cursor)),
+                         cursor)
+
+    def test_unreadable_tokens(self):
+        for token in (None, "", "not base64!", "bm9waXBl",
+                      feed.encode_cursor(feed.Cursor(NOW, "OTHER", 1))):
+            self.assertIsNone(feed.decode_cursor(token))
+
+    @override_settings(FEED_PAGE_SIZE=3)
+    def test_pages_cover_the_feed_once(self):
+        """a ticket and a review holding the same id and time are both
+        listed, across page boundaries."""
+        user = User.objects.create_user("reader")
+        author = User.objects.create_user("author")
+        models.UserFollows.objects.create(user=user, followed_user=author)
+        for minutes_ago in (1, 2, 2, 2, 3, 5, 5):
+            ticket = post_ticket(author, minutes_ago)
+            post_review(ticket, user, minutes_ago)
+        expected = sorted(
+            [(t.time_created, feed.TICKET, t.id)
+             for t in models.Ticket.objects.all()]
+            + [(r.time_created, feed.REVIEW, r.id)
+               for r in models.Review.objects.all()], reverse=True)
+        self.client.force_login(user)
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse("base:feed"),
+                                       {"cursor": cursor} if cursor else {})
+            seen += [(post.time_created, post.content_type, post.id)
+                     for post in response.context["posts"]]
+            cursor = response.context["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+
+class MovedReviewTest(BaseTestCase):
+    """a review moved to another ticket responds to its new author."""
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer, self.first, self.second = (
+            User.objects.create_user(name)
+            for name in ("reviewer", "first", "second"))
+        self.ticket = post_ticket(self.first, 3)
+        self.other_ticket = post_ticket(self.second, 2)
+        self.review = post_review(self.ticket, self.reviewer, 1)
+
+    def feed_ids(self, user: User) -> list[tuple[str, int]]:
+        self.client.force_login(user)
+        return [(post.content_type, post.id) for post in
+                self.client.get(reverse("base:feed")).context["posts"]]
+
+    def test_both_feeds(self):
+        moved = (feed.REVIEW, self.review.id)
+        self.assertIn(moved, self.feed_ids(self.first))
+        self.assertNotIn(moved, self.feed_ids(self.second))
+        self.client.force_login(self.reviewer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("base:review_update",
+                        args=[self.review.id, self.other_ticket.id]),
+                {"rating": 4, "headline": "moved", "body": ""})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(moved, self.feed_ids(self.first))
+        self.assertIn(moved, self.feed_ids(self.second))
+
+    def test_stale_instance_saved_again(self):
+        stale = models.Review.objects.get(id=self.review.id)
+        models.Review.objects.filter(id=self.review.id).update(
+            ticket=self.other_ticket)
+        stale.ticket = self.other_ticket
+        stale.headline = "edited"
+        stale.save()
+        self.assertEqual(models.Review.objects.get(
+            id=self.review.id).ticket_user_id, self.second.id)
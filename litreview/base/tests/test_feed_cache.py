@@ -0,0 +1,68 @@
+"""The per-user feed cache of base/feed_cache.py and its invalidation."""
+
+
+import base.feed as feed
+import base.feed_cache as feed_cache
+import base.models as models
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+
+
+class FeedCacheTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.author, self.other = (
+            User.objects.create_user(name)
+            for name in ("reader", "author", "other"))
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.author)
+        self.ticket = post_ticket(self.author, 2)
+
+    def keys(self, user: User) -> list[tuple[str, int]]:
+        return [(key["content_type"], key["id"])
+                for key in feed_cache.feed_page_keys(user, None, 10)]
+
+    def versions(self) -> list[int]:
+        return [feed_cache.version(user.id)
+                for user in (self.user, self.author, self.other)]
+
+    def test_pages_read_from_the_cache(self):
+        self.assertEqual(self.keys(self.user),
+                         [(feed.TICKET, self.ticket.id)])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.keys(self.user),
+                             [(feed.TICKET, self.ticket.id)])
+        self.assertEqual(feed_cache.stats(),
+                         {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_new_posts_drop_the_audience_only(self):
+        self.keys(self.user)
+        reader, author, other = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = post_ticket(self.author, 1)
+        self.assertEqual(self.keys(self.user), [
+            (feed.TICKET, ticket.id), (feed.TICKET, self.ticket.id)])
+        versions = self.versions()
+        self.assertNotEqual(versions[:2], [reader, author])
+        self.assertEqual(versions[2], other)
+
+    def test_dropped_once_committed(self):
+        reader = feed_cache.version(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            post_ticket(self.author, 1)
+            self.assertEqual(feed_cache.version(self.user.id), reader)
+        self.assertNotEqual(feed_cache.version(self.user.id), reader)
+
+    def test_edits_and_follows(self):
+        changes = [
+            lambda: models.Ticket.objects.get(id=self.ticket.id).save(),
+            lambda: post_review(self.ticket, self.other, 1),
+            lambda: models.UserFollows.objects.create(
+                user=self.user, followed_user=self.other),
+        ]
+        for change in changes:
+            reader = feed_cache.version(self.user.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertNotEqual(feed_cache.version(self.user.id), reader)
@@ -0,0 +1,48 @@
+"""The cached snippet bodies of base/fragments.py."""
+
+
+from unittest import mock
+
+import base.feed as feed
+import base.fragments as fragments
+import base.models as models
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+
+class FragmentsTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader")
+        self.ticket = post_ticket(self.user, 2, title="first title")
+        self.review = post_review(self.ticket, self.user, 1)
+
+    def load(self, content_type: str, post_id: int):
+        return feed.fetch(content_type, [post_id])[post_id]
+
+    def test_rendered_once(self):
+        ticket = self.load(feed.TICKET, self.ticket.id)
+        with mock.patch.object(fragments, "render_to_string",
+                               wraps=fragments.render_to_string) as render:
+            html = fragments.render_body(ticket)
+            self.assertEqual(fragments.render_body(ticket), html)
+            self.assertEqual(fragments.render_body(
+                self.load(feed.TICKET, self.ticket.id)), html)
+        self.assertEqual(render.call_count, 1)
+        self.assertIn("first title", html)
+
+    def test_edits_read_a_new_body(self):
+        fragments.render_body(self.load(feed.REVIEW, self.review.id))
+        models.Ticket.objects.filter(id=self.ticket.id).update(
+            title="second title")
+        html = fragments.render_body(self.load(feed.REVIEW, self.review.id))
+        self.assertIn("second title", html)
+        self.assertIn("<span>★</span>" * 3, html)
+
+    def test_pages(self):
+        self.client.force_login(self.user)
+        for page in ("base:feed", "base:posts"):
+            response = self.client.get(reverse(page))
+            self.assertContains(response, "first title", count=2)
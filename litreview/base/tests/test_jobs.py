@@ -0,0 +1,68 @@
+"""The background job queue of base/jobs.py."""
+
+
+import datetime
+from unittest import mock
+
+import base.jobs as jobs
+import base.models as models
+from base.tests import BaseTestCase, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+
+
+@override_settings(BACKGROUND_JOBS=True, JOB_LEASE_SECONDS=60)
+class JobsTest(BaseTestCase):
+
+    def enqueue(self, kind: str, count: int) -> None:
+        for n in range(count):
+            jobs.enqueue(kind, {"n": n})
+
+    def test_claims_are_exclusive(self):
+        with mock.patch.dict(jobs.HANDLERS, {"test": lambda payloads: None}):
+            self.enqueue("test", 3)
+        first = jobs.claim("first", 2)
+        second = jobs.claim("second", 10)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertEqual(jobs.claim("third", 10), [])
+        # the lease of the first worker expires.
+        models.Job.objects.filter(id=first[0].id).update(
+            claimed_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual([job.id for job in jobs.claim("third", 10)],
+                         [first[0].id])
+
+    def test_expired_lease_rolls_back(self):
+        """a batch one of whose jobs was claimed again while it ran
+        leaves its writes and its jobs to the other worker."""
+        user = User.objects.create_user("author")
+
+        def slow(payloads):
+            post_ticket(user, 1)
+            # another worker claims the first job.
+            models.Job.objects.filter(id=claimed[0].id).update(
+                claimed_by="other")
+
+        with mock.patch.dict(jobs.HANDLERS, {"test": slow}):
+            self.enqueue("test", 2)
+            claimed = jobs.claim("first", 10)
+            self.assertEqual(jobs.run(claimed), 0)
+        self.assertFalse(models.Ticket.objects.exists())
+        self.assertEqual(models.Job.objects.count(), 2)
+
+    def test_failing_job_is_isolated(self):
+        seen = []
+
+        def flaky(payloads):
+            seen.append([payload["n"] for payload in payloads])
+            if any(payload["n"] == 1 for payload in payloads):
+                raise ValueError("boom")
+
+        with mock.patch.dict(jobs.HANDLERS, {"test": flaky}):
+            self.enqueue("test", 3)
+            self.assertEqual(jobs.work("worker", once=True), 2)
+        self.assertEqual(seen, [[0, 1, 2], [0], [1], [2]])
+        job = models.Job.objects.get()
+        self.assertEqual((job.payload, job.attempts), ({"n": 1}, 1))
+        self.assertIn("boom", job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
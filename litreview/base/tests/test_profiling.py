@@ -0,0 +1,76 @@
+"""The request profiles of base/profiling.py."""
+
+
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import base.profiling as profiling
+from base.tests import BaseTestCase, post_ticket
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import modify_settings, override_settings
+from django.urls import reverse
+
+
+def dump(directory: str, pid: int, requests: int) -> None:
+    """writes the dump of a process having profiled the feed."""
+    registry = profiling.Registry()
+    for _ in range(requests):
+        registry.observe("base:feed", profiling.RequestProfile())
+    path = Path(directory) / f"profiling-{pid}.json"
+    path.write_text(json.dumps(registry.to_dict()))
+
+
+@override_settings(PROFILING_FLUSH_INTERVAL=3600, METRICS_TOKEN="secret")
+@modify_settings(MIDDLEWARE={"prepend": "base.profiling.ProfilingMiddleware"})
+class ProfilingTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = mock.patch.object(profiling, "registry",
+                                    profiling.Registry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user("reader")
+        post_ticket(self.user, 1)
+        self.client.force_login(self.user)
+
+    def metrics(self) -> str:
+        with self.settings(PROFILING_DIR=self.directory):
+            response = self.client.get(reverse("base:metrics"),
+                                       HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_server_timing(self):
+        response = self.client.get(reverse("base:feed"))
+        self.assertIn("sql;dur=", response["Server-Timing"])
+        self.assertNotIn("tpl;dur=0.0,", response["Server-Timing"])
+
+    def test_metrics_merge_every_process(self):
+        self.client.get(reverse("base:feed"))
+        dump(self.directory, os.getpid() + 1, requests=2)
+        # the dump of this process is older than its live histograms.
+        dump(self.directory, os.getpid(), requests=5)
+        self.assertIn('litreview_view_seconds_count{route="base:feed"} 3',
+                      self.metrics())
+
+    def test_metrics_restricted(self):
+        self.assertEqual(self.client.get(reverse("base:metrics")).status_code,
+                         403)
+
+    def test_dump_profiling(self):
+        dump(self.directory, 1, requests=2)
+        dump(self.directory, 2, requests=1)
+        output = io.StringIO()
+        call_command("dump_profiling", dir=self.directory,
+                     format="prometheus", stdout=output)
+        self.assertIn('litreview_view_seconds_count{route="base:feed"} 3',
+                      output.getvalue())
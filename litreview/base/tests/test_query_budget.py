@@ -0,0 +1,67 @@
+"""The listing views run a bounded number of queries, see
+base/query_budget.py."""
+
+
+import base.models as models
+from base.query_budget import QueryBudgetMixin
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, FEED_PAGE_SIZE=5,
+                   POSTS_PAGE_SIZE=5)
+class QueryBudgetTest(QueryBudgetMixin, BaseTestCase):
+    """the listing views run the same number of queries whatever the
+    number of posts and follows. The session and the user of the request
+    take 2 of them."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader")
+        self.client.force_login(self.user)
+        self.minutes_ago = 0
+
+    def add_posts(self, authors: int) -> None:
+        """authors new users followed by the reader, posting tickets
+        reviewed by the reader and by each other."""
+        start = User.objects.count()
+        for i in range(authors):
+            author = User.objects.create_user(f"author{start + i}")
+            models.UserFollows.objects.create(user=self.user,
+                                              followed_user=author)
+            for _ in range(3):
+                self.minutes_ago += 2
+                ticket = post_ticket(author, self.minutes_ago)
+                post_review(ticket, self.user, self.minutes_ago - 1)
+            own = post_ticket(self.user, self.minutes_ago + 1)
+            post_review(own, author, self.minutes_ago)
+
+    def assertPagesBudget(self, name: str, max_queries: int) -> None:
+        url = reverse(name)
+        for _ in range(2):
+            with self.assertQueryBudget(max_queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        with self.assertQueryBudget(max_queries):
+            response = self.client.get(
+                url, {"cursor": response.context["next_cursor"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed(self):
+        for authors in (2, 10):
+            self.add_posts(authors)
+            self.assertPagesBudget("base:feed", 7)
+
+    def test_posts(self):
+        for authors in (2, 10):
+            self.add_posts(authors)
+            self.assertPagesBudget("base:posts", 7)
+
+    def test_following(self):
+        for authors in (2, 10):
+            self.add_posts(authors)
+            with self.assertQueryBudget(6):
+                response = self.client.get(reverse("base:following"))
+            self.assertEqual(response.status_code, 200)
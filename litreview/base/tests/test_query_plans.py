@@ -0,0 +1,44 @@
+"""The query plan check of base/query_plans.py."""
+
+
+from unittest import mock
+
+import base.models as models
+import base.query_plans as query_plans
+from base.tests import BaseTestCase
+
+
+class QueryPlansTest(BaseTestCase):
+
+    def test_hot_queries_served_by_indexes(self):
+        plans = query_plans.check()
+        self.assertEqual([plan.name for plan in plans],
+                         list(query_plans.HOT_QUERIES))
+        for plan in plans:
+            with self.subTest(query=plan.name):
+                self.assertTrue(plan.lines)
+                self.assertEqual(plan.problems, [])
+
+    def test_problems_detected(self):
+        queries = {
+            "by title": lambda user: models.Ticket.objects.filter(
+                title="title").values("id"),
+            "sorted by title": lambda user: models.Ticket.objects.filter(
+                user=user).order_by("title").values("id")[:20],
+        }
+        paginated = {"sorted by title"}
+        with mock.patch.dict(query_plans.HOT_QUERIES, queries, clear=True), \
+                mock.patch.object(query_plans, "PAGINATED", paginated):
+            plans = {plan.name: plan for plan in query_plans.check()}
+        self.assertEqual(plans["by title"].scans, ["SCAN base_ticket"])
+        self.assertEqual(plans["sorted by title"].sorts,
+                         ["USE TEMP B-TREE FOR ORDER BY"])
+
+    def test_problem_lines(self):
+        lines = ["SCAN CONSTANT ROW", "SCAN base_ticket",
+                 "SEARCH base_review USING INDEX x (user_id=?)",
+                 "USE TEMP B-TREE FOR ORDER BY",
+                 "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"]
+        self.assertEqual(query_plans.full_scans(lines), ["SCAN base_ticket"])
+        self.assertEqual(query_plans.sorts(lines),
+                         ["USE TEMP B-TREE FOR ORDER BY"])
@@ -0,0 +1,88 @@
+"""The routing of reads to replicas (base/replicas.py), and the query
+recorders watching them."""
+
+
+import time
+from unittest import mock
+
+import base.feed_cache as feed_cache
+import base.models as models
+import base.query_budget as query_budget
+import base.replicas as replicas
+from base.tests import BaseTestCase
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+
+def route(request, write: bool = False) -> HttpResponse:
+    """the database a read of the decorated view goes to."""
+    @replicas.read_from_replica
+    def view(request):
+        if write:
+            router.db_for_write(models.Ticket)
+        return HttpResponse(router.db_for_read(models.Ticket))
+
+    return replicas.replica_middleware(view)(request)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_SECONDS=1)
+class ReplicaRouterTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader")
+        # the feed cache version of the user is older than the pin.
+        feed_cache.version(self.user.id)
+        self.now = time.time_ns() + 2_000_000_000
+
+    def request(self, **cookies):
+        request = RequestFactory().get("/")
+        request.COOKIES.update(cookies)
+        request.user = self.user
+        return request
+
+    def route(self, request, write: bool = False) -> HttpResponse:
+        with mock.patch("time.time_ns", return_value=self.now):
+            return route(request, write)
+
+    def test_reads_of_decorated_views(self):
+        self.assertEqual(self.route(self.request()).content, b"replica")
+        request = self.request()
+        request.user = AnonymousUser()
+        self.assertEqual(self.route(request).content, b"replica")
+
+    def test_other_reads_go_to_the_primary(self):
+        self.assertEqual(router.db_for_read(models.Ticket), "default")
+        view = replicas.replica_middleware(
+            lambda request: HttpResponse(router.db_for_read(models.Ticket)))
+        self.assertEqual(view(self.request()).content, b"default")
+
+    def test_writes_pin_the_client(self):
+        response = self.route(self.request(), write=True)
+        self.assertEqual(response.content, b"default")
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        pinned = self.request(**{replicas.PIN_COOKIE: "1"})
+        self.assertEqual(self.route(pinned).content, b"default")
+
+    def test_recent_invalidations_go_to_the_primary(self):
+        self.now = time.time_ns()
+        self.assertEqual(self.route(self.request()).content, b"default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.route(self.request()).content, b"default")
+
+
+class EveryAliasTest(BaseTestCase):
+
+    def test_recorders_wrap_every_alias(self):
+        aliases = {"default": connections["default"],
+                   "replica": connections.create_connection("default")}
+        with mock.patch.object(query_budget, "connections", aliases):
+            with query_budget.QueryRecorder() as recorder:
+                for connection in aliases.values():
+                    self.assertIn(recorder, connection.execute_wrappers)
+        for connection in aliases.values():
+            self.assertNotIn(recorder, connection.execute_wrappers)
@@ -0,0 +1,70 @@
+"""The full-text search of base/search.py."""
+
+
+import base.feed as feed
+import base.models as models
+import base.search as search
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+
+class SearchTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.followed, self.other = (
+            User.objects.create_user(name)
+            for name in ("reader", "followed", "other"))
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.followed)
+        self.own = post_ticket(self.user, 1, title="own mountain")
+        self.followed_ticket = post_ticket(
+            self.followed, 2, title="river", description="a mountain lake")
+        self.hidden = post_ticket(self.other, 3, title="hidden mountain")
+        self.response = post_review(self.own, self.other, 4)
+        models.Review.objects.filter(id=self.response.id).update(
+            headline="mountains everywhere")
+
+    def found(self, query: str) -> list[tuple[str, int]]:
+        return [(post.content_type, post.id)
+                for post in search.search(self.user, query).posts]
+
+    def test_visibility(self):
+        self.assertEqual(sorted(self.found("mountain")), [
+            (feed.REVIEW, self.response.id), (feed.TICKET, self.own.id),
+            (feed.TICKET, self.followed_ticket.id)])
+
+    def test_titles_rank_first(self):
+        self.assertEqual(self.found("mountain")[-1],
+                         (feed.TICKET, self.followed_ticket.id))
+
+    def test_index_follows_edits_and_deletions(self):
+        models.Ticket.objects.filter(id=self.own.id).update(title="valley")
+        self.assertEqual(self.found("valley"), [(feed.TICKET, self.own.id)])
+        self.response.delete()
+        self.assertEqual(self.found("everywhere"), [])
+
+    def test_queries_read_literally(self):
+        self.assertEqual(self.found('riv "OR" (NOT'), [])
+        self.assertEqual(self.found("riv"),
+                         [(feed.TICKET, self.followed_ticket.id)])
+        self.assertEqual(self.found("  "), [])
+
+    def test_pages(self):
+        first = search.search(self.user, "mountain", page_size=2)
+        second = search.search(self.user, "mountain", page=2, page_size=2)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        self.assertEqual(len(first.posts + second.posts), 3)
+
+    def test_rebuild(self):
+        expected = self.found("mountain")
+        self.assertEqual(search.rebuild(batch_size=2), 4)
+        self.assertEqual(self.found("mountain"), expected)
+
+    def test_search_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("base:search"), {"q": "river"})
+        self.assertEqual(list(response.context["posts"]),
+                         [self.followed_ticket])
@@ -0,0 +1,68 @@
+"""The friends-of-friends follow suggestions of base/suggestions.py."""
+
+
+import base.models as models
+import base.suggestions as suggestions
+from base.tests import BaseTestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+
+class SuggestionsTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.users = {name: User.objects.create_user(name)
+                      for name in ("reader", "a", "b", "c", "d", "e")}
+        for follower, followed in (("reader", "a"), ("reader", "b"),
+                                   ("a", "c"), ("b", "c"), ("a", "d"),
+                                   ("b", "reader"), ("c", "e")):
+            self.follow(follower, followed)
+
+    def follow(self, follower: str, followed: str) -> models.UserFollows:
+        return models.UserFollows.objects.create(
+            user=self.users[follower], followed_user=self.users[followed])
+
+    def suggested(self, name: str) -> list[tuple[str, int]]:
+        return [(suggestion.suggested_user.username, suggestion.score)
+                for suggestion in suggestions.for_user(self.users[name], 10)]
+
+    def test_suggest(self):
+        graph = suggestions.load_graph()
+        self.assertEqual(graph.edges, 7)
+        ids = {user.id: name for name, user in self.users.items()}
+        self.assertEqual(
+            [(ids[user_id], score) for user_id, score in
+             suggestions.suggest(graph, self.users["reader"].id, 10)],
+            [("c", 2), ("d", 1)])
+        self.assertEqual(len(suggestions.suggest(
+            graph, self.users["reader"].id, 1)), 1)
+
+    def test_refresh(self):
+        result = suggestions.refresh()
+        self.assertEqual(result["users"], len(self.users))
+        self.assertEqual(self.suggested("reader"), [("c", 2), ("d", 1)])
+        self.assertEqual(suggestions.refresh()["users"], 0)
+
+    def test_stale_users(self):
+        suggestions.refresh()
+        # the followers of "a" reach "e" through it.
+        self.follow("a", "e")
+        self.assertEqual(suggestions.stale_users(),
+                         {self.users["a"].id, self.users["reader"].id})
+        suggestions.refresh()
+        self.assertEqual(self.suggested("reader"),
+                         [("c", 2), ("d", 1), ("e", 1)])
+
+    def test_followed_users_left_out(self):
+        suggestions.refresh()
+        self.follow("reader", "c")
+        self.assertEqual(self.suggested("reader"), [("d", 1)])
+
+    def test_following_page(self):
+        suggestions.refresh()
+        self.client.force_login(self.users["reader"])
+        response = self.client.get(reverse("base:following"))
+        self.assertEqual([suggestion.suggested_user.username
+                          for suggestion in response.context["suggestions"]],
+                         ["c", "d"])
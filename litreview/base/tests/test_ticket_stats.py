@@ -0,0 +1,67 @@
+"""The review aggregates of the tickets, see base/ticket_stats.py."""
+
+
+import base.models as models
+import base.ticket_stats as ticket_stats
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+
+
+@override_settings(BACKGROUND_JOBS=False)
+class TicketStatsTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader")
+        self.ticket = post_ticket(self.user, 5)
+        self.other_ticket = post_ticket(self.user, 4)
+
+    def aggregates(self, ticket: models.Ticket) -> tuple:
+        ticket = models.Ticket.objects.get(id=ticket.id)
+        return ticket.review_count, ticket.average_rating, \
+            ticket.last_review_at
+
+    def test_reviews_added_edited_and_deleted(self):
+        first = post_review(self.ticket, self.user, 3)
+        second = post_review(self.ticket, self.user, 1)
+        self.assertEqual(self.aggregates(self.ticket),
+                         (2, 3, second.time_created))
+        second = models.Review.objects.get(id=second.id)
+        second.rating = 5
+        second.save()
+        self.assertEqual(self.aggregates(self.ticket),
+                         (2, 4, second.time_created))
+        second.delete()
+        self.assertEqual(self.aggregates(self.ticket),
+                         (1, 3, first.time_created))
+        first.delete()
+        self.assertEqual(self.aggregates(self.ticket), (0, None, None))
+
+    def test_review_moved(self):
+        review = post_review(self.ticket, self.user, 1)
+        review = models.Review.objects.get(id=review.id)
+        review.ticket = self.other_ticket
+        review.save()
+        self.assertEqual(self.aggregates(self.ticket), (0, None, None))
+        self.assertEqual(self.aggregates(self.other_ticket),
+                         (1, 3, review.time_created))
+
+    def test_drifted_counters_recomputed(self):
+        # inserted without signals: the ticket doesn't count it.
+        models.Review.objects.bulk_create([models.Review(
+            ticket=self.ticket, user=self.user, rating=4, headline="bulk")])
+        review = post_review(self.ticket, self.user, 1)
+        models.Ticket.objects.filter(id=self.ticket.id).update(rating_sum=0)
+        review.delete()
+        self.assertEqual(self.aggregates(self.ticket)[:2], (1, 4))
+
+    def test_repair(self):
+        models.Review.objects.bulk_create([
+            models.Review(ticket=ticket, user=self.user, rating=rating,
+                          headline="bulk")
+            for ticket, rating in ((self.ticket, 2), (self.ticket, 5),
+                                   (self.other_ticket, 1))])
+        self.assertEqual(ticket_stats.repair(batch_size=1), 2)
+        self.assertEqual(self.aggregates(self.ticket)[:2], (2, 3.5))
+        self.assertEqual(self.aggregates(self.other_ticket)[:2], (1, 1))
@@ -0,0 +1,83 @@
+"""The push-mode timelines of base/timeline.py."""
+
+
+import base.feed as feed
+import base.models as models
+import base.timeline as timeline
+from base.tests import BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+
+@override_settings(FEED_MODE="push", BACKGROUND_JOBS=False)
+class TimelineTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.followed, self.other = (
+            User.objects.create_user(name)
+            for name in ("reader", "followed", "other"))
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.followed)
+        self.own = post_ticket(self.user, 1)
+        self.ticket = post_ticket(self.followed, 2)
+        self.response = post_review(self.own, self.other, 3)
+        self.hidden = post_ticket(self.other, 4)
+
+    def timeline_keys(self) -> list[tuple[str, int]]:
+        return [(key["content_type"], key["id"])
+                for key in timeline.page_keys(self.user, None, 100)]
+
+    def feed_keys(self) -> list[tuple[str, int]]:
+        return [(key["content_type"], key["id"])
+                for key in feed.feed_keys(self.user)]
+
+    def test_posts_fanned_out(self):
+        self.assertEqual(self.timeline_keys(), [
+            (feed.TICKET, self.own.id), (feed.TICKET, self.ticket.id),
+            (feed.REVIEW, self.response.id)])
+        self.assertEqual(self.timeline_keys(), self.feed_keys())
+
+    def test_follow_and_unfollow(self):
+        follow = models.UserFollows.objects.create(user=self.user,
+                                                   followed_user=self.other)
+        self.assertIn((feed.TICKET, self.hidden.id), self.timeline_keys())
+        self.assertEqual(self.timeline_keys(), self.feed_keys())
+        follow.delete()
+        # the response to the reader's ticket stays.
+        self.assertEqual(self.timeline_keys(), self.feed_keys())
+        self.assertIn((feed.REVIEW, self.response.id), self.timeline_keys())
+
+    def test_deleted_posts_removed(self):
+        self.ticket.delete()
+        self.response.delete()
+        self.assertEqual(self.timeline_keys(), [(feed.TICKET, self.own.id)])
+
+    def test_moved_review(self):
+        review = models.Review.objects.get(id=self.response.id)
+        review.ticket = self.ticket
+        review.save()
+        moved = (feed.REVIEW, review.id)
+        self.assertNotIn(moved, self.timeline_keys())
+        self.assertEqual(self.timeline_keys(), self.feed_keys())
+        self.assertIn(moved, [
+            (key["content_type"], key["id"])
+            for key in timeline.page_keys(self.followed, None, 100)])
+
+    def test_rebuild(self):
+        expected = self.timeline_keys()
+        models.TimelineEntry.objects.filter(owner=self.user).delete()
+        self.assertEqual(timeline.rebuild(self.user), len(expected))
+        self.assertEqual(self.timeline_keys(), expected)
+
+    def test_feed_page_read_from_the_timeline(self):
+        models.TimelineEntry.objects.filter(
+            owner=self.user, content_type=feed.TICKET,
+            post_id=self.ticket.id).delete()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("base:feed"))
+        self.assertEqual([(post.content_type, post.id)
+                          for post in response.context["posts"]],
+                         [(feed.TICKET, self.own.id),
+                          (feed.REVIEW, self.response.id)])
@@ -0,0 +1,56 @@
+"""The cached sessions and users of base/user_cache.py."""
+
+
+from typing import Optional
+
+import base.benchmark as benchmark
+import base.user_cache as user_cache
+from base.tests import BaseTestCase
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+
+@override_settings(**benchmark.session_settings("cached_db+user cache"))
+class UserCacheTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("reader", password="secret")
+        self.client.force_login(self.user)
+        self.key = user_cache._key(self.user.id)
+
+    def get_feed(self, client: Optional[Client] = None) -> int:
+        return (client or self.client).get(reverse("base:feed")).status_code
+
+    def test_user_read_from_cache(self):
+        self.assertEqual(self.get_feed(), 200)
+        self.assertEqual(caches["auth"].get(self.key), self.user)
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+        with self.assertNumQueries(0):
+            self.assertEqual(user_cache.get_user(request), self.user)
+
+    def test_saving_the_user_drops_it(self):
+        self.get_feed()
+        self.user.first_name = "changed"
+        self.user.save()
+        self.assertIsNone(caches["auth"].get(self.key))
+
+    def test_password_change_logs_other_sessions_out(self):
+        other = Client()
+        other.force_login(self.user)
+        self.assertEqual(self.get_feed(other), 200)
+        user = User.objects.get(id=self.user.id)
+        user.set_password("changed")
+        user.save()
+        self.assertEqual(self.get_feed(other), 302)
+        self.assertEqual(self.get_feed(other), 302)
+
+    def test_logout_ends_the_cached_session(self):
+        other = Client()
+        other.cookies = self.client.cookies
+        self.assertEqual(self.get_feed(), 200)
+        self.client.logout()
+        self.assertEqual(self.get_feed(other), 302)
@@ -0,0 +1,114 @@
+"""The counters of base/user_stats.py and the pages displaying them."""
+
+
+import base.archive as archive
+import base.models as models
+import base.user_stats as user_stats
+from base.tests import NOW, BaseTestCase, post_review, post_ticket
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+
+class FollowCountersTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.first, self.second = (
+            User.objects.create_user(name)
+            for name in ("reader", "first", "second"))
+        self.client.force_login(self.user)
+
+    def counts(self, user: User) -> tuple[int, int]:
+        stats = models.UserStats.objects.get(user=user)
+        return stats.following_count, stats.followers_count
+
+    def test_follow_and_unfollow(self):
+        for followed in (self.first, self.second):
+            self.client.post(reverse("base:search_result"),
+                             {"id": followed.id})
+        self.assertEqual(self.counts(self.user), (2, 0))
+        self.assertEqual(self.counts(self.first), (0, 1))
+        self.assertIsNotNone(models.UserStats.objects.get(
+            user=self.user).follows_changed_at)
+        self.client.post(reverse("base:unfollow", args=[self.first.id]))
+        self.assertEqual(self.counts(self.user), (1, 0))
+        self.assertEqual(self.counts(self.first), (0, 0))
+
+    def test_following_page(self):
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.second)
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.first)
+        models.UserFollows.objects.create(user=self.second,
+                                          followed_user=self.user)
+        response = self.client.get(reverse("base:following"))
+        self.assertEqual([user.username
+                          for user in response.context["following"]],
+                         ["first", "second"])
+        self.assertEqual([user.username
+                          for user in response.context["followers"]],
+                         ["second"])
+        self.assertEqual(response.context["stats"].following_count, 2)
+
+    def test_missing_row_computed(self):
+        models.UserFollows.objects.create(user=self.user,
+                                          followed_user=self.first)
+        models.UserStats.objects.filter(user=self.user).delete()
+        self.assertEqual(user_stats.get_stats(self.user).following_count, 1)
+        self.assertTrue(models.UserStats.objects.filter(
+            user=self.user).exists())
+
+    def test_repair(self):
+        models.UserFollows.objects.bulk_create([
+            models.UserFollows(user=self.user, followed_user=followed)
+            for followed in (self.first, self.second)])
+        models.UserStats.objects.filter(user=self.first).delete()
+        self.assertEqual(self.counts(self.user), (0, 0))
+        self.assertEqual(user_stats.repair(), 3)
+        self.assertEqual(self.counts(self.user), (2, 0))
+        self.assertEqual(self.counts(self.first), (0, 1))
+
+
+class PostCountersTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.other = (User.objects.create_user(name)
+                                 for name in ("reader", "other"))
+        self.client.force_login(self.user)
+
+    def counts(self) -> tuple[int, int]:
+        stats = models.UserStats.objects.get(user=self.user)
+        return stats.tickets_count, stats.reviews_count
+
+    def test_posts_counted(self):
+        ticket = post_ticket(self.user, 3)
+        post_review(ticket, self.user, 2)
+        post_review(post_ticket(self.other, 2), self.user, 1)
+        self.assertEqual(self.counts(), (1, 2))
+        # the reviews of the ticket go along with it.
+        ticket.delete()
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_archived_posts_still_counted(self):
+        post_review(post_ticket(self.user, 3), self.user, 2)
+        archive.archive(NOW)
+        self.assertFalse(models.Ticket.objects.exists())
+        self.assertEqual(self.counts(), (1, 1))
+        models.UserStats.objects.filter(user=self.user).delete()
+        stats = user_stats.get_stats(self.user)
+        self.assertEqual((stats.tickets_count, stats.reviews_count), (1, 1))
+
+    @override_settings(POSTS_PAGE_SIZE=2)
+    def test_posts_page(self):
+        tickets = [post_ticket(self.user, minutes) for minutes in (3, 2, 1)]
+        post_ticket(self.other, 0)
+        response = self.client.get(reverse("base:posts"))
+        self.assertEqual(list(response.context["posts"]),
+                         tickets[:0:-1])
+        self.assertContains(response, "3 tickets, 0 reviews")
+        response = self.client.get(reverse("base:posts"),
+                                   {"cursor": response.context["next_cursor"]})
+        self.assertEqual(list(response.context["posts"]), tickets[:1])
+        self.assertIsNone(response.context["next_cursor"])
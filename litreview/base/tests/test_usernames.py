@@ -0,0 +1,51 @@
+"""The case-insensitive username lookups of base/usernames.py."""
+
+
+import sys
+
+import base.usernames as usernames
+from base.tests import BaseTestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+LAST = chr(sys.maxunicode)
+
+
+class UsernamesTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for username in ("Alice", "alina", "albert", "bob", "Zoe",
+                         "\ud7ffa", "\ue000", "x" + LAST, "x" + LAST + LAST,
+                         "y"):
+            User.objects.create_user(username)
+
+    def test_iexact(self):
+        self.assertEqual([user.username for user in usernames.iexact("ZOE")],
+                         ["Zoe"])
+        self.assertFalse(usernames.iexact("zo").exists())
+
+    def test_starting_with(self):
+        self.assertEqual(usernames.starting_with("AL"),
+                         ["albert", "Alice", "alina"])
+        self.assertEqual(usernames.starting_with("al", limit=1), ["albert"])
+        self.assertEqual(usernames.starting_with("alic"), ["Alice"])
+
+    def test_last_code_points(self):
+        # the upper bound would be a surrogate: it becomes U+E000.
+        self.assertEqual(usernames.starting_with("\ud7ff"), ["\ud7ffa"])
+        self.assertEqual(usernames.starting_with("x" + LAST),
+                         ["x" + LAST, "x" + LAST + LAST])
+        self.assertEqual(usernames.starting_with(LAST), [])
+        self.assertEqual(usernames._upper_bound("x" + LAST), "y")
+        self.assertIsNone(usernames._upper_bound(LAST + LAST))
+
+    def test_autocomplete(self):
+        self.client.force_login(User.objects.get(username="bob"))
+        url = reverse("base:autocomplete_username")
+        response = self.client.get(url, {"q": " Ali "})
+        self.assertEqual(response.json(), {"usernames": ["Alice", "alina"]})
+        with self.assertNumQueries(0):
+            self.assertEqual(usernames.autocomplete("ALI"),
+                             ["Alice", "alina"])
+        self.assertEqual(usernames.autocomplete(" "), [])
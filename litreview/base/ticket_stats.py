@@ -0,0 +1,120 @@
+"""Maintains the review aggregates of the tickets.
+
+Ticket.review_count, rating_sum and last_review_at summarize the reviews of
+a ticket, so that pages can display how many reviews a ticket received and
+its average rating without querying the reviews. Creating, editing or
+deleting a review updates them with a single UPDATE using F() expressions
+(see base/signals.py), so concurrent reviews can't lose an update.
+Reviews inserted without signals (generate_data, import_data) are counted
+by `python manage.py repair_counters`. When the counters turn out to have
+drifted, the ticket is recomputed from its reviews in a background job
+(see base/jobs.py), which merges the tickets of many jobs in one UPDATE.
+"""
+
+
+import datetime
+
+import base.jobs as jobs
+import base.models as models
+from django.db.models import (Count, DateTimeField, F, Max, OuterRef,
+                              QuerySet, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce, Greatest
+
+BATCH_SIZE = 10000
+
+
+def _aggregate(function) -> Subquery:
+    """the aggregate of the reviews of each ticket."""
+    return Subquery(
+        models.Review.objects.filter(ticket=OuterRef("pk")).values(
+            "ticket").annotate(value=function).values("value")
+    )
+
+
+def _recompute(tickets: QuerySet) -> int:
+    return tickets.update(
+        review_count=Coalesce(_aggregate(Count("*")), Value(0)),
+        rating_sum=Coalesce(_aggregate(Sum("rating")), Value(0)),
+        last_review_at=_aggregate(Max("time_created")),
+    )
+
+
+RECOMPUTE = "ticket_stats.recompute"
+
+
+@jobs.handler(RECOMPUTE)
+def recompute(payloads: list[dict]) -> None:
+    ticket_ids = {payload["ticket_id"] for payload in payloads}
+    _recompute(models.Ticket.objects.filter(id__in=ticket_ids))
+
+
+def _recompute_later(ticket_id: int) -> None:
+    jobs.enqueue(RECOMPUTE, {"ticket_id": ticket_id})
+
+
+def _added(ticket_id: int, rating: int,
+           time_created: datetime.datetime) -> None:
+    time_created = Value(time_created, output_field=DateTimeField())
+    models.Ticket.objects.filter(id=ticket_id).update(
+        review_count=F("review_count") + 1,
+        rating_sum=F("rating_sum") + rating,
+        last_review_at=Greatest(Coalesce(F("last_review_at"), time_created),
+                                time_created),
+    )
+
+
+def _removed(ticket_id: int, rating: int) -> None:
+    # the counters may lag behind rows inserted without signals, or the
+    # rating be stale: rather than going below zero, they are recomputed.
+    updated = models.Ticket.objects.filter(
+        id=ticket_id, review_count__gte=1, rating_sum__gte=rating
+    ).update(
+        review_count=F("review_count") - 1,
+        rating_sum=F("rating_sum") - rating,
+        last_review_at=_aggregate(Max("time_created")),
+    )
+    if not updated:
+        _recompute_later(ticket_id)
+
+
+def review_added(review: models.Review) -> None:
+    _added(review.ticket_id, review.rating, review.time_created)
+    review.loaded_values = {"ticket_id": review.ticket_id,
+                            "rating": review.rating}
+
+
+def review_edited(review: models.Review) -> None:
+    loaded = getattr(review, "loaded_values", {})
+    if "ticket_id" not in loaded or "rating" not in loaded:
+        # the previous values are unknown.
+        _recompute_later(review.ticket_id)
+    elif loaded["ticket_id"] != review.ticket_id:
+        _removed(loaded["ticket_id"], loaded["rating"])
+        _added(review.ticket_id, review.rating, review.time_created)
+    elif loaded["rating"] != review.rating:
+        delta = review.rating - loaded["rating"]
+        updated = models.Ticket.objects.filter(
+            id=review.ticket_id, rating_sum__gte=max(-delta, 0)
+        ).update(rating_sum=F("rating_sum") + delta)
+        if not updated:
+            _recompute_later(review.ticket_id)
+    review.loaded_values = {"ticket_id": review.ticket_id,
+                            "rating": review.rating}
+
+
+def review_removed(review: models.Review) -> None:
+    _removed(review.ticket_id, review.rating)
+
+
+def repair(tickets: QuerySet = None, batch_size: int = BATCH_SIZE) -> int:
+    """recomputes the aggregates of the tickets from their reviews. Every
+    ticket is updated by default, by ranges of batch_size ids so that each
+    UPDATE stays short. Returns the number of tickets updated."""
+    if tickets is not None:
+        return _recompute(tickets)
+    last_id = models.Ticket.objects.aggregate(last=Max("id"))["last"] or 0
+    updated = 0
+    for start in range(0, last_id + 1, batch_size):
+        updated += _recompute(models.Ticket.objects.filter(
+            id__gte=start, id__lt=start + batch_size))
+    return updated
@@ -0,0 +1,185 @@
+"""Fan-out-on-write timelines, an alternative way of building the feed.
+
+In the default "pull" mode (base/feed.py), visibility rules are evaluated
+every time the feed is read. In "push" mode, the work is moved to write
+time: creating a post writes one TimelineEntry in the timeline of each user
+allowed to see it, following someone copies his posts into the follower's
+timeline and unfollowing purges them. Reading the feed is then a single
+indexed range scan over the reader's own entries.
+
+The feed is read far more often than posts are written, which makes this
+trade worth it. The mode is chosen with settings.FEED_MODE. Timelines are
+only maintained in push mode, so switching from pull to push requires
+running `python manage.py rebuild_timelines` first.
+"""
+
+
+from typing import Iterable, Optional
+
+import base.feed as feed
+import base.models as models
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+BATCH_SIZE = 1000
+
+
+def is_enabled() -> bool:
+    return settings.FEED_MODE == "push"
+
+
+def _entry(owner_id: int, post, content_type: str) -> models.TimelineEntry:
+    return models.TimelineEntry(owner_id=owner_id,
+                                author_id=post.user_id,
+                                content_type=content_type,
+                                post_id=post.id,
+                                time_created=post.time_created)
+
+
+def _write(entries: Iterable[models.TimelineEntry]) -> None:
+    """inserts entries by batches. Entries already present are skipped."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            models.TimelineEntry.objects.bulk_create(batch,
+                                                     ignore_conflicts=True)
+            batch = []
+    if batch:
+        models.TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _followers(user_id: int) -> Iterable[int]:
+    return models.UserFollows.objects.filter(
+        followed_user_id=user_id
+    ).values_list("user_id", flat=True).iterator(chunk_size=BATCH_SIZE)
+
+
+def fan_out_ticket(ticket: models.Ticket) -> set[int]:
+    """writes the ticket in the timeline of its author and his followers,
+    and returns their ids."""
+    owners = set(_followers(ticket.user_id))
+    owners.add(ticket.user_id)
+    _write(_entry(owner, ticket, feed.TICKET) for owner in owners)
+    return owners
+
+
+def fan_out_review(review: models.Review) -> set[int]:
+    """writes the review in the timeline of its author, his followers and
+    the author of the ticket it responds to, and returns their ids."""
+    owners = set(_followers(review.user_id))
+    owners.add(review.user_id)
+    owners.add(models.Ticket.objects.values_list(
+        "user_id", flat=True).get(id=review.ticket_id))
+    _write(_entry(owner, review, feed.REVIEW) for owner in owners)
+    return owners
+
+
+def move_review(review: models.Review, previous_author_id: int) -> set[int]:
+    """writes the review moved to another ticket in the timeline of the
+    author of that ticket, and removes it from the one of the author of the
+    previous ticket, unless he still sees it. Returns the ids of the users
+    whose timeline may have changed."""
+    owners = fan_out_review(review)
+    if previous_author_id not in owners:
+        models.TimelineEntry.objects.filter(
+            owner_id=previous_author_id, content_type=feed.REVIEW,
+            post_id=review.id).delete()
+    return owners | {previous_author_id}
+
+
+def remove_posts(content_type: str, post_ids: Iterable[int]) -> None:
+    models.TimelineEntry.objects.filter(content_type=content_type,
+                                        post_id__in=list(post_ids)).delete()
+
+
+def backfill(follower_id: int, followed_id: int) -> None:
+    """copies every post of the followed user in the follower's timeline."""
+    tickets = models.Ticket.objects.filter(user_id=followed_id).only(
+        "id", "user_id", "time_created").iterator(chunk_size=BATCH_SIZE)
+    reviews = models.Review.objects.filter(user_id=followed_id).only(
+        "id", "user_id", "time_created").iterator(chunk_size=BATCH_SIZE)
+    _write(_entry(follower_id, t, feed.TICKET) for t in tickets)
+    _write(_entry(follower_id, r, feed.REVIEW) for r in reviews)
+
+
+def purge(follower_id: int, followed_id: int) -> None:
+    """removes the posts of the unfollowed user from the follower's
+    timeline, except the ones still visible through another rule: the
+    follower's own posts and the reviews responding to his tickets."""
+    if follower_id == followed_id:
+        return
+    responses = models.Review.objects.filter(
+        user_id=followed_id, ticket__user_id=follower_id
+    ).values("id")
+    models.TimelineEntry.objects.filter(
+        owner_id=follower_id, author_id=followed_id
+    ).exclude(
+        Q(content_type=feed.REVIEW) & Q(post_id__in=responses)
+    ).delete()
+
+
+def rebuild(user: User) -> int:
+    """recomputes the whole timeline of one user from the visibility rules
+    and returns the number of entries written."""
+    count = 0
+
+    def entries():
+        nonlocal count
+        for key in feed.feed_keys(user).iterator(chunk_size=BATCH_SIZE):
+            count += 1
+            yield models.TimelineEntry(owner_id=user.id,
+                                       author_id=key["user_id"],
+                                       content_type=key["content_type"],
+                                       post_id=key["id"],
+                                       time_created=key["time_created"])
+
+    with transaction.atomic():
+        models.TimelineEntry.objects.filter(owner=user).delete()
+        _write(entries())
+    return count
+
+
+def _after(cursor: Optional[feed.Cursor]) -> Q:
+    """condition selecting the entries placed after the cursor in the
+    descending (time_created, content_type, post_id) ordering."""
+    if cursor is None:
+        return Q()
+    return (Q(time_created__lt=cursor.time_created)
+            | Q(time_created=cursor.time_created,
+                content_type__lt=cursor.content_type)
+            | Q(time_created=cursor.time_created,
+                content_type=cursor.content_type,
+                post_id__lt=cursor.id))
+
+
+def entries_after(user: User, cursor: Optional[feed.Cursor],
+                  limit: int) -> QuerySet:
+    """(post_id, time_created, content_type) of the user's entries, after
+    the cursor."""
+    return models.TimelineEntry.objects.filter(owner=user).filter(
+        _after(cursor)
+    ).order_by(
+        "-time_created", "-content_type", "-post_id"
+    ).values_list("post_id", "time_created", "content_type")[:limit]
+
+
+def page_keys(user: User,
+              cursor: Optional[feed.Cursor],
+              page_size: int) -> list[dict]:
+    """same contract as base.feed.page_keys, read from the timeline."""
+    rows = entries_after(user, cursor, page_size + 1)
+    return [{"id": post_id, "time_created": time_created,
+             "content_type": content_type}
+            for post_id, time_created, content_type in rows]
+
+
+def get_feed_page(user: User,
+                  cursor: Optional[str] = None,
+                  page_size: Optional[int] = None) -> feed.FeedPage:
+    """same contract as base.feed.get_feed_page, read from the timeline."""
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    keys = page_keys(user, feed.decode_cursor(cursor), page_size)
+    return feed.build_page(keys, page_size)
@@ -0,0 +1,272 @@
+"""Streams tickets, reviews and follows out of and into the database.
+
+Used by the export_data and import_data management commands. Both work row
+by row on files in JSON Lines (one JSON object per line) or CSV format, so
+their memory use doesn't depend on the size of the table:
+- export reads the table with .iterator(), by chunks, following the
+primary key order;
+- import buffers at most one batch of rows, inserted with bulk_create.
+The whole import runs in one transaction: an import failing partway (a
+review referring to a missing ticket, say) leaves the database unchanged,
+and can simply be run again.
+
+Users are referred to by username, resolved with one query per batch. Posts
+keep their primary key, so that reviews can refer to the ticket they
+respond to. time_created is kept as well. Hence posts are only imported
+into empty tables: an imported id could otherwise collide with an existing
+post, and the reviews of the imported ticket attach to the existing one.
+Live and archived posts share their ids (see base/archive.py): the ids of
+each batch are also checked against the other table, and the live table
+never allocates the ids of imported archived posts. Follows can be
+imported into a non-empty table, and skip_existing ignores the ones already
+there.
+
+bulk_create doesn't send the post_save signal: run repair_counters, and
+rebuild_timelines in push mode, after an import. The review aggregates of
+the tickets are derived data as well, hence they aren't exported. The
+search index is updated by its triggers.
+"""
+
+
+import csv
+import datetime
+import json
+import time
+from typing import (Callable, Iterable, Iterator, NamedTuple, Optional,
+                    TextIO)
+
+import base.feed as feed
+import base.models as models
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Model
+from django.utils.dateparse import parse_datetime
+
+
+class ImportRefused(Exception):
+    """Raised when posts would be imported into a non-empty table."""
+
+
+class Column(NamedTuple):
+    """name: key in the file. source: values_list() lookup used when
+    exporting. field: model attribute set when importing."""
+    name: str
+    source: str
+    field: str
+    parse: Callable = str
+
+
+def _datetime(value) -> datetime.datetime:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"invalid datetime: {value!r}")
+    return parsed
+
+
+TICKET_COLUMNS = [
+    Column("id", "id", "id", int),
+    Column("user", "user__username", "user_id"),
+    Column("title", "title", "title"),
+    Column("description", "description", "description"),
+    Column("time_created", "time_created", "time_created", _datetime),
+]
+REVIEW_COLUMNS = [
+    Column("id", "id", "id", int),
+    Column("ticket", "ticket_id", "ticket_id", int),
+    Column("user", "user__username", "user_id"),
+    Column("rating", "rating", "rating", int),
+    Column("headline", "headline", "headline"),
+    Column("body", "body", "body"),
+    Column("time_created", "time_created", "time_created", _datetime),
+]
+
+# user columns are exported as usernames and resolved back to ids when
+# importing. Archived reviews refer to archived tickets.
+TABLES: dict[str, tuple[type[Model], list[Column]]] = {
+    "tickets": (models.Ticket, TICKET_COLUMNS),
+    "reviews": (models.Review, REVIEW_COLUMNS),
+    "archived_tickets": (models.ArchivedTicket, TICKET_COLUMNS),
+    "archived_reviews": (models.ArchivedReview, REVIEW_COLUMNS),
+    "follows": (models.UserFollows, [
+        Column("user", "user__username", "user_id"),
+        Column("followed_user", "followed_user__username",
+               "followed_user_id"),
+    ]),
+}
+
+
+def _is_user(column: Column) -> bool:
+    return column.source.endswith("__username")
+
+
+class Progress:
+    """writes the number of rows handled and the throughput, at most once
+    per interval seconds."""
+
+    def __init__(self, label: str, output: TextIO, interval: float = 2.0):
+        self.label = label
+        self.output = output
+        self.interval = interval
+        self.count = 0
+        self.start = self.last = time.perf_counter()
+
+    def add(self, n: int = 1) -> None:
+        self.count += n
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        self.output.write(f"{self.label}: {self.count} rows, "
+                          f"{self.count / elapsed:.0f} rows/s\n")
+
+
+def export_rows(table: str, chunk_size: int = 2000) -> Iterator[dict]:
+    model, columns = TABLES[table]
+    rows = model.objects.order_by("pk").values_list(
+        *[c.source for c in columns]
+    ).iterator(chunk_size=chunk_size)
+    names = [c.name for c in columns]
+    for row in rows:
+        yield dict(zip(names, row))
+
+
+def write(rows: Iterable[dict], table: str, output: TextIO, file_format: str,
+          progress: Progress) -> None:
+    if file_format == "csv":
+        writer = csv.DictWriter(output, [c.name for c in TABLES[table][1]])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: v.isoformat() if isinstance(
+                v, datetime.datetime) else v for k, v in row.items()})
+            progress.add()
+    else:
+        for row in rows:
+            output.write(json.dumps(row, default=datetime.datetime.isoformat,
+                                    ensure_ascii=False))
+            output.write("\n")
+            progress.add()
+
+
+def read(source: TextIO, file_format: str) -> Iterator[dict]:
+    if file_format == "csv":
+        yield from csv.DictReader(source)
+    else:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+class UserResolver:
+    """maps usernames to user ids, querying only the unknown ones."""
+
+    def __init__(self, create_missing: bool = False):
+        self.create_missing = create_missing
+        self.ids: dict[str, int] = {}
+
+    def resolve(self, usernames: set[str]) -> None:
+        unknown = usernames - self.ids.keys()
+        if not unknown:
+            return
+        self.ids.update(User.objects.filter(
+            username__in=unknown).values_list("username", "id"))
+        missing = unknown - self.ids.keys()
+        if missing and self.create_missing:
+            # users created here can't log in until they reset a password.
+            User.objects.bulk_create(
+                [User(username=name, password="!") for name in missing],
+                ignore_conflicts=True,
+            )
+            self.ids.update(User.objects.filter(
+                username__in=missing).values_list("username", "id"))
+
+
+def _other_table(model: type[Model]) -> Optional[type[Model]]:
+    """the table sharing its ids with the table of model: the archived
+    table of a live one and conversely, None for follows."""
+    for (content_type, archived), posts in feed.MODELS.items():
+        if posts is model:
+            return feed.MODELS[content_type, not archived]
+    return None
+
+
+def check_empty(table: str) -> None:
+    """raises ImportRefused when posts are imported into a non-empty table,
+    see the module docstring."""
+    model = TABLES[table][0]
+    if _other_table(model) is not None and model.objects.exists():
+        raise ImportRefused(
+            f"{model._meta.db_table} isn't empty: the imported {table} keep "
+            f"their ids, which could collide with existing ones")
+
+
+def check_ids(model: type[Model], ids: list[int]) -> None:
+    """raises ImportRefused when some of the ids are taken in the table
+    sharing its ids with model."""
+    other = _other_table(model)
+    if other is not None and other.objects.filter(id__in=ids).exists():
+        raise ImportRefused(
+            f"some imported ids are taken in {other._meta.db_table}")
+
+
+def reserve_ids(model: type[Model], last_id: int) -> None:
+    """makes the live table sharing its ids with the archived model
+    allocate ids after last_id. Django creates SQLite primary keys with
+    AUTOINCREMENT, whose counter is kept in sqlite_sequence."""
+    if model not in (models.ArchivedTicket, models.ArchivedReview):
+        return
+    live = _other_table(model)
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE sqlite_sequence SET seq = max(seq, %s) "
+                       "WHERE name = %s", [last_id, live._meta.db_table])
+        if not cursor.rowcount:
+            cursor.execute("INSERT INTO sqlite_sequence(name, seq) "
+                           "VALUES (%s, %s)", [live._meta.db_table, last_id])
+
+
+def import_rows(rows: Iterable[dict], table: str, batch_size: int,
+                resolver: UserResolver, skip_existing: bool,
+                progress: Progress) -> int:
+    """inserts the rows by batches, in a single transaction, and returns
+    the number of rows skipped because they refer to an unknown user.
+    Raises ImportRefused when posts could collide with existing ones."""
+    check_empty(table)
+    model, columns = TABLES[table]
+    user_columns = [c for c in columns if _is_user(c)]
+    skipped = 0
+
+    def flush(batch):
+        nonlocal skipped
+        resolver.resolve({row[c.name] for row in batch for c in user_columns})
+        objects = []
+        for row in batch:
+            values = {}
+            for column in columns:
+                raw = row[column.name]
+                if _is_user(column):
+                    values[column.field] = resolver.ids.get(raw)
+                else:
+                    values[column.field] = column.parse(raw)
+            if None in (values[c.field] for c in user_columns):
+                skipped += 1
+                continue
+            objects.append(model(**values))
+        ids = [obj.id for obj in objects]
+        if ids and _other_table(model) is not None:
+            check_ids(model, ids)
+            reserve_ids(model, max(ids))
+        model.objects.bulk_create(objects, ignore_conflicts=skip_existing)
+        progress.add(len(batch))
+
+    batch = []
+    with transaction.atomic(), models.explicit_time_created():
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    return skipped
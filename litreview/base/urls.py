@@ -1,17 +1,21 @@
 """Routes requests from different URLs to the corresponding HTML pages.
 
-I grouped the paths in four sets separated by a line break. The first
+I grouped the paths in sets separated by a line break. The first
 one is responsible of the login/signup process. The corresponding templates
 are in templates/registration.
 The second one is responsible of the feed page, the third one of the posts
-page while the fourth one is responsible of the following page.
+page while the fourth one is responsible of the following page. The fifth
+one serves the feed, posts and following pages from asynchronous views
+(see async_views.py), the sixth one serves the same content as JSON (see
+api.py), and the last one exposes internal statistics and metrics (see
+profiling.py) to staff members.
 """
 
 
 from django.contrib.auth import views as auth_views
 from django.urls import path, reverse_lazy
 
-from . import views
+from . import api, async_views, views
 
 app_name = 'base'
 urlpatterns: list[path] = [
@@ -26,6 +30,7 @@ urlpatterns: list[path] = [
     path("signup/", views.SignUpView.as_view(), name="signup"),
 
     path("feed/", views.Feed.as_view(), name="feed"),
+    path("search/", views.Search.as_view(), name="search"),
     path("create_ticket/",
          views.TicketCreation.as_view(),
          name="ticket_creation"),
@@ -43,6 +48,12 @@ urlpatterns: list[path] = [
     path("posts/",
          views.Posts.as_view(),
          name="posts"),
+    path("posts/<int:pk>/ticket/",
+         views.TicketDetail.as_view(),
+         name="ticket_detail"),
+    path("posts/<int:pk>/review/",
+         views.ReviewDetail.as_view(),
+         name="review_detail"),
     path("posts/<int:pk>/edit_ticket/",
          views.EditTicket.as_view(),
          name="ticket_update"),
@@ -65,4 +76,22 @@ urlpatterns: list[path] = [
     path("following/follow/",
          views.Follow.as_view(),
          name="search_result"),
+    path("following/autocomplete/",
+         views.autocomplete_username,
+         name="autocomplete_username"),
+
+    path("async/feed/", async_views.feed_page, name="async_feed"),
+    path("async/posts/", async_views.posts_page, name="async_posts"),
+    path("async/following/", async_views.following_page,
+         name="async_following"),
+
+    path("api/feed/", api.feed_list, name="api_feed"),
+    path("api/posts/", api.post_list, name="api_posts"),
+    path("api/following/", api.following_list, name="api_following"),
+    path("api/followers/", api.follower_list, name="api_followers"),
+
+    path("cache_stats/",
+         views.feed_cache_stats,
+         name="feed_cache_stats"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -0,0 +1,87 @@
+"""Cache of the users authenticated by the session.
+
+On every request, django.contrib.auth reads the session, then the auth_user
+row of the user it names, before the view runs. With a cached_db or
+signed_cookies SESSION_ENGINE the session no longer costs a query; with
+CachedUserMiddleware in place of AuthenticationMiddleware, neither does the
+user: it is kept in the "auth" alias of settings.CACHES for
+USER_CACHE_TIMEOUT seconds. See the "Sessions and authentication" block of
+settings.py, and `python manage.py benchmark_sessions` for what both save.
+
+The cached user is dropped by the receivers of base/signals.py whenever
+the user is saved or deleted: a password change (which must log out the
+other sessions of the user, see get_user), a profile change, a
+deactivation, a login updating last_login. Writes made with
+QuerySet.update() send no signal: their callers must call invalidate(),
+or the change is only seen once the entry expires.
+
+The cache must be shared by every process serving requests: a process
+holding a user which another one invalidated would keep accepting the
+sessions logged out by a password change. The local-memory cache is only
+fit for a single process, hence only for the "development" profile of
+settings.py, which doesn't use it; the other profiles keep it in files.
+"""
+
+
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def _cache():
+    return caches["auth"]
+
+
+def _key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def cached_user(backend, user_id):
+    """returns backend.get_user(user_id), read from the cache when
+    possible. Users which can't be authenticated (None) aren't cached."""
+    user = _cache().get(_key(user_id))
+    if user is None:
+        user = backend.get_user(user_id)
+        if user is not None:
+            _cache().set(_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate(user_ids: Iterable[int]) -> None:
+    _cache().delete_many([_key(user_id) for user_id in user_ids])
+
+
+def get_user(request):
+    """same as django.contrib.auth.get_user, the user being read through
+    cached_user. The session is still checked against the hash of the
+    user's password, so changing it logs the other sessions out."""
+    user = None
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path in settings.AUTHENTICATION_BACKENDS:
+        user = cached_user(auth.load_backend(backend_path), user_id)
+        if hasattr(user, "get_session_auth_hash"):
+            session_hash = request.session.get(auth.HASH_SESSION_KEY)
+            if not (session_hash and constant_time_compare(
+                    session_hash, user.get_session_auth_hash())):
+                request.session.flush()
+                user = None
+    return user or AnonymousUser()
+
+
+class CachedUserMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware reading request.user through the cache.
+    As with the original, the user is only loaded when first accessed."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
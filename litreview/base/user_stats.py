@@ -0,0 +1,108 @@
+"""Maintains the UserStats counters.
+
+A stats row is created along with every user. Following or unfollowing
+someone then updates the counters of both users, and posting or deleting a
+ticket or a review the counter of its author, with a single UPDATE using
+F() expressions, so concurrent requests can't lose an increment. If a row
+is missing anyway, it is computed from the tables the next time it is
+read. `python manage.py repair_counters` recomputes every counter in bulk.
+Archived posts (see base/archive.py) are still counted.
+"""
+
+
+import base.feed as feed
+import base.models as models
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def _bump(user_id: int, field: str, delta: int, **changes) -> None:
+    # counters may lag behind rows inserted without signals (bulk imports)
+    # until repaired; they must not go below zero meanwhile.
+    models.UserStats.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, Value(0))}, **changes)
+
+
+def follow_added(follower_id: int, followed_id: int) -> None:
+    # follows_changed_at tells base/suggestions.py to refresh the follower.
+    _bump(follower_id, "following_count", 1,
+          follows_changed_at=timezone.now())
+    _bump(followed_id, "followers_count", 1)
+
+
+def follow_removed(follower_id: int, followed_id: int) -> None:
+    _bump(follower_id, "following_count", -1,
+          follows_changed_at=timezone.now())
+    _bump(followed_id, "followers_count", -1)
+
+
+POST_COUNTERS = {feed.TICKET: "tickets_count", feed.REVIEW: "reviews_count"}
+
+
+def post_added(author_id: int, content_type: str) -> None:
+    _bump(author_id, POST_COUNTERS[content_type], 1)
+
+
+def post_removed(author_id: int, content_type: str) -> None:
+    _bump(author_id, POST_COUNTERS[content_type], -1)
+
+
+def _count(model, **lookup) -> Subquery:
+    """number of rows of the model matching the lookup, for each user."""
+    field = next(iter(lookup))
+    return Coalesce(Subquery(
+        model.objects.filter(**lookup).values(field).annotate(
+            n=Count("*")).values("n")
+    ), Value(0))
+
+
+def get_stats(user: User) -> models.UserStats:
+    try:
+        return models.UserStats.objects.get(user=user)
+    except models.UserStats.DoesNotExist:
+        pass
+    stats = models.UserStats(
+        user=user,
+        followers_count=models.UserFollows.objects.filter(
+            followed_user=user).count(),
+        following_count=models.UserFollows.objects.filter(user=user).count(),
+        tickets_count=models.Ticket.objects.filter(user=user).count()
+        + models.ArchivedTicket.objects.filter(user=user).count(),
+        reviews_count=models.Review.objects.filter(user=user).count()
+        + models.ArchivedReview.objects.filter(user=user).count(),
+    )
+    try:
+        with transaction.atomic():
+            stats.save(force_insert=True)
+    except IntegrityError:
+        # created by a concurrent request.
+        return models.UserStats.objects.get(user=user)
+    return stats
+
+
+def repair() -> int:
+    """creates the missing rows and recomputes every counter. Returns the
+    number of rows updated."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        "id", flat=True).iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for user_id in missing:
+        batch.append(models.UserStats(user_id=user_id))
+        if len(batch) >= BATCH_SIZE:
+            models.UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    models.UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+    return models.UserStats.objects.update(
+        followers_count=_count(models.UserFollows,
+                               followed_user=OuterRef("user")),
+        following_count=_count(models.UserFollows, user=OuterRef("user")),
+        tickets_count=_count(models.Ticket, user=OuterRef("user"))
+        + _count(models.ArchivedTicket, user=OuterRef("user")),
+        reviews_count=_count(models.Review, user=OuterRef("user"))
+        + _count(models.ArchivedReview, user=OuterRef("user")),
+    )
@@ -0,0 +1,91 @@
+"""Case-insensitive username lookups served by an index.
+
+Django's iexact and istartswith lookups compile to LIKE on SQLite, which
+can't use an index: every lookup scans auth_user. Migration 0008 adds an
+index on lower(username) instead, and the lookups below compare lower()
+of the column to a lowered value, either for equality or as a range
+[prefix, prefix with its last character incremented). Both are answered by
+an index search. The increment skips the surrogates, which can't be
+stored, and a prefix ending with the last code point has its following
+character incremented instead (or no upper bound).
+
+SQLite's lower() only folds ASCII letters, so the searched text is lowered
+the same way.
+
+Autocomplete results are cached per prefix, so that popular prefixes don't
+reach the database on every keystroke.
+"""
+
+
+import string
+import sys
+from typing import Optional
+from urllib.parse import quote
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.db.models.functions import Lower
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_TIMEOUT = 60
+MAX_PREFIX_LENGTH = 150
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold(text: str) -> str:
+    """lowers the text the way SQLite's lower() does."""
+    return text.translate(_ASCII_LOWER)
+
+
+def _annotated() -> QuerySet:
+    return User.objects.annotate(username_lower=Lower("username"))
+
+
+def iexact(username: str) -> QuerySet:
+    """users whose username equals the given one, case ignored."""
+    return _annotated().filter(username_lower=fold(username))
+
+
+def starting_with(prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> list[str]:
+    """returns at most limit usernames starting with the prefix, case
+    ignored, in alphabetical order."""
+    return list(prefix_range(prefix).values_list(
+        "username", flat=True)[:limit])
+
+
+def _upper_bound(prefix: str) -> Optional[str]:
+    """the smallest text greater than every text starting with the prefix,
+    None when there is none."""
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code_point = ord(prefix[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        code_point = 0xE000
+    return prefix[:-1] + chr(code_point)
+
+
+def prefix_range(prefix: str) -> QuerySet:
+    """users whose lowered username starts with the prefix, as a range of
+    the lower(username) index."""
+    prefix = fold(prefix)
+    users = _annotated().filter(username_lower__gte=prefix)
+    upper_bound = _upper_bound(prefix)
+    if upper_bound is not None:
+        users = users.filter(username_lower__lt=upper_bound)
+    return users.order_by("username_lower")
+
+
+def autocomplete(prefix: str) -> list[str]:
+    """cached version of starting_with."""
+    prefix = fold(prefix.strip())[:MAX_PREFIX_LENGTH]
+    if not prefix:
+        return []
+    key = "autocomplete:" + quote(prefix)
+    usernames = cache.get(key)
+    if usernames is None:
+        usernames = starting_with(prefix)
+        cache.set(key, usernames, AUTOCOMPLETE_TIMEOUT)
+    return usernames
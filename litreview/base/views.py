@@ -1,17 +1,31 @@
 """Classes and functions managing requests and returning response objects."""
 
 
-from itertools import chain
+import secrets
 
+import base.archive as archive
+import base.feed as feed
+import base.feed_cache as feed_cache
 import base.forms as forms
 import base.models as models
+import base.profiling as profiling
+import base.search as search
+import base.streaming as streaming
+import base.suggestions as suggestions
+import base.user_stats as user_stats
+import base.usernames as usernames
+from base.conditional import user_content_conditional
+from base.query_budget import query_budget
+from base.replicas import read_from_replica
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.db import IntegrityError
-from django.db.models import CharField, Value, Q, QuerySet
-from django.http import HttpResponse, HttpRequest
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpRequest, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.views import View
@@ -29,78 +43,58 @@ class SignUpView(generic.CreateView):
 class Feed(LoginRequiredMixin, View):
     """Retrieving the content of the feed page."""
 
-    def get(self, request) -> HttpResponse:
-        """retrieves the feed's content and sorts it.
-
-        The first step is retrieving all tickets and reviews
-        from the DB. Then, we apply the three rules dictating
-        what posts are displayed in the DB:
+    @staticmethod
+    @read_from_replica
+    @user_content_conditional
+    @query_budget(4)
+    def get(request) -> HttpResponse:
+        """retrieves one page of the feed's content, already sorted.
+
+        The three rules dictating what posts are displayed in the feed
+        are applied by the DB (see base/feed.py):
         - display ticket and reviews from followed users
         - display the user's own tickets and reviews
         - display the reviews responding to the user's tickets, even
         if he doesn't follow the author of the review.
+        The cursor GET parameter tells where the previous page stopped.
+        In push mode, the same page is read from the user's timeline
+        instead (see base/timeline.py). Either way, the ordered keys of the
+        page are kept in the user's feed cache (see base/feed_cache.py).
+        The pages reaching the archive boundary also read the archived
+        posts (see base/archive.py).
         """
-        all_tickets: QuerySet = models.Ticket.objects.all()
-        all_tickets = all_tickets.annotate(
-            content_type=Value("TICKET", CharField())
-        )
-
-        all_reviews: QuerySet = models.Review.objects.all()
-        all_reviews = all_reviews.annotate(
-            content_type=Value("REVIEW", CharField())
-        )
-
-        posts: chain[QuerySet] = chain(all_reviews, all_tickets)
-        filtered_posts = self.filter_posts(request, posts)
-
-        user_posts = self.user_own_posts(request)
-        tickets = self.tickets_responding_to_user_tickets(request)
-        filtered_posts.extend(user_posts)
-        filtered_posts.extend(tickets)
-
-        # if a user is following himself, without the below line there
-        # would be some duplicate in the feed.
-        filtered_posts = list(set(filtered_posts))
-        sorted_posts = sorted(list(filtered_posts),
-                              key=lambda post: post.time_created,
-                              reverse=True)
-
-        context = {"posts": sorted_posts}
+        if streaming.is_enabled(request):
+            page_size = settings.FEED_PAGE_SIZE
+            keys, next_cursor = feed.split_page(feed_cache.feed_page_keys(
+                request.user, request.GET.get("cursor"), page_size), page_size)
+            return streaming.stream_posts(request, "base/feed.html",
+                                          "base/feed_item.html", keys,
+                                          {"next_cursor": next_cursor})
+        page = feed_cache.get_feed_page(request.user,
+                                        request.GET.get("cursor"))
+        context = {"posts": page.posts,
+                   "next_cursor": page.next_cursor}
         return render(request, "base/feed.html", context)
 
-    @staticmethod
-    def filter_posts(request, posts) -> list[models.Ticket | models.Review]:
-        """returns only tickets and reviews posted by followed users."""
-        followed_users = models.UserFollows.objects.filter(user=request.user)
-        followed_users = [x.followed_user for x in followed_users]
-        filtered_posts = [post for post in posts if
-                          post.user in followed_users]
-        return filtered_posts
-
-    @staticmethod
-    def user_own_posts(request) -> list[models.Ticket | models.Review]:
-        """returns only tickets and reviews posted by the user."""
-        user_tickets = models.Ticket.objects.filter(user=request.user)
-        user_tickets = user_tickets.annotate(
-            content_type=Value("TICKET", CharField())
-        )
 
-        user_reviews = models.Review.objects.filter(user=request.user)
-        user_reviews = user_reviews.annotate(
-            content_type=Value("REVIEW", CharField())
-        )
-
-        user_posts = list(chain(list(user_tickets), list(user_reviews)))
-        return user_posts
+class Search(LoginRequiredMixin, View):
+    """Searches the tickets and reviews the user is allowed to see in his
+    feed (see base/search.py)."""
 
     @staticmethod
-    def tickets_responding_to_user_tickets(request) -> list[models.Ticket]:
-        """returns only reviews responding to the user tickets"""
-        tickets = models.Review.objects.filter(ticket__user=request.user)
-        tickets = tickets.annotate(
-            content_type=Value("REVIEW", CharField())
-        )
-        return list(tickets)
+    @query_budget(3)
+    def get(request):
+        query = request.GET.get("q", "")
+        try:
+            page_number = max(1, int(request.GET.get("page", 1)))
+        except ValueError:
+            page_number = 1
+        page = search.search(request.user, query, page_number)
+        context = {"posts": page.posts,
+                   "query": query,
+                   "page": page_number,
+                   "has_next": page.has_next}
+        return render(request, "base/search.html", context)
 
 
 class TicketCreation(LoginRequiredMixin, View):
@@ -173,7 +167,8 @@ def review_create_response(request, ticket_pk):
     The second one is in the template used by this
     view where only one ticket is displayed.
     """
-    ticket_list = [models.Ticket.objects.get(id=ticket_pk)]
+    ticket_list = [archive.get_post(feed.TICKET, ticket_pk, "user",
+                                    restore_archived=request.method == "POST")]
     ticket = ticket_list[0]
     review_form = forms.ReviewForm()
     context = {"posts": ticket_list,
@@ -186,38 +181,102 @@ def review_create_response(request, ticket_pk):
             review.ticket = ticket
             review.user = request.user
             review.save()
-
-            ticket.has_review = True
-            ticket.save()
             return redirect(reverse_lazy("base:feed"))
 
     return render(request, "base/review_response_form.html", context)
 
 
 class Posts(LoginRequiredMixin, View):
-    """Retrieves all tickets and reviews in the DB. Displays only the ones
-    posted by the user."""
+    """Retrieves and displays the tickets and reviews posted by the user,
+    one page at a time. Only the user's rows are read, merged and ordered by
+    the database (see base.feed.post_keys), and the cursor GET parameter
+    tells where the previous page stopped, so the page costs the same
+    whatever the number of posts of the user. The keys of each page are
+    kept in the feed cache, and the totals come from the user's counters
+    (see base/user_stats.py)."""
     @staticmethod
+    @read_from_replica
+    @user_content_conditional
+    @query_budget(4)
     def get(request):
-        user = request.user
-        tickets = models.Ticket.objects.all()
-        tickets = tickets.annotate(
-            content_type=Value("TICKET", CharField())
-        )
-        reviews = models.Review.objects.all()
-        reviews = reviews.annotate(
-            content_type=Value("REVIEW", CharField())
-        )
-        posts = list(filter(lambda x: x.user == user, chain(tickets, reviews)))
-        sorted_posts = sorted(posts,
-                              key=lambda post: post.time_created,
-                              reverse=True)
-        context = {"posts": sorted_posts}
+        cursor = request.GET.get("cursor")
+        stats = user_stats.get_stats(request.user)
+        if streaming.is_enabled(request):
+            page_size = settings.POSTS_PAGE_SIZE
+            keys, next_cursor = feed.split_page(feed_cache.post_page_keys(
+                request.user, cursor, page_size), page_size)
+            return streaming.stream_posts(request, "base/posts.html",
+                                          "base/posts_item.html", keys,
+                                          {"next_cursor": next_cursor,
+                                           "stats": stats})
+        page = feed_cache.get_post_page(request.user, cursor)
+        context = {"posts": page.posts,
+                   "next_cursor": page.next_cursor,
+                   "stats": stats}
         return render(request, "base/posts.html", context)
 
 
-class EditTicket(LoginRequiredMixin, UpdateView):
+class ArchivedDetailMixin:
+    """looks for the post in the archive (see base/archive.py) when it
+    isn't in the live tables."""
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            return super().get_object(self.get_queryset(archived=True))
+
+
+class RestoreArchivedMixin:
+    """reads the post from the archive (see base/archive.py) when it isn't
+    in the live tables. Submitting the form (POST) first moves it back to
+    the live tables, before it is edited or deleted."""
+    content_type: str
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            if self.request.method != "POST":
+                return super().get_object(
+                    feed.MODELS[self.content_type, True].objects.all())
+            if not archive.restore(self.content_type, self.kwargs["pk"]):
+                raise
+        return super().get_object(queryset)
+
+    def get_template_names(self):
+        # the templates of the live model, whichever table the post is in.
+        return [f"base/{self.model._meta.model_name}"
+                f"{self.template_name_suffix}.html"]
+
+
+class TicketDetail(LoginRequiredMixin, ArchivedDetailMixin,
+                   generic.DetailView):
+    """displays a ticket with its whole description, which listings leave
+    out. Only the tickets the user sees in his feed can be displayed."""
+    template_name = "base/ticket_detail.html"
+    context_object_name = "post"
+
+    def get_queryset(self, archived=False):
+        return feed.visible_tickets(self.request.user,
+                                    archived).select_related("user")
+
+
+class ReviewDetail(LoginRequiredMixin, ArchivedDetailMixin,
+                   generic.DetailView):
+    """displays a review with its whole body, see TicketDetail."""
+    template_name = "base/review_detail.html"
+    context_object_name = "post"
+
+    def get_queryset(self, archived=False):
+        return feed.visible_reviews(self.request.user,
+                                    archived).select_related(
+            "user", "ticket__user").defer("ticket__description")
+
+
+class EditTicket(LoginRequiredMixin, RestoreArchivedMixin, UpdateView):
     """displays a form allowing the user to edit a ticket."""
+    content_type = feed.TICKET
     model = models.Ticket
     fields = ["title", "description"]
     success_url = reverse_lazy('base:posts')
@@ -228,8 +287,11 @@ def edit_review(request, review_pk, ticket_pk):
     """retrieves the review and the ticket corresponding to the review's
     ticket field. Displays the ticket just above a form allowing the
     user to edit the review. Saves the changes made in the DB."""
-    review_instance = models.Review.objects.get(id=review_pk)
-    ticket = models.Ticket.objects.get(id=ticket_pk)
+    restore_archived = request.method == "POST"
+    review_instance = archive.get_post(feed.REVIEW, review_pk,
+                                       restore_archived=restore_archived)
+    ticket = archive.get_post(feed.TICKET, ticket_pk, "user",
+                              restore_archived=restore_archived)
     ticket_list = [ticket]
     review_form = forms.ReviewForm(instance=review_instance)
     context = {"posts": ticket_list,
@@ -247,33 +309,55 @@ def edit_review(request, review_pk, ticket_pk):
     return render(request, "base/review_form.html", context)
 
 
-class DeleteTicket(LoginRequiredMixin, DeleteView):
+class DeleteTicket(LoginRequiredMixin, RestoreArchivedMixin, DeleteView):
     """displays a form allowing the user to delete a ticket."""
+    content_type = feed.TICKET
     model = models.Ticket
     fields = "__all__"
     success_url = reverse_lazy('base:posts')
 
 
-class DeleteReview(LoginRequiredMixin, DeleteView):
+class DeleteReview(LoginRequiredMixin, RestoreArchivedMixin, DeleteView):
     """displays a form allowing the user to delete a review."""
+    content_type = feed.REVIEW
     model = models.Review
     fields = "__all__"
     success_url = reverse_lazy('base:posts')
 
 
+@login_required(redirect_field_name=reverse_lazy("base:landing page"))
+def autocomplete_username(request) -> JsonResponse:
+    """returns as JSON the usernames starting with the q GET parameter.
+    Used by the search box of the following page while the user types."""
+    return JsonResponse(
+        {"usernames": usernames.autocomplete(request.GET.get("q", ""))}
+    )
+
+
 class Following(LoginRequiredMixin, View):
     """Retrieves and displays all followers and followed users."""
 
     @staticmethod
+    @read_from_replica
+    @query_budget(4)
     def get(request):
+        """Each list is read with one query going through the index of
+        UserFollows on the user (or followed user) column. Only the
+        usernames are loaded. The counters come from the user's stats row
+        instead of counting rows, and the "people you may know" panel from
+        the suggestions computed in batch (see base/suggestions.py)."""
         user = request.user
-        all_connections = models.UserFollows.objects.all()
-        follower_followed = [(c.user, c.followed_user) for c in
-                             all_connections]
-        following = [c[1] for c in follower_followed if c[0] == user]
-        followers = [c[0] for c in follower_followed if c[1] == user]
+        following = User.objects.filter(
+            followed_by__user=user
+        ).only("username").order_by("username")
+        followers = User.objects.filter(
+            following__followed_user=user
+        ).only("username").order_by("username")
         context = {"following": following,
-                   "followers": followers}
+                   "followers": followers,
+                   "stats": user_stats.get_stats(user),
+                   "suggestions": suggestions.for_user(
+                       user, settings.SUGGESTIONS_SHOWN)}
         return render(request, "base/following.html", context)
 
 
@@ -304,9 +388,10 @@ class Follow(LoginRequiredMixin, View):
     Saves the corresponding instance of UserFollow to the DB."""
 
     @staticmethod
+    @read_from_replica
     def get(request):
-        username = request.GET.get("username")
-        users = User.objects.filter(username__iexact=username)
+        username = request.GET.get("username", "")
+        users = usernames.iexact(username)
         context = {"to_follow": users}
         return render(request, "base/follow_new_user.html", context)
 
@@ -326,3 +411,33 @@ class Follow(LoginRequiredMixin, View):
             # by the Meta Class of UserFollows.
             pass
         return redirect(reverse_lazy("base:following"))
+
+
+@staff_member_required
+def feed_cache_stats(request) -> JsonResponse:
+    """returns the hit and miss counters of the feed cache."""
+    return JsonResponse(feed_cache.stats())
+
+
+def metrics(request) -> HttpResponse:
+    """returns the profiling histograms of every process (see
+    base.profiling.all_processes) and the feed cache counters in the
+    Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    authorized = (token and secrets.compare_digest(header, f"Bearer {token}")
+                  or request.user.is_active and request.user.is_staff)
+    if not authorized:
+        return HttpResponse(status=403)
+    cache = feed_cache.stats()
+    lines = [
+        profiling.prometheus_text(profiling.all_processes()).rstrip("\n"),
+        "# HELP litreview_feed_cache_hits_total Feed cache hits.",
+        "# TYPE litreview_feed_cache_hits_total counter",
+        f"litreview_feed_cache_hits_total {cache['hits']}",
+        "# HELP litreview_feed_cache_misses_total Feed cache misses.",
+        "# TYPE litreview_feed_cache_misses_total counter",
+        f"litreview_feed_cache_misses_total {cache['misses']}",
+    ]
+    return HttpResponse("\n".join(lines) + "\n",
+                        content_type="text/plain; version=0.0.4")
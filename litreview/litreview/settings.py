@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'base.replicas.replica_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,6 +84,77 @@ DATABASES = {
     }
 }
 
+# SQLite profile
+# "production" turns on WAL journaling and the pragmas of base/sqlite.py,
+# and keeps connections open between requests instead of reconnecting (and
+# applying the pragmas again) every time. Compare both profiles with
+# `python manage.py stress_sqlite`.
+
+SQLITE_PROFILE = "development"
+
+if SQLITE_PROFILE == "production":
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+
+# Read replicas
+# Aliases of DATABASES holding read-only copies of 'default'. The feed,
+# posts and following pages read from them (base/replicas.py). Clients are
+# pinned to 'default' for REPLICA_PIN_SECONDS after a write, which should
+# exceed the replication lag. To try it with a second SQLite file, add
+#     'replica': {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': BASE_DIR / 'replica.sqlite3',
+#         'TEST': {'MIRROR': 'default'},
+#     },
+# to DATABASES, set DATABASE_REPLICAS = ['replica'] and run
+# `python manage.py sync_replica` to copy the primary into it.
+
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['base.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# The "feed" cache holds the per-user feed and posts keys (base/feed_cache.py).
+# Its invalidations must reach every process serving requests, hence the
+# file-based backend, shared without an external service.
+# The "fragments" cache holds the rendered bodies of the posts
+# (base/fragments.py). Its keys change with the content, it never needs
+# invalidating and may stay per process.
+# The "auth" cache holds the sessions of the cached_db engine and the users
+# of base.user_cache.CachedUserMiddleware, see "Sessions and
+# authentication" below. It must be shared as well: the profiles using it
+# switch it to the file-based backend.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'feed': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'feed',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -126,3 +198,123 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = reverse_lazy("base:feed")
+
+
+# Sessions and authentication
+# "development" reads the session from the django_session table and the
+# user from auth_user on every request. "production" reads the session
+# from the "auth" cache, falling back to the table (cached_db engine), and
+# the user from the same cache (base/user_cache.py), kept
+# USER_CACHE_TIMEOUT seconds and dropped when the user is saved. "cookies"
+# keeps the session in a signed cookie instead: no storage at all, but its
+# content is readable by the client and a logged out cookie stays valid
+# until SESSION_COOKIE_AGE unless the password changes. Both keep the "auth"
+# cache in files, shared by every process: a logout or a password change
+# must reach them all. Measure them with `python manage.py benchmark_sessions`.
+
+SESSION_PROFILE = "development"
+SESSION_CACHE_ALIAS = "auth"
+USER_CACHE_TIMEOUT = 300
+
+if SESSION_PROFILE in ("production", "cookies"):
+    SESSION_ENGINE = ('django.contrib.sessions.backends.cached_db'
+                      if SESSION_PROFILE == "production" else
+                      'django.contrib.sessions.backends.signed_cookies')
+    MIDDLEWARE[MIDDLEWARE.index(
+        'django.contrib.auth.middleware.AuthenticationMiddleware'
+    )] = 'base.user_cache.CachedUserMiddleware'
+    CACHES['auth'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'auth',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+
+
+# Feed
+# Number of posts displayed on one page of the feed. The following pages
+# are reached through a cursor, see base/feed.py.
+
+FEED_PAGE_SIZE = 20
+
+# Same for the posts page, listing the user's own tickets and reviews.
+POSTS_PAGE_SIZE = 20
+
+# "pull" computes the feed when it is read (base/feed.py). "push" reads
+# timelines filled when posts are written (base/timeline.py). Run
+# `python manage.py rebuild_timelines` before switching to "push".
+FEED_MODE = "pull"
+
+# "buffered" renders the feed and posts pages in memory before sending
+# them. "streaming" sends the top of the page right away and then the
+# posts, STREAMING_CHUNK_SIZE at a time (see base/streaming.py). Requests
+# served through ASGI are always buffered.
+PAGE_RENDERING = "buffered"
+STREAMING_CHUNK_SIZE = 50
+
+# Part of the ETag of the feed and posts pages (see base/conditional.py).
+# Change it on every deployment, so that browsers don't keep pages rendered
+# by the previous templates.
+BUILD_ID = "1"
+
+
+# Query budgets
+# Views decorated with base.query_budget.query_budget log a warning when
+# they run more queries than declared, or the same query twice. When True,
+# an exception is raised instead (useful in tests).
+
+QUERY_BUDGET_STRICT = False
+
+
+# Profiling
+# When True, base.profiling.ProfilingMiddleware measures the view, SQL and
+# template time of every request to the base app, answers with a
+# Server-Timing header and aggregates per-route histograms. They are served
+# at /metrics/ in the Prometheus text format (to staff members, or to
+# clients sending "Authorization: Bearer <METRICS_TOKEN>"), and dumped by
+# `python manage.py dump_profiling`.
+
+PROFILING = False
+PROFILING_DIR = BASE_DIR / "profiling"
+PROFILING_FLUSH_INTERVAL = 10
+METRICS_TOKEN = None
+
+if PROFILING:
+    # first, so that the queries of the other middleware are counted too.
+    MIDDLEWARE.insert(0, 'base.profiling.ProfilingMiddleware')
+
+
+# Follow suggestions (see base/suggestions.py)
+# Computed by `python manage.py compute_suggestions`, to be run regularly
+# (e.g. every hour from cron). SUGGESTIONS_TOP_K are stored per user,
+# SUGGESTIONS_SHOWN of them are displayed by the following page.
+
+SUGGESTIONS_TOP_K = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_CHUNK_SIZE = 1000
+
+# Archive (see base/archive.py)
+# `python manage.py archive_posts`, to be run regularly (e.g. every night
+# from cron), moves the tickets older than ARCHIVE_AFTER_DAYS, along with
+# their reviews when none is more recent, to the archive tables,
+# ARCHIVE_BATCH_SIZE tickets per transaction.
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# Background jobs (see base/jobs.py)
+# With BACKGROUND_JOBS set to False, jobs run as soon as they are enqueued,
+# within the request. Set it to True in production and run
+# `python manage.py run_jobs` workers alongside the web server.
+
+BACKGROUND_JOBS = False
+# number of jobs claimed at once by a worker.
+JOB_BATCH_SIZE = 100
+# seconds after which the jobs claimed by a worker which died are claimed
+# again.
+JOB_LEASE_SECONDS = 300
+# a failed job is retried after JOB_RETRY_DELAY seconds, doubled at each
+# attempt, JOB_MAX_ATTEMPTS times at most.
+JOB_RETRY_DELAY = 10
+JOB_MAX_ATTEMPTS = 5